@@ -12,7 +12,8 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 files_directory = os.path.dirname(current_dir)
 
 
-yml_file = os.path.join(files_directory, "config.yml")
+# IBI_CONFIG selects another configuration file (e.g. the template, for the tests)
+yml_file = os.environ.get("IBI_CONFIG", os.path.join(files_directory, "config.yml"))
 with open(yml_file) as f:
     parameters = yaml.safe_load(f)
 
@@ -20,21 +21,51 @@ with open(yml_file) as f:
 HORSE IBI configuration
 """
 IBI_LOG_LEVEL = parameters["ibi"]["log_level"]
+# How the intent pipeline is scheduled: 'event' (woken up on changes) or 'polling'
+IBI_PIPELINE_MODE = parameters["ibi"].get("pipeline_mode", "event")
+# Threats processed in parallel by the intent pipeline (1: one after another)
+IBI_PIPELINE_WORKERS = parameters["ibi"].get("pipeline_workers", 1)
+# Keep the 'compromised' flag across restarts (snapshot and sqlite storage). By default a restart clears it
+IBI_RESTORE_COMPROMISED = parameters["ibi"].get("restore_compromised", False)
 
 """
 Knowledge Base (CKB) connection parameters
 """
 CKB_URL = parameters["ckb"]["url"]
+# Cache of the CKB answers by attack name (ttl 0 disables it)
+CKB_CACHE = parameters["ckb"].get("cache") or {}
+CKB_CACHE_TTL = CKB_CACHE.get("ttl", 300)  # Seconds
+CKB_CACHE_MAX_ENTRIES = CKB_CACHE.get("max_entries", 256)
 
 """
 IADT (Impact analysis DT) connection parameters
 """
 IADT_URL = parameters["iadt"]["url"]
+# Requests in flight per digital twin topology (default and per topology)
+IADT_MAX_CONCURRENT = parameters["iadt"].get("max_concurrent", 1)
+IADT_TOPOLOGIES = parameters["iadt"].get("topologies") or {}
+# Seconds before a request without an answer frees its slot (it is sent again)
+IADT_TASK_TIMEOUT = parameters["iadt"].get("task_timeout", 120)
+# Times a request without an answer is sent again before its DT job fails
+IADT_TASK_RETRIES = parameters["iadt"].get("task_retries", 2)
+# Seconds a KPI measurement is reused by the jobs of other threats on the same element
+# (0: never; the jobs of the same threat always reuse its measurement)
+IADT_BASELINE_TTL = parameters["iadt"].get("baseline_ttl", 600)
+# Candidate mitigation actions simulated together for a prevention intent (best one is kept)
+IADT_WHATIF_CANDIDATES = parameters["iadt"].get("whatif_candidates", 1)
 
 """
 CAS (Compliance Assessment) connection parameters
 """
 CAS_URL = parameters["cas"]["url"]
+# Budget of the tuning of partially compliant mitigation actions
+CAS_TUNING = parameters["cas"].get("tuning") or {}
+CAS_TUNING_MAX_ROUNDS = CAS_TUNING.get("max_rounds", 10)  # CAS calls per mitigation action
+CAS_TUNING_TIMEOUT = CAS_TUNING.get("timeout", 60)  # Seconds per mitigation action
+# Cache of the CAS verdicts (ttl 0 disables it)
+CAS_CACHE = parameters["cas"].get("cache") or {}
+CAS_CACHE_TTL = CAS_CACHE.get("ttl", 300)  # Seconds
+CAS_CACHE_MAX_ENTRIES = CAS_CACHE.get("max_entries", 1024)
 
 """
 RTR Connection parameters
@@ -58,10 +89,47 @@ Mitigation Actions configuration
 """
 MITIGATION_ACTIONS = parameters.get("mitigation_actions", [])
 MITIGATION_HOST = parameters.get("mitigation_host", [])
+# Templates of the mitigation action parameters and hosts (the configuration overrides the defaults)
+MITIGATION_TEMPLATES_FILE = os.path.join(files_directory, "resources", "mitigation_templates.yml")
+MITIGATION_TEMPLATES = parameters.get("mitigation_templates") or {}
 
 # HORSE Component Status
 MODULE_STATUS = parameters["module-status"]
 
+"""
+HTTP clients of the external services (pooled keep-alive connections)
+"""
+HTTP = parameters.get("http") or {}
+HTTP_TIMEOUT = HTTP.get("timeout", 10)  # Default timeout (seconds) of every request
+HTTP_MAX_CONNECTIONS = HTTP.get("max_connections", 10)  # Connections per host and service
+HTTP_SERVICES = HTTP.get("services") or {}  # Per service overrides (ckb, cas, rtr, iadt, status)
+
+"""
+Storage backend: 'memory' (default) or 'sqlite' (persistent, write-through)
+"""
+STORAGE = parameters.get("storage") or {}
+STORAGE_BACKEND = STORAGE.get("backend", "memory")
+STORAGE_PATH = STORAGE.get("path", os.path.join(files_directory, "ibi.db"))
+STORAGE_BATCH_SIZE = STORAGE.get("batch_size", 100)  # Writes per commit
+STORAGE_FLUSH_INTERVAL = STORAGE.get("flush_interval", 0.2)  # Seconds between commits
+
+"""
+Snapshot of the store state, restored at startup (warm restart)
+"""
+SNAPSHOT = parameters.get("snapshot") or {}
+SNAPSHOT_ENABLED = SNAPSHOT.get("enabled", False)
+SNAPSHOT_PATH = SNAPSHOT.get("path", os.path.join(files_directory, "ibi-snapshot.json"))
+SNAPSHOT_INTERVAL = SNAPSHOT.get("interval", 10)  # Seconds between snapshots
+
+"""
+Retention of terminal records (mitigated threats, timed out intents, expired DT jobs)
+"""
+RETENTION = parameters.get("retention") or {}
+RETENTION_TTL = RETENTION.get("ttl", 3600)  # Seconds a terminal record stays in memory
+RETENTION_INTERVAL = RETENTION.get("interval", 60)  # Seconds between compactions
+RETENTION_ARCHIVE_SIZE = RETENTION.get("archive_size", 1000)  # Records kept in the ring buffer
+RETENTION_ARCHIVE_PATH = RETENTION.get("archive_path", "")  # Optional JSON-lines archive file
+
 # Should use IPs instead of hostnames for RTR?
 RESOLVE_HOSTNAMES = parameters.get("ibi").get("resolve_hostnames", False)
 IP_MAPPINGS = parameters.get("ip_mappings", [])
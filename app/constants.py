@@ -19,7 +19,11 @@ class Const:
     APP_PORT = 8001
 
     # Intent processing loop
-    THREAD_INTENT_WAIT = 5.0
+    PIPELINE_MODE_EVENT = "event"
+    PIPELINE_MODE_POLLING = "polling"
+    THREAD_INTENT_WAIT = 5.0  # Polling interval
+    THREAD_INTENT_MAX_WAIT = 60.0  # Longest idle wait in event mode
+    THREAD_INTENT_DEADLINE_SLACK = 0.5  # Wake up slightly after a deadline
     THREAT_TIMEOUT = 2.0 * 60.0  # 2 minutes
 
     # Digital Twin related constants
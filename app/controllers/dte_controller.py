@@ -1,4 +1,4 @@
-from ast import List
+from typing import List
 from fastapi import HTTPException
 from requests import HTTPError
 from data.store import InMemoryStore
@@ -14,6 +14,7 @@ class DTEController:
 
     RETURN_STATUS_CREATED = "RETURN_STATUS_CREATED"
     RETURN_STATUS_UPDATED = "RETURN_STATUS_UPDATED"
+    RETURN_STATUS_REJECTED = "RETURN_STATUS_REJECTED"
 
     def __init__(self):
         self._storage = InMemoryStore()
@@ -34,28 +35,70 @@ class DTEController:
         """
         logger.info(f"Processing intent request from DTE: {dte_intent}")
 
-        if dte_intent.threat not in self.get_valid_threats():
+        if dte_intent.threat not in self._storage.mitigation_supported_threats():
             logger.warning(f"Unknown threat: {dte_intent.threat}")
             raise HTTPException(
                 status_code=400, detail=f"Threat not supported: {dte_intent.threat}"
             )
 
+        new_threats = []
+        renewed_threats = []
+        status = self._ingest(dte_intent, new_threats, renewed_threats)
+        self._renew_threats(renewed_threats)
+        self._send_alarms(new_threats)
+        # Wake up the pipeline to handle the new intent and new/renewed threats
+        self._storage.pipeline_notify()
+        return status
+
+    def process_dte_intents(self, dte_intents: List[DTEIntent]) -> List[str]:
+        """
+        Process a batch of intent requests.
+        The store is locked once for the whole batch and repeated requests
+        (same type, threat and hosts) are only processed once.
+        Returns the status of each request, in order.
+        """
+        logger.info(f"Processing batch of {len(dte_intents)} intent requests from DTE")
+        valid_threats = self._storage.mitigation_supported_threats()
+        statuses = []
+        new_threats = []
+        renewed_threats = []
+        seen = set()
+        with self._storage.batch():
+            for dte_intent in dte_intents:
+                if dte_intent.threat not in valid_threats:
+                    logger.warning(f"Unknown threat: {dte_intent.threat}")
+                    statuses.append(self.RETURN_STATUS_REJECTED)
+                    continue
+                key = (dte_intent.intent_type, dte_intent.threat, frozenset(dte_intent.host))
+                if key in seen:
+                    # Same request earlier in the batch: the threats are already renewed
+                    statuses.append(self.RETURN_STATUS_UPDATED)
+                    continue
+                seen.add(key)
+                statuses.append(self._ingest(dte_intent, new_threats, renewed_threats))
+        # Renew the threats and send the alarms once the store is released
+        self._renew_threats(renewed_threats)
+        self._send_alarms(new_threats)
+        self._storage.pipeline_notify()
+        return statuses
+
+    def _ingest(self, dte_intent: DTEIntent, new_threats: List[DetectedThreat], renewed_threats: List[str]) -> str:
+        """
+        Create the threats and the intent of a (valid) request.
+        The threats that were created are appended to new_threats and the uids
+        of the existing ones, to be renewed with _renew_threats, to renewed_threats.
+        """
         # Infere system state from the request
         # It a simlar threat exists, renew it, otherwise create a new one
-        new_threats = DetectedThreatBuilder().build(dte_intent)
-        for new_threat in new_threats:
+        for new_threat in DetectedThreatBuilder().build(dte_intent):
             existing_threat_uid = self._storage.threat_locate(new_threat)
             if existing_threat_uid:
                 logger.info(f"Threat {existing_threat_uid} already exists.")
-                updated_threat = self._storage.threat_get(existing_threat_uid)
-                updated_threat.renew()
-                self._storage.threat_update(existing_threat_uid, updated_threat)
-                logger.info(f"Threat {existing_threat_uid} updated successfully.")
+                renewed_threats.append(existing_threat_uid)
             else:
                 logger.info(f"New threat detected: {new_threat.uid}")
                 self._storage.threat_add(new_threat)
-                # Generate a SIEM alarm
-                self._customSIEM.send_log(new_threat, CustomSIEM.AlarmType.NEW)
+                new_threats.append(new_threat)
 
         # Convert to a CoreIntent
         new_core_intent = CoreIntent(dte_intent)
@@ -72,6 +115,22 @@ class DTEController:
         logger.info(f"Intent {new_core_intent.get_uid()} created successfully.")
         return self.RETURN_STATUS_CREATED
 
+    def _renew_threats(self, threat_uids: List[str]) -> None:
+        # Renew under the lock of the threat, as the pipeline may be processing it
+        for threat_uid in threat_uids:
+            with self._storage.threat_lock(threat_uid):
+                updated_threat = self._storage.threat_get(threat_uid)
+                if updated_threat is None:
+                    continue
+                updated_threat.renew()
+                self._storage.threat_update(threat_uid, updated_threat)
+            logger.info(f"Threat {threat_uid} updated successfully.")
+
+    def _send_alarms(self, new_threats: List[DetectedThreat]) -> None:
+        # Generate a SIEM alarm for each new threat
+        for new_threat in new_threats:
+            self._customSIEM.send_log(new_threat, CustomSIEM.AlarmType.NEW)
+
     def delete_intent(self, intent_id: str):
         """
         Delete an intent from the storage.
@@ -80,11 +139,6 @@ class DTEController:
 
     def get_valid_threats(self) -> [str]:
         """
-        Get all valid threats from the storage.
+        Get all valid threats from the storage, in catalogue order.
         """
-        threats = []
-        for mitigation in self._storage.mitigation_get_all():
-            for threat in mitigation.threats:
-                if threat not in threats:
-                    threats.append(threat)
-        return threats
+        return list(self._storage.mitigation_get_by_threat())
@@ -1,4 +1,6 @@
 from data.store import InMemoryStore
+from integrations.dt_scheduler import DTScheduler, DTTask
+from integrations.iandt import ImpactAnalysisDT
 from models.core_models import DTJob
 from utils.log_config import setup_logging
 
@@ -7,6 +9,8 @@ class IANDTController:
 
     def __init__(self):
         self._store = InMemoryStore()
+        self._scheduler = DTScheduler()
+        self._iadt = ImpactAnalysisDT()
         self._logger = setup_logging(__name__)
 
     def process_response(self, job_id, value):
@@ -17,17 +21,41 @@ class IANDTController:
         # Get the DTJob object from the store
         dt_job = self._store.dt_job_get(job_id)
         if dt_job is None:
+            # Free the slot of the request anyway (e.g. the job was removed while in flight)
+            self._scheduler.complete(job_id)
             self._logger.error(f"DTJob object not found for job {job_id}")
             return
+        # The pipeline workers and the watchdog may be changing the jobs of the threat
+        with self._store.threat_lock(dt_job.threat_id):
+            self._update_job(dt_job, value)
+
+    def _update_job(self, dt_job: DTJob, value) -> None:
+        job_id = dt_job.uid
+        if dt_job.status == DTJob.JobStatus.FAILED:
+            # Given up by the watchdog before the answer arrived
+            self._logger.warning(f"Ignoring late answer from IANDT for failed job {job_id}")
+            return
+        # Free the slot of the request. When the request is unknown (e.g. a late answer),
+        # the kind of answer is inferred from the job
+        task = self._scheduler.complete(job_id)
+        if task is not None:
+            measurement = task.task_type == DTTask.TaskType.MEASUREMENT
+        else:
+            measurement = dt_job.kpi_before is None
         # Update the DTJob object with the new value
-        if dt_job.kpi_before is None:
+        if measurement:
             dt_job.update_kpi_before(value)
-            self._store.dt_set_available()
+            if task is not None and task.baseline_key is not None:
+                # Baseline of the next jobs that monitor the same element
+                self._store.kpi_baseline_set(task.baseline_key, value)
+            # The other jobs of the threat (what-if candidates) share the measurement
+            self._iadt.share_measurement(dt_job.threat_id, value)
             self._logger.info(f"DTJob object updated (monitor) for job {job_id} with value {value}")
         else:
             dt_job.update_kpi_after(value)
             dt_job.update_status(DTJob.JobStatus.COMPLETED)
-            self._store.dt_set_available()
             self._logger.info(f"DTJob object updated (mitigation) for job {job_id} with value {value}")
         self._store.dt_job_update(job_id, dt_job)
-        
\ No newline at end of file
+        # Visit the threat in the next pipeline cycle to evaluate the results
+        # (the pipeline also sends the next queued IA-NDT requests)
+        self._store.threat_mark_dirty(dt_job.threat_id)
@@ -1,3 +1,4 @@
+from uuid import NAMESPACE_URL, uuid5
 from data.store import InMemoryStore
 from models.core_models import MitigationAction
 from config import MITIGATION_ACTIONS
@@ -18,6 +19,7 @@ class MitigationsController:
         
         # Load mitigation actions from configuration
         mitigations = []
+        uids = set()
         for action_config in MITIGATION_ACTIONS:
             try:
                 # Create MitigationAction from config data
@@ -27,6 +29,17 @@ class MitigationsController:
                     threats=action_config["threats"],
                     fields=action_config["fields"]
                 )
+                # Derive the uid from the definition, so persisted associations and
+                # DT jobs still refer to the same action after a restart
+                mitigation.uid = str(uuid5(
+                    NAMESPACE_URL,
+                    f"{mitigation.category.value}/{mitigation.name}/{','.join(mitigation.threats)}",
+                ))
+                if mitigation.uid in uids:
+                    # Both entries would get the same uid: the first one is kept
+                    logger.error(f"Duplicate mitigation action in config, ignored: {action_config}")
+                    continue
+                uids.add(mitigation.uid)
                 
                 # Set optional fields if present in config
                 if "priority" in action_config:
@@ -1,8 +1,10 @@
-from types import TracebackType
+import asyncio
+import httpx
 import requests
-from ast import Dict
+from typing import Dict, List
 from config import MODULE_STATUS
 from utils.log_config import setup_logging
+from utils.http_client import HTTPClient
 
 class StatusController:
     """
@@ -17,29 +19,48 @@ class StatusController:
     MODULE_STATUS_OFFLINE = "Offline"
     list_of_modules = []
 
-    def get_status(self) -> Dict:
+    def __init__(self):
+        self._http = HTTPClient.for_service("status")
+
+    def get_status(self) -> List[Dict]:
         # No modules to check
         if MODULE_STATUS is None:
             return []
         # Check the status of each module in configuration file
         status = []
         for module in MODULE_STATUS:
-            status.append({
-                "name": module["name"],
-                "description": module["description"],
-                "status": self._query_status(module)
-            })
+            status.append(self._module_status(module, self._query_status(module)))
         return status
 
+    async def get_status_async(self) -> List[Dict]:
+        """
+        Same as get_status, but the modules are queried concurrently
+        (with the async HTTP client, in the event loop of the caller).
+        """
+        if MODULE_STATUS is None:
+            return []
+        results = await asyncio.gather(*(self._query_status_async(module) for module in MODULE_STATUS))
+        return [self._module_status(module, result) for module, result in zip(MODULE_STATUS, results)]
+
+    @staticmethod
+    def _module_status(module_object, status: str) -> Dict:
+        return {
+            "name": module_object["name"],
+            "description": module_object["description"],
+            "status": status,
+        }
+
+    def _check_code(self, module_object, status_code: int) -> str:
+        if status_code == int(module_object['expected_code']):
+            return self.MODULE_STATUS_ONLINE
+        else:
+            return self.MODULE_STATUS_OFFLINE
 
     def _query_status(self, module_object) -> str:
         self._logger.debug(f"Querying status of module {module_object['url']}")
         try:
-            response = requests.get(module_object['url'])
-            if response.status_code == int(module_object['expected_code']):
-                return self.MODULE_STATUS_ONLINE
-            else:
-                return self.MODULE_STATUS_OFFLINE
+            response = self._http.get(module_object['url'])
+            return self._check_code(module_object, response.status_code)
         except requests.exceptions.ConnectionError as e:
             self._logger.debug(f"Error connecting to module {module_object['url']}: {e}")
             return self.MODULE_STATUS_OFFLINE
@@ -48,4 +69,16 @@ class StatusController:
             return self.MODULE_STATUS_OFFLINE
         except requests.exceptions.RequestException as e:
             self._logger.debug(f"Error connecting to module {module_object['url']}: {e}")
-            return self.MODULE_STATUS_OFFLINE
\ No newline at end of file
+            return self.MODULE_STATUS_OFFLINE
+
+    async def _query_status_async(self, module_object) -> str:
+        self._logger.debug(f"Querying status of module {module_object['url']}")
+        try:
+            response = await self._http.aget(module_object['url'])
+            return self._check_code(module_object, response.status_code)
+        except httpx.TimeoutException as e:
+            self._logger.debug(f"Timeout connecting to module {module_object['url']}: {e}")
+            return self.MODULE_STATUS_OFFLINE
+        except httpx.HTTPError as e:
+            self._logger.debug(f"Error connecting to module {module_object['url']}: {e}")
+            return self.MODULE_STATUS_OFFLINE
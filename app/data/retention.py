@@ -0,0 +1,114 @@
+import json
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List
+import config
+from data.store import InMemoryStore
+from utils.log_config import setup_logging
+
+
+class RetentionManager:
+    """
+    Applies the retention policy to the InMemoryStore.
+    Terminal records (mitigated threats, timed out intents and expired DT jobs) are
+    removed from the hot state once they are older than the configured TTL. The most
+    recent ones are kept in a bounded ring buffer and, if an archive path is configured,
+    every removed record is appended to a JSON-lines file.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(RetentionManager, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._store = InMemoryStore()
+        self._logger = setup_logging(__name__)
+        self.ttl = config.RETENTION_TTL
+        self.interval = config.RETENTION_INTERVAL
+        self.archive_path = config.RETENTION_ARCHIVE_PATH
+        self._archive = deque(maxlen=config.RETENTION_ARCHIVE_SIZE)
+        self._last_run = 0.0
+        # Protects the metrics and the archive (run by the pipeline, read by the API)
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "compactions": 0,
+            "records_reclaimed": {"threats": 0, "intents": 0, "associations": 0, "dt_jobs": 0},
+            "bytes_reclaimed": 0,
+            "archive_evicted": 0,
+            "archived_to_disk": 0,
+            "last_run": None,
+        }
+        self._initialized = True
+
+    def run(self, force: bool = False) -> None:
+        """
+        Compact the store if the compaction interval has elapsed.
+        """
+        now = datetime.now().timestamp()
+        if not force and now - self._last_run < self.interval:
+            return
+        self._last_run = now
+        removed = self._store.compact(now - self.ttl)
+
+        records = []
+        for kind, items in removed.items():
+            for item in items:
+                records.append({"kind": kind[:-1], "archived_at": int(now), "record": item})
+        with self._metrics_lock:
+            self._metrics["compactions"] += 1
+            self._metrics["last_run"] = int(now)
+            if not records:
+                return
+            lines = [json.dumps(record) for record in records]
+            for kind, items in removed.items():
+                self._metrics["records_reclaimed"][kind] += len(items)
+            self._metrics["records_reclaimed"]["associations"] += sum(
+                len(t["associations"]) for t in removed["threats"]
+            )
+            self._metrics["bytes_reclaimed"] += sum(len(line) for line in lines)
+            evicted = max(len(self._archive) + len(records) - self._archive.maxlen, 0)
+            self._metrics["archive_evicted"] += evicted
+            self._archive.extend(records)
+            if self.archive_path:
+                self._write_archive(lines)
+        self._logger.info(
+            f"Retention: reclaimed {len(removed['threats'])} threats, {len(removed['intents'])} intents "
+            f"and {len(removed['dt_jobs'])} IA-NDT jobs"
+        )
+
+    def _write_archive(self, lines: List[str]) -> None:
+        try:
+            with open(self.archive_path, "a") as f:
+                f.write("\n".join(lines) + "\n")
+            self._metrics["archived_to_disk"] += len(lines)
+        except OSError as e:
+            self._logger.error(f"Error writing the retention archive {self.archive_path}: {e}")
+
+    def get_archive(self) -> List[Dict[str, Any]]:
+        """
+        Get the most recent archived records (ring buffer).
+        """
+        with self._metrics_lock:
+            return list(self._archive)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Get the compaction metrics. Bytes reclaimed are measured as the size
+        of the JSON encoding of the removed records.
+        """
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+            metrics["records_reclaimed"] = dict(self._metrics["records_reclaimed"])
+            metrics["archived_in_memory"] = len(self._archive)
+            metrics["ttl"] = self.ttl
+            return metrics
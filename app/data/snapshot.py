@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict
+import config
+from data.store import InMemoryStore
+from utils.log_config import setup_logging
+
+
+class SnapshotManager:
+    """
+    Periodically writes the state of the InMemoryStore (intents, threats, associations,
+    DT jobs and the status flags) to a JSON file and restores it at startup.
+    The file is replaced atomically, so a crash while writing leaves the previous
+    snapshot in place.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(SnapshotManager, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._store = InMemoryStore()
+        self._logger = setup_logging(__name__)
+        # The sqlite backend already persists every change
+        self.enabled = config.SNAPSHOT_ENABLED and config.STORAGE_BACKEND != "sqlite"
+        self.path = config.SNAPSHOT_PATH
+        self.interval = config.SNAPSHOT_INTERVAL
+        self._last_written = None
+        self._write_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._initialized = True
+
+    def load(self) -> bool:
+        """
+        Restore the store from the snapshot file.
+        Returns True if a snapshot was restored.
+        """
+        if not self.enabled or not os.path.exists(self.path):
+            return False
+        started = datetime.now().timestamp()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = f.read()
+            state = json.loads(data)
+            self._store.import_state(state)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self._logger.error(f"Could not restore snapshot {self.path}: {e}")
+            return False
+        self._last_written = data
+        self._logger.info(
+            f"Restored snapshot {self.path} in {(datetime.now().timestamp() - started) * 1000:.1f} ms: "
+            f"{len(state.get('intents', []))} intents, {len(state.get('threats', []))} threats, "
+            f"{len(state.get('dt_jobs', []))} DT jobs"
+        )
+        return True
+
+    def save(self) -> bool:
+        """
+        Write the current state of the store to the snapshot file.
+        Nothing is written if the state did not change since the last snapshot.
+        Returns True if the file was written.
+        """
+        if not self.enabled:
+            return False
+        state: Dict[str, Any] = self._store.export_state()
+        data = json.dumps(state)
+        with self._write_lock:
+            if data == self._last_written:
+                return False
+            tmp_path = f"{self.path}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                self._logger.error(f"Could not write snapshot {self.path}: {e}")
+                return False
+            self._last_written = data
+        return True
+
+    def start(self) -> None:
+        """
+        Start writing snapshots in the background every 'interval' seconds.
+        """
+        if not self.enabled or self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background thread and write a final snapshot.
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(1)
+            self._thread = None
+        self.save()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.save()
+            except Exception as e:
+                self._logger.error(f"Error writing snapshot: {e}")
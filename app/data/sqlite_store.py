@@ -0,0 +1,298 @@
+import atexit
+import json
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import config
+from data.store import InMemoryStore
+from models.core_models import CoreIntent, DTJob, DetectedThreat, MitigationAction
+
+
+class SQLiteStore(InMemoryStore):
+    """
+    Persistent store backed by an embedded SQLite database (WAL mode).
+    It has the same method surface as the InMemoryStore, which is used as a
+    write-through cache: reads are served from memory and every change is also
+    queued for the database. Queued changes are committed in batches by a
+    background thread, so a crash loses at most the last flush interval.
+    The state is restored from the database when the store is created.
+    """
+
+    _SQL_UPSERT = "INSERT OR REPLACE INTO records (kind, uid, data) VALUES (?, ?, ?)"
+    _SQL_DELETE = "DELETE FROM records WHERE kind = ? AND uid = ?"
+    _SQL_DELETE_KIND = "DELETE FROM records WHERE kind = ?"
+    _SQL_SELECT = "SELECT kind, uid, data FROM records"
+
+    KIND_INTENT = "intent"
+    KIND_THREAT = "threat"
+    KIND_ASSOCIATION = "association"
+    KIND_DT_JOB = "dt_job"
+    KIND_FLAG = "flag"
+    KIND_KPI_BASELINE = "kpi_baseline"
+    # Kinds of records replaced as a whole when a state is imported
+    STATE_KINDS = (KIND_INTENT, KIND_THREAT, KIND_ASSOCIATION, KIND_DT_JOB, KIND_KPI_BASELINE)
+
+    def __init__(self):
+        if self._initialized:
+            return
+        super().__init__()
+        self._path = config.STORAGE_PATH
+        self._batch_size = config.STORAGE_BATCH_SIZE
+        self._flush_interval = config.STORAGE_FLUSH_INTERVAL
+        # Pending writes: (kind, uid) -> serialized record, or None to delete it.
+        # When _pending_reset is set, the records of STATE_KINDS are deleted before them
+        self._pending: Dict[Tuple[str, str], Optional[str]] = {}
+        self._pending_reset = False
+        self._pending_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._flush_event = threading.Event()
+        self._db = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS records ("
+            "kind TEXT NOT NULL, uid TEXT NOT NULL, data TEXT NOT NULL, "
+            "PRIMARY KEY (kind, uid))"
+        )
+        self._loaded = False
+        self._load()
+        self._loaded = True
+        # The stored flag is replaced when it is not restored (see IBI_RESTORE_COMPROMISED)
+        self._queue_flags()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+        self._logger.info(f"SQLite storage backend ready: {self._path}")
+
+    def _load(self) -> None:
+        """
+        Restore the state persisted in the database.
+        """
+        state = {"intents": [], "threats": [], "associations": {}, "dt_jobs": [], "kpi_baselines": []}
+        with self._db_lock:
+            rows = self._db.execute(self._SQL_SELECT).fetchall()
+        for kind, uid, data in rows:
+            record = json.loads(data)
+            if kind == self.KIND_INTENT:
+                state["intents"].append(record)
+            elif kind == self.KIND_THREAT:
+                state["threats"].append(record)
+            elif kind == self.KIND_ASSOCIATION:
+                state["associations"][uid] = record
+            elif kind == self.KIND_DT_JOB:
+                state["dt_jobs"].append(record)
+            elif kind == self.KIND_KPI_BASELINE:
+                state["kpi_baselines"].append(record)
+            elif kind == self.KIND_FLAG:
+                state[uid] = record
+        if rows:
+            self.import_state(state)
+
+    """
+    Batched writes
+    """
+    def _queue(self, kind: str, uid: str, record: Any) -> None:
+        data = None if record is None else json.dumps(record)
+        with self._pending_lock:
+            self._pending[(kind, uid)] = data
+            if len(self._pending) >= self._batch_size:
+                self._flush_event.set()
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._flush_event.wait(self._flush_interval)
+            self._flush_event.clear()
+            try:
+                self.flush()
+            except sqlite3.Error as e:
+                self._logger.error(f"Error writing to the SQLite storage backend: {e}")
+
+    def flush(self) -> int:
+        """
+        Commit the pending writes in a single transaction.
+        Returns the number of records written.
+        """
+        # The database lock is taken first, so the batches are committed in the order they were taken
+        with self._db_lock:
+            with self._pending_lock:
+                pending, self._pending = self._pending, {}
+                reset, self._pending_reset = self._pending_reset, False
+            if not pending and not reset:
+                return 0
+            upserts = [(kind, uid, data) for (kind, uid), data in pending.items() if data is not None]
+            deletes = [(kind, uid) for (kind, uid), data in pending.items() if data is None]
+            try:
+                self._db.execute("BEGIN")
+                if reset:
+                    self._db.executemany(self._SQL_DELETE_KIND, [(kind,) for kind in self.STATE_KINDS])
+                if deletes:
+                    self._db.executemany(self._SQL_DELETE, deletes)
+                if upserts:
+                    self._db.executemany(self._SQL_UPSERT, upserts)
+                self._db.execute("COMMIT")
+            except sqlite3.Error:
+                self._db.execute("ROLLBACK")
+                # Keep the writes for the next flush, unless superseded by newer writes
+                # or by the import of a new state
+                with self._pending_lock:
+                    if reset or not self._pending_reset:
+                        self._pending_reset = self._pending_reset or reset
+                        for key, data in pending.items():
+                            self._pending.setdefault(key, data)
+                raise
+        return len(pending)
+
+    def _queue_threat(self, threat: DetectedThreat) -> None:
+        if threat.uid in self._threats:
+            self._queue(self.KIND_THREAT, threat.uid, threat.to_dict())
+
+    def _queue_association(self, threat_id: str) -> None:
+        mitigations = self._associations.get(threat_id)
+        self._queue(
+            self.KIND_ASSOCIATION,
+            threat_id,
+            [m.to_dict() for m in mitigations] if mitigations is not None else None,
+        )
+
+    def _queue_kpi_baseline(self, key: Tuple[str, ...]) -> None:
+        self._queue(
+            self.KIND_KPI_BASELINE,
+            json.dumps(list(key)),
+            self._kpi_baseline_to_dict(key, self._kpi_baselines[key]),
+        )
+
+    def _queue_flags(self) -> None:
+        self._queue(self.KIND_FLAG, "ibi_compromised", self._ibi_compromised)
+
+    """
+    Write-through of the InMemoryStore changes
+    """
+    def intent_add(self, intent: CoreIntent) -> None:
+        with self._data_lock:
+            super().intent_add(intent)
+            self._queue(self.KIND_INTENT, intent.uid, intent.to_dict())
+
+    def intent_update(self, key: str, intent: CoreIntent) -> bool:
+        with self._data_lock:
+            updated = super().intent_update(key, intent)
+            if updated:
+                self._queue(self.KIND_INTENT, key, intent.to_dict())
+            return updated
+
+    def intent_remove(self, key: str) -> bool:
+        with self._data_lock:
+            removed = super().intent_remove(key)
+            if removed:
+                self._queue(self.KIND_INTENT, key, None)
+            return removed
+
+    def intent_clear_all(self) -> None:
+        with self._data_lock:
+            for key in self._core_intents:
+                self._queue(self.KIND_INTENT, key, None)
+            super().intent_clear_all()
+
+    def threat_add(self, threat: DetectedThreat) -> None:
+        with self._data_lock:
+            super().threat_add(threat)
+            self._queue_threat(threat)
+
+    def threat_update(self, key: str, threat: DetectedThreat) -> bool:
+        with self._data_lock:
+            updated = super().threat_update(key, threat)
+            if updated:
+                self._queue_threat(threat)
+            return updated
+
+    def threat_remove(self, key: str) -> bool:
+        with self._data_lock:
+            removed = super().threat_remove(key)
+            if removed:
+                self._queue(self.KIND_THREAT, key, None)
+            return removed
+
+    def threat_clear_all(self) -> None:
+        with self._data_lock:
+            for key in self._threats:
+                self._queue(self.KIND_THREAT, key, None)
+            super().threat_clear_all()
+
+    def _threat_transition(self, threat: DetectedThreat, new_status: DetectedThreat.ThreatStatus) -> None:
+        # Covers threat_set_status and expire_old_threats
+        super()._threat_transition(threat, new_status)
+        self._queue_threat(threat)
+
+    def association_add(self, threat_id: str, mitigation: MitigationAction) -> None:
+        with self._data_lock:
+            super().association_add(threat_id, mitigation)
+            self._queue_association(threat_id)
+
+    def association_update(self, threat_id: str, mitigation: MitigationAction) -> bool:
+        with self._data_lock:
+            updated = super().association_update(threat_id, mitigation)
+            if updated:
+                self._queue_association(threat_id)
+            return updated
+
+    def dt_job_add(self, job: DTJob) -> None:
+        with self._data_lock:
+            super().dt_job_add(job)
+            self._queue(self.KIND_DT_JOB, job.uid, job.to_dict())
+
+    def dt_job_update(self, job_id: str, updated_job: DTJob) -> bool:
+        with self._data_lock:
+            updated = super().dt_job_update(job_id, updated_job)
+            if updated:
+                self._queue(self.KIND_DT_JOB, job_id, updated_job.to_dict())
+            return updated
+
+    def _dt_job_archive(self, threat_id: str) -> List[DTJob]:
+        # Covers dt_job_delete and the jobs of the threats that become MITIGATED
+        jobs = super()._dt_job_archive(threat_id)
+        for job in jobs:
+            self._queue(self.KIND_DT_JOB, job.uid, job.to_dict())
+        return jobs
+
+    def kpi_baseline_set(self, key: Tuple[str, ...], value: float) -> None:
+        with self._data_lock:
+            super().kpi_baseline_set(key, value)
+            self._queue_kpi_baseline(key)
+
+    def compact(self, cutoff: float) -> Dict[str, Any]:
+        with self._data_lock:
+            removed = super().compact(cutoff)
+            for threat in removed["threats"]:
+                self._queue(self.KIND_THREAT, threat["uid"], None)
+                self._queue(self.KIND_ASSOCIATION, threat["uid"], None)
+            for intent in removed["intents"]:
+                self._queue(self.KIND_INTENT, intent["uid"], None)
+            for job in removed["dt_jobs"]:
+                self._queue(self.KIND_DT_JOB, job["uid"], None)
+            return removed
+
+    def ibi_set_compromised(self, compromised: bool) -> None:
+        with self._data_lock:
+            super().ibi_set_compromised(compromised)
+            self._queue_flags()
+
+    def import_state(self, state: Dict[str, Any]) -> None:
+        with self._data_lock:
+            super().import_state(state)
+            # Keep the database in step when the state comes from elsewhere (e.g. a snapshot):
+            # the pending writes of the previous state are dropped, and the next flush
+            # replaces the stored records with the new state in one transaction
+            if self._loaded:
+                with self._pending_lock:
+                    self._pending = {}
+                    self._pending_reset = True
+                for intent in self._core_intents.values():
+                    self._queue(self.KIND_INTENT, intent.uid, intent.to_dict())
+                for threat in self._threats.values():
+                    self._queue_threat(threat)
+                for threat_id in self._associations:
+                    self._queue_association(threat_id)
+                for job in self.dt_job_get_all(expired=True):
+                    self._queue(self.KIND_DT_JOB, job.uid, job.to_dict())
+                for key in self._kpi_baselines:
+                    self._queue_kpi_baseline(key)
+                self._queue_flags()
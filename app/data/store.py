@@ -1,21 +1,56 @@
+import heapq
 import threading
-from typing import Dict, List, Optional
+from collections import deque
+from types import MappingProxyType
+from typing import Any, Callable, Deque, Dict, FrozenSet, List, Mapping, Optional, Set, Tuple
 from datetime import datetime
+import config
 from models.core_models import CoreIntent, DTJob, DetectedThreat, MitigationAction
 from utils.log_config import setup_logging
 
+# Secondary index keys: (type, threat name, hosts)
+IntentKey = Tuple[str, str, FrozenSet[str]]
+ThreatKey = Tuple[str, str, FrozenSet[str]]
+# KPI baseline keys: (topology, attack, node, interface, metric)
+BaselineKey = Tuple[str, str, str, str, str]
+
 
 class InMemoryStore:
     _instance = None
     _lock = threading.Lock()
 
+    # Names of the copy-on-write read views
+    VIEW_INTENTS = "intents"
+    VIEW_THREATS = "threats"
+    VIEW_THREAT_COUNTS = "threat_counts"
+    VIEW_MITIGATIONS = "mitigations"
+    VIEW_DT_JOBS = "dt_jobs"
+    VIEW_THREAT_CATALOGUE = "threat_catalogue"
+    VIEW_SUPPORTED_THREATS = "supported_threats"
+    VIEW_RECOMMENDATIONS = "recommendations"
+    VIEWS = (
+        VIEW_INTENTS, VIEW_THREATS, VIEW_THREAT_COUNTS, VIEW_MITIGATIONS, VIEW_DT_JOBS,
+        VIEW_THREAT_CATALOGUE, VIEW_SUPPORTED_THREATS, VIEW_RECOMMENDATIONS,
+    )
+    # Views derived from the mitigation catalogue
+    CATALOGUE_VIEWS = (
+        VIEW_MITIGATIONS, VIEW_THREAT_CATALOGUE, VIEW_SUPPORTED_THREATS, VIEW_RECOMMENDATIONS,
+    )
+
     def __new__(cls):
-        if cls._instance is None:
-            with cls._lock:
-                if cls._instance is None:
-                    cls._instance = super(InMemoryStore, cls).__new__(cls)
-                    cls._instance._initialized = False
-        return cls._instance
+        # A single store is shared by the whole application. Its class is
+        # selected by the configured storage backend.
+        if InMemoryStore._instance is None:
+            with InMemoryStore._lock:
+                if InMemoryStore._instance is None:
+                    store_class = cls
+                    if cls is InMemoryStore and config.STORAGE_BACKEND == "sqlite":
+                        from data.sqlite_store import SQLiteStore
+                        store_class = SQLiteStore
+                    instance = super(InMemoryStore, cls).__new__(store_class)
+                    instance._initialized = False
+                    InMemoryStore._instance = instance
+        return InMemoryStore._instance
 
     def __init__(self):
         if not self._initialized:
@@ -24,9 +59,44 @@ class InMemoryStore:
             self._threats: Dict[str, DetectedThreat] = {}
             self._available_actions: Dict[str, MitigationAction] = {}
             self._associations: Dict[str, List[MitigationAction]] = {}
-            self._dt_jobs: List[DTJob] = []
-            self._dt_available: bool = True
+            # Uids of the mitigation actions associated with each threat
+            self._association_uids: Dict[str, Set[str]] = {}
+            # Live DT jobs by uid (in arrival order), by threat and by (threat, mitigation action),
+            # and the expired jobs (archive, by uid and by threat) until they are compacted
+            self._dt_jobs: Dict[str, DTJob] = {}
+            self._dt_jobs_by_threat: Dict[str, Dict[str, DTJob]] = {}
+            self._dt_job_index: Dict[Tuple[str, str], str] = {}
+            self._expired_dt_jobs: Dict[str, DTJob] = {}
+            self._expired_dt_jobs_by_threat: Dict[str, Dict[str, DTJob]] = {}
+            # Latest KPI measured before the mitigation of each threat (shared by its jobs)
+            self._threat_measurements: Dict[str, float] = {}
+            # KPI baselines measured by the IA-NDT: key -> (value, measured at)
+            self._kpi_baselines: Dict[BaselineKey, Tuple[float, float]] = {}
+            # Secondary indexes (key -> uid) of live intents and active threats
+            self._intent_index: Dict[IntentKey, str] = {}
+            self._threat_index: Dict[ThreatKey, str] = {}
+            # Threats changed since the last pipeline cycle and expiry times (min-heap)
+            self._dirty_threats: Set[str] = set()
+            self._threat_deadlines: List[Tuple[float, str]] = []
+            # Threat uids per status (buckets) and the status each threat is filed under
+            self._threat_buckets: Dict[DetectedThreat.ThreatStatus, Set[str]] = {
+                status: set() for status in DetectedThreat.ThreatStatus
+            }
+            self._threat_status: Dict[str, DetectedThreat.ThreatStatus] = {}
+            # Locks held while a threat or its DT jobs are changed (created on demand)
+            self._threat_locks: Dict[str, threading.RLock] = {}
+            # Records that reached a terminal state, as (time, uid) in arrival order
+            self._terminal_threats: Deque[Tuple[float, str]] = deque()
+            self._terminal_dt_jobs: Deque[Tuple[float, str]] = deque()
+            # Called with the uid of each archived DT job (e.g. to drop its IA-NDT requests)
+            self._dt_job_archive_hooks: List[Callable[[str], None]] = []
             self._ibi_compromised: bool = False
+            # Wake-up signal and scheduled deadlines (min-heap) of the intent pipeline
+            self._pipeline_event = threading.Event()
+            self._pipeline_deadlines: List[float] = []
+            # Copy-on-write read views (tuples) of the collections, served without the lock
+            self._views: Dict[str, Any] = {}
+            self._view_generations: Dict[str, int] = {}
             self._logger = setup_logging(__name__)
             self._initialized = True
 
@@ -37,12 +107,18 @@ class InMemoryStore:
     def intent_add(self, intent: CoreIntent) -> None:
         with self._data_lock:
             self._core_intents[intent.get_uid()] = intent
+            self._intent_index_add(intent)
+            self._view_invalidate(self.VIEW_INTENTS)
+            self.pipeline_schedule(intent.end_time)
             self._logger.info(f"Intent added: {intent.get_uid()}")
 
     def intent_update(self, key: str, intent: CoreIntent) -> bool:
         with self._data_lock:
             if key in self._core_intents:
+                self._intent_index_remove(self._core_intents[key])
                 self._core_intents[key] = intent
+                self._intent_index_add(intent)
+                self._view_invalidate(self.VIEW_INTENTS)
                 self._logger.info(f"Intent updated: {key}")
                 return True
             return False
@@ -54,27 +130,51 @@ class InMemoryStore:
     def intent_remove(self, key: str) -> bool:
         with self._data_lock:
             self._logger.info(f"Intent removed: {key}")
-            return self._core_intents.pop(key, None) is not None
+            intent = self._core_intents.pop(key, None)
+            if intent is None:
+                return False
+            self._intent_index_remove(intent)
+            self._view_invalidate(self.VIEW_INTENTS)
+            return True
 
     def intent_get_all(self) -> List[CoreIntent]:
-        with self._data_lock:
-            return [intent for intent in self._core_intents.values()]
+        return list(self._view(self.VIEW_INTENTS, lambda: tuple(self._core_intents.values())))
 
     def intent_clear_all(self) -> None:
         with self._data_lock:
             self._core_intents.clear()
+            self._intent_index.clear()
+            self._view_invalidate(self.VIEW_INTENTS)
 
     def intent_exists(self, another_intent: CoreIntent) -> bool:
+        """
+        Check if there is a live (not timed out) intent with the same type,
+        threat and hosts. Uses the intent index, so the lookup is O(1).
+        """
         with self._data_lock:
-            for intent in self._core_intents.values():
-                if (
-                    intent.intent_type == another_intent.intent_type
-                    and intent.threat == another_intent.threat
-                    and intent.host == another_intent.host
-                    and not intent.timedout()
-                ):
-                    return True
-            return False
+            key = self._intent_key(another_intent)
+            uid = self._intent_index.get(key)
+            if uid is None:
+                return False
+            intent = self._core_intents.get(uid)
+            if intent is None or intent.timedout():
+                # Lazily drop entries whose intent is gone or timed out
+                del self._intent_index[key]
+                return False
+            return True
+
+    @staticmethod
+    def _intent_key(intent: CoreIntent) -> IntentKey:
+        return (intent.intent_type, intent.threat, frozenset(intent.host))
+
+    def _intent_index_add(self, intent: CoreIntent) -> None:
+        if not intent.timedout():
+            self._intent_index[self._intent_key(intent)] = intent.get_uid()
+
+    def _intent_index_remove(self, intent: CoreIntent) -> None:
+        key = self._intent_key(intent)
+        if self._intent_index.get(key) == intent.get_uid():
+            del self._intent_index[key]
 
 
     """
@@ -83,6 +183,12 @@ class InMemoryStore:
     def threat_add(self, threat: DetectedThreat) -> None:
         with self._data_lock:
             self._threats[threat.uid] = threat
+            self._threat_index_add(threat)
+            self._threat_bucket_sync(threat)
+            self._view_invalidate(self.VIEW_THREATS)
+            heapq.heappush(self._threat_deadlines, (threat.end_time, threat.uid))
+            self.pipeline_schedule(threat.end_time)
+            self._dirty_threats.add(threat.uid)
             self._logger.info(f"Threat added: {threat.uid}")
 
     def threat_get(self, key: str) -> Optional[DetectedThreat]:
@@ -92,7 +198,16 @@ class InMemoryStore:
     def threat_update(self, key: str, threat: DetectedThreat) -> bool:
         with self._data_lock:
             if key in self._threats:
+                self._threat_index_remove(self._threats[key])
+                if self._threats[key] is not threat:
+                    heapq.heappush(self._threat_deadlines, (threat.end_time, key))
+                    self.pipeline_schedule(threat.end_time)
                 self._threats[key] = threat
+                self._threat_index_add(threat)
+                self._view_invalidate(self.VIEW_THREATS)
+                # The threat may have changed status (e.g. renewed as REINCIDENT)
+                self._threat_bucket_sync(threat)
+                self._dirty_threats.add(key)
                 self._logger.info(f"Threat updated: {key}")
                 return True
             return False
@@ -100,43 +215,195 @@ class InMemoryStore:
     def threat_remove(self, key: str) -> bool:
         with self._data_lock:
             self._logger.info(f"Threat removed: {key}")
-            return self._threats.pop(key, None) is not None
+            threat = self._threats.pop(key, None)
+            if threat is None:
+                return False
+            self._threat_index_remove(threat)
+            self._threat_bucket_remove(key)
+            self._dirty_threats.discard(key)
+            self._threat_locks.pop(key, None)
+            self._threat_measurements.pop(key, None)
+            self._view_invalidate(self.VIEW_THREATS)
+            return True
 
     def threat_get_all(self) -> List[DetectedThreat]:
+        return list(self._view(self.VIEW_THREATS, lambda: tuple(self._threats.values())))
+
+    def threat_get_by_status(self, *statuses: DetectedThreat.ThreatStatus) -> List[DetectedThreat]:
+        """
+        Get the threats in the given statuses, without scanning the other ones.
+        """
         with self._data_lock:
-            return [threat for threat in self._threats.values()]
+            return [self._threats[uid] for status in statuses for uid in self._threat_buckets[status]]
+
+    def threat_get_active(self) -> List[DetectedThreat]:
+        """
+        Get the threats that are not mitigated yet.
+        """
+        return self.threat_get_by_status(
+            DetectedThreat.ThreatStatus.NEW,
+            DetectedThreat.ThreatStatus.UNDER_EMULATION,
+            DetectedThreat.ThreatStatus.UNDER_MITIGATION,
+            DetectedThreat.ThreatStatus.REINCIDENT,
+        )
+
+    def threat_count_by_status(self) -> Dict[DetectedThreat.ThreatStatus, int]:
+        """
+        Get the number of threats in each status in O(1).
+        """
+        return dict(self._view(
+            self.VIEW_THREAT_COUNTS,
+            lambda: {status: len(uids) for status, uids in self._threat_buckets.items()},
+        ))
 
     def threat_clear_all(self) -> None:
         with self._data_lock:
             self._threats.clear()
+            self._threat_index.clear()
+            self._threat_status.clear()
+            for uids in self._threat_buckets.values():
+                uids.clear()
+            self._dirty_threats.clear()
+            self._threat_deadlines.clear()
+            self._threat_locks.clear()
+            self._threat_measurements.clear()
+            self._view_invalidate(self.VIEW_THREATS, self.VIEW_THREAT_COUNTS)
+
+    def threat_set_status(self, threat: DetectedThreat, new_status: DetectedThreat.ThreatStatus) -> None:
+        """
+        Change the status of a threat and schedule it for the next pipeline cycle.
+        This is the status-transition API: it keeps the indexes, status buckets
+        and counters of the store in step with the threat.
+        """
+        with self._data_lock:
+            self._threat_transition(threat, new_status)
+        self.pipeline_notify()
+
+    def _threat_transition(self, threat: DetectedThreat, new_status: DetectedThreat.ThreatStatus) -> None:
+        was_mitigated = threat.status == DetectedThreat.ThreatStatus.MITIGATED
+        threat.update_status(new_status)
+        if not self._threat_is_active(threat):
+            self._threat_index_remove(threat)
+        if threat.uid in self._threats:
+            self._threat_bucket_sync(threat)
+        if new_status == DetectedThreat.ThreatStatus.MITIGATED and not was_mitigated:
+            self._terminal_threats.append((threat.last_update, threat.uid))
+            # No DT job is evaluated for a mitigated threat (e.g. expired while under emulation)
+            self._dt_job_archive(threat.uid)
+        self._dirty_threats.add(threat.uid)
+
+    def _threat_bucket_sync(self, threat: DetectedThreat) -> None:
+        # Move the threat to the bucket of its current status
+        previous = self._threat_status.get(threat.uid)
+        if previous == threat.status:
+            return
+        if previous is not None:
+            self._threat_buckets[previous].discard(threat.uid)
+        self._threat_buckets[threat.status].add(threat.uid)
+        self._threat_status[threat.uid] = threat.status
+        self._view_invalidate(self.VIEW_THREAT_COUNTS)
+
+    def _threat_bucket_remove(self, key: str) -> None:
+        previous = self._threat_status.pop(key, None)
+        if previous is not None:
+            self._threat_buckets[previous].discard(key)
+            self._view_invalidate(self.VIEW_THREAT_COUNTS)
+
+    def threat_mark_dirty(self, key: str, notify: bool = True) -> None:
+        """
+        Schedule a threat to be visited in the next pipeline cycle.
+        """
+        with self._data_lock:
+            if key in self._threats:
+                self._dirty_threats.add(key)
+        if notify:
+            self.pipeline_notify()
+
+    def threat_lock(self, key: str) -> threading.RLock:
+        """
+        Get the lock that serializes the changes of a threat and of its DT jobs
+        (pipeline workers, DTE requests, IA-NDT answers and watchdog), e.g.:
+            with store.threat_lock(threat.uid):
+                ...
+        The store lock is taken inside it: never take a threat lock while
+        holding the store lock (e.g. in a batch()).
+        """
+        with self._data_lock:
+            lock = self._threat_locks.get(key)
+            if lock is None:
+                lock = self._threat_locks[key] = threading.RLock()
+            return lock
+
+    def threat_pop_dirty(self) -> List[DetectedThreat]:
+        """
+        Get the threats changed since the last call and reset the change set.
+        """
+        with self._data_lock:
+            dirty, self._dirty_threats = self._dirty_threats, set()
+            return [self._threats[uid] for uid in dirty if uid in self._threats]
     
     def threat_locate(self, another_threat: DetectedThreat) -> Optional[str]:
+        """
+        Return the uid of the active (not mitigated nor expired) threat with the
+        same type, name and hosts, or None. Uses the threat index, so the lookup
+        is O(1).
+        """
         with self._data_lock:
-            for threat in self._threats.values():
-                if (
-                    threat.threat_type == another_threat.threat_type
-                    and threat.threat_name == another_threat.threat_name
-                    and threat.hosts == another_threat.hosts
-                    and threat.status
-                    in [
-                        DetectedThreat.ThreatStatus.NEW,
-                        DetectedThreat.ThreatStatus.UNDER_EMULATION,
-                        DetectedThreat.ThreatStatus.UNDER_MITIGATION,
-                        DetectedThreat.ThreatStatus.REINCIDENT,
-                    ]
-                    and not threat.is_expired()
-                ):
-                    return threat.uid
-            return None
+            key = self._threat_key(another_threat)
+            uid = self._threat_index.get(key)
+            if uid is None:
+                return None
+            threat = self._threats.get(uid)
+            if threat is None or not self._threat_is_active(threat):
+                # Lazily drop entries whose threat is gone, mitigated or expired
+                del self._threat_index[key]
+                return None
+            return uid
+
+    @staticmethod
+    def _threat_key(threat: DetectedThreat) -> ThreatKey:
+        return (threat.threat_type, threat.threat_name, frozenset(threat.hosts))
+
+    @staticmethod
+    def _threat_is_active(threat: DetectedThreat) -> bool:
+        return (
+            threat.status
+            in [
+                DetectedThreat.ThreatStatus.NEW,
+                DetectedThreat.ThreatStatus.UNDER_EMULATION,
+                DetectedThreat.ThreatStatus.UNDER_MITIGATION,
+                DetectedThreat.ThreatStatus.REINCIDENT,
+            ]
+            and not threat.is_expired()
+        )
+
+    def _threat_index_add(self, threat: DetectedThreat) -> None:
+        if self._threat_is_active(threat):
+            self._threat_index[self._threat_key(threat)] = threat.uid
+
+    def _threat_index_remove(self, threat: DetectedThreat) -> None:
+        key = self._threat_key(threat)
+        if self._threat_index.get(key) == threat.uid:
+            del self._threat_index[key]
 
     def expire_old_threats(self) -> None:
+        """
+        Set the threats whose timeout passed as MITIGATED. Only the threats
+        whose deadline is due are visited.
+        """
         with self._data_lock:
-            for threat in list(self._threats.values()):
-                if threat.is_expired():
-                    threat.status = DetectedThreat.ThreatStatus.MITIGATED
-                    # Should update the "Last Update?"
-                    threat.last_update = int(datetime.now().timestamp())
-                    self._logger.info(f"Threat expired: {threat.uid}")
+            now = datetime.now().timestamp()
+            while self._threat_deadlines and self._threat_deadlines[0][0] < now:
+                _, uid = heapq.heappop(self._threat_deadlines)
+                threat = self._threats.get(uid)
+                if (
+                    threat is None
+                    or threat.status == DetectedThreat.ThreatStatus.MITIGATED
+                    or not threat.is_expired()
+                ):
+                    continue
+                self._threat_transition(threat, DetectedThreat.ThreatStatus.MITIGATED)
+                self._logger.info(f"Threat expired: {threat.uid}")
 
 
     """
@@ -145,6 +412,7 @@ class InMemoryStore:
     def mitigation_add(self, action: MitigationAction) -> None:
         with self._data_lock:
             self._available_actions[action.uid] = action
+            self._view_invalidate(*self.CATALOGUE_VIEWS)
             self._logger.debug(f"Mitigation action added: {action.uid} -- {action.name}")
 
 
@@ -154,14 +422,54 @@ class InMemoryStore:
 
 
     def mitigation_get_all(self) -> List[MitigationAction]:
-        with self._data_lock:
-            return [action for action in self._available_actions.values()]
+        return list(self._view(self.VIEW_MITIGATIONS, lambda: tuple(self._available_actions.values())))
 
     
+    def mitigation_get_by_threat(self) -> Mapping[str, Tuple[MitigationAction, ...]]:
+        """
+        Get the catalogue indexed by threat name (threat name -> mitigation actions),
+        in catalogue order. The index is rebuilt only when the catalogue changes.
+        """
+        return self._view(self.VIEW_THREAT_CATALOGUE, self._build_threat_catalogue)
+
+    def mitigation_supported_threats(self) -> FrozenSet[str]:
+        """
+        Get the names of the threats handled by at least one mitigation action.
+        """
+        return self._view(
+            self.VIEW_SUPPORTED_THREATS, lambda: frozenset(self.mitigation_get_by_threat())
+        )
+
+    def mitigation_get_candidates(self, category: str, threat_name: str) -> Tuple[MitigationAction, ...]:
+        """
+        Get the mitigation actions of a category that handle a threat, sorted by
+        priority (ascending). The index is rebuilt only when the catalogue changes.
+        """
+        index = self._view(self.VIEW_RECOMMENDATIONS, self._build_recommendations)
+        return index.get((getattr(category, "value", category), threat_name), ())
+
+    def _build_recommendations(self) -> Mapping[Tuple[str, str], Tuple[MitigationAction, ...]]:
+        # Keyed by the category value: str enums do not hash like their values
+        index: Dict[Tuple[str, str], List[MitigationAction]] = {}
+        for action in self._available_actions.values():
+            for threat in action.threats:
+                index.setdefault((action.category.value, threat), []).append(action)
+        return MappingProxyType({
+            key: tuple(sorted(actions, key=lambda m: m.priority)) for key, actions in index.items()
+        })
+
+    def _build_threat_catalogue(self) -> Mapping[str, Tuple[MitigationAction, ...]]:
+        catalogue: Dict[str, List[MitigationAction]] = {}
+        for action in self._available_actions.values():
+            for threat in action.threats:
+                catalogue.setdefault(threat, []).append(action)
+        return MappingProxyType({threat: tuple(actions) for threat, actions in catalogue.items()})
+
     def mitigation_update(self, key: str, action: MitigationAction) -> bool:
         with self._data_lock:
             if key in self._available_actions:
                 self._available_actions[key] = action
+                self._view_invalidate(*self.CATALOGUE_VIEWS)
                 self._logger.debug(f"Mitigation action updated: {key}")
                 return True
             return False     
@@ -174,6 +482,7 @@ class InMemoryStore:
             if threat_id not in self._associations:
                 self._associations[threat_id] = []
             self._associations[threat_id].append(mitigation)
+            self._association_uids.setdefault(threat_id, set()).add(mitigation.uid)
             self._logger.debug(f"Association added for intent {threat_id} with mitigation {mitigation.uid} -- {mitigation.name}")
 
 
@@ -181,11 +490,28 @@ class InMemoryStore:
         with self._data_lock:
             return self._associations.get(threat_id)
 
+    def association_get_uids(self, threat_id: str) -> FrozenSet[str]:
+        """
+        Get the uids of the mitigation actions associated with a threat.
+        """
+        with self._data_lock:
+            return frozenset(self._association_uids.get(threat_id, ()))
+
 
     def association_update(self, threat_id: str, mitigation: MitigationAction) -> bool:
+        """
+        Replace the associated mitigation with the same uid (e.g. after tuning it).
+        """
         with self._data_lock:
             if threat_id in self._associations:
-                self._associations[threat_id] = mitigation
+                mitigations = self._associations[threat_id]
+                for index in range(len(mitigations)):
+                    if mitigations[index].uid == mitigation.uid:
+                        mitigations[index] = mitigation
+                        break
+                else:
+                    mitigations.append(mitigation)
+                    self._association_uids.setdefault(threat_id, set()).add(mitigation.uid)
                 self._logger.debug(f"Association updated for intent {threat_id} with mitigation {mitigation.uid}")
                 return True
             return False
@@ -196,37 +522,52 @@ class InMemoryStore:
     """
     def dt_job_add(self, job: DTJob) -> None:
         with self._data_lock:
-            # Throw an exception if a DTJob with the same threat_id already exists
-            # for existing_job in self._dt_jobs:
-            #     if existing_job.threat_id == job.threat_id:
-            #         raise Exception(f"DTJob with threat_id {job.threat_id} already exists.")
-            self._dt_jobs.append(job)
+            self._dt_job_file(job)
+            self._view_invalidate(self.VIEW_DT_JOBS)
             self._logger.debug(f"IA-NDT job added: {job.uid}")
 
 
     def dt_job_update(self, job_id: str, updated_job: DTJob) -> bool:
         with self._data_lock:
-            for index in range(len(self._dt_jobs)):
-                if self._dt_jobs[index].uid == job_id:
-                    self._dt_jobs[index] = updated_job
-                    self._logger.debug(f"IA-NDT job updated: {job_id}")
-                    return True
-            return False
+            job = self._dt_jobs.get(job_id) or self._expired_dt_jobs.get(job_id)
+            if job is None:
+                return False
+            if updated_job.status == DTJob.JobStatus.EXPIRED and job_id not in self._expired_dt_jobs:
+                self._terminal_dt_jobs.append((datetime.now().timestamp(), job_id))
+            self._dt_job_unfile(job)
+            self._dt_job_file(updated_job)
+            self._view_invalidate(self.VIEW_DT_JOBS)
+            self._logger.debug(f"IA-NDT job updated: {job_id}")
+            return True
 
 
     def dt_job_get(self, job_id: str) -> Optional[DTJob]:
         with self._data_lock:
-            for job in self._dt_jobs:
-                if job.uid == job_id and job.status not in [DTJob.JobStatus.EXPIRED]:
-                    return job
-            return None
+            return self._dt_jobs.get(job_id)
 
     def dt_job_get_by_threat(self, threat_id: str) -> Optional[DTJob]:
         with self._data_lock:
-            for job in self._dt_jobs:
-                if job.threat_id == threat_id and job.status not in [DTJob.JobStatus.EXPIRED]:
-                    return job
-            return None
+            jobs = self._dt_jobs_by_threat.get(threat_id)
+            return next(iter(jobs.values())) if jobs else None
+
+    def dt_job_get_all_by_threat(self, threat_id: str, expired: bool = False) -> List[DTJob]:
+        """
+        Get the jobs of a threat (one per mitigation action simulated for it),
+        after its expired jobs if `expired` is True.
+        """
+        with self._data_lock:
+            jobs = list(self._dt_jobs_by_threat.get(threat_id, {}).values())
+            if expired:
+                jobs = list(self._expired_dt_jobs_by_threat.get(threat_id, {}).values()) + jobs
+            return jobs
+
+    def dt_job_threat_measurement(self, threat_id: str) -> Optional[float]:
+        """
+        Get the latest KPI measured before the mitigation by a job of a threat
+        (live or archived), or None. The lookup is O(1).
+        """
+        # Reading a single dictionary entry is atomic, no lock needed
+        return self._threat_measurements.get(threat_id)
 
 
     def dt_job_exists(self, job: DTJob) -> bool:
@@ -234,45 +575,334 @@ class InMemoryStore:
         Check if there there is already a job for the same threat and action.
         """
         with self._data_lock:
-            for existing_job in self._dt_jobs:
-                if existing_job.threat_id == job.threat_id and \
-                    existing_job.mitigation_id == job.mitigation_id and \
-                    existing_job.status not in [DTJob.JobStatus.EXPIRED]:
-                    return True
-            return False
+            return (job.threat_id, job.mitigation_id) in self._dt_job_index
 
     def dt_job_get_all(self, expired: bool = False) -> List[DTJob]:
-        with self._data_lock:
-            return [job for job in self._dt_jobs if job.status not in [DTJob.JobStatus.EXPIRED] or expired]
+        jobs = self._view(
+            self.VIEW_DT_JOBS, lambda: (tuple(self._dt_jobs.values()), tuple(self._expired_dt_jobs.values()))
+        )
+        return list(jobs[1] + jobs[0]) if expired else list(jobs[0])
 
 
     def dt_job_delete(self, thread_id: str) -> bool:
         """
-        Delete a DTJob from the list using the DTJob.thread_id.
+        Delete the DTJobs of a threat (DTJob.thread_id).
         Returns True if a job was deleted, False otherwise.
         """
         with self._data_lock:
-            for idx, job in enumerate(self._dt_jobs):
-                if job.threat_id == thread_id and job.status not in [DTJob.JobStatus.EXPIRED]:
-                    self._dt_jobs[idx].status = DTJob.JobStatus.EXPIRED
-                    self._logger.debug(f"IA-NDT job deleted: {job.uid}")
-                    return True
-            return False
+            return bool(self._dt_job_archive(thread_id))
+
+
+    def dt_job_on_archive(self, callback: Callable[[str], None]) -> None:
+        """
+        Register a function called with the uid of each DT job moved to the archive.
+        It is called with the store lock held. A function is only registered once.
+        """
+        with self._data_lock:
+            if callback not in self._dt_job_archive_hooks:
+                self._dt_job_archive_hooks.append(callback)
+
+
+    def _dt_job_archive(self, threat_id: str) -> List[DTJob]:
+        # Move the live jobs of a threat to the archive (called with the lock held)
+        jobs = list(self._dt_jobs_by_threat.get(threat_id, {}).values())
+        now = datetime.now().timestamp()
+        for job in jobs:
+            self._dt_job_unfile(job)
+            job.status = DTJob.JobStatus.EXPIRED
+            self._dt_job_file(job)
+            self._terminal_dt_jobs.append((now, job.uid))
+            self._logger.debug(f"IA-NDT job deleted: {job.uid}")
+            for callback in self._dt_job_archive_hooks:
+                callback(job.uid)
+        if jobs:
+            self._view_invalidate(self.VIEW_DT_JOBS)
+        return jobs
+
+    def _dt_job_file(self, job: DTJob) -> None:
+        if job.kpi_before is not None:
+            self._threat_measurements[job.threat_id] = job.kpi_before
+        # Expired jobs go to the archive, the others to the indexes of the live jobs
+        if job.status == DTJob.JobStatus.EXPIRED:
+            self._expired_dt_jobs[job.uid] = job
+            self._expired_dt_jobs_by_threat.setdefault(job.threat_id, {})[job.uid] = job
+            return
+        self._dt_jobs[job.uid] = job
+        self._dt_jobs_by_threat.setdefault(job.threat_id, {})[job.uid] = job
+        self._dt_job_index[(job.threat_id, job.mitigation_id)] = job.uid
+
+    def _dt_job_unfile(self, job: DTJob) -> None:
+        if self._expired_dt_jobs.pop(job.uid, None) is not None:
+            self._dt_job_by_threat_remove(self._expired_dt_jobs_by_threat, job)
+            return
+        self._dt_jobs.pop(job.uid, None)
+        self._dt_job_by_threat_remove(self._dt_jobs_by_threat, job)
+        key = (job.threat_id, job.mitigation_id)
+        if self._dt_job_index.get(key) == job.uid:
+            del self._dt_job_index[key]
+
+    @staticmethod
+    def _dt_job_by_threat_remove(by_threat: Dict[str, Dict[str, DTJob]], job: DTJob) -> None:
+        jobs = by_threat.get(job.threat_id)
+        if jobs is not None:
+            jobs.pop(job.uid, None)
+            if not jobs:
+                del by_threat[job.threat_id]
+
+
+    """
+    Compaction of terminal records (retention policy)
+    """
+    def compact(self, cutoff: float) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Remove the records that reached a terminal state before `cutoff` (epoch seconds):
+        mitigated threats (with their associations), timed out intents and expired DT jobs.
+        Threats with live DT jobs are kept until their jobs are expired.
+        Returns the removed records as dictionaries, grouped by kind.
+        """
+        removed = {"threats": [], "intents": [], "dt_jobs": []}
+        with self._data_lock:
+            busy = []
+            while self._terminal_threats and self._terminal_threats[0][0] < cutoff:
+                entry = self._terminal_threats.popleft()
+                uid = entry[1]
+                threat = self._threats.get(uid)
+                if threat is None or threat.status != DetectedThreat.ThreatStatus.MITIGATED:
+                    continue
+                if uid in self._dt_jobs_by_threat:
+                    # The IA-NDT may still be working on the threat: kept for the next compaction
+                    busy.append(entry)
+                    continue
+                del self._threats[uid]
+                self._view_invalidate(self.VIEW_THREATS)
+                self._threat_index_remove(threat)
+                self._threat_bucket_remove(uid)
+                self._dirty_threats.discard(uid)
+                self._threat_locks.pop(uid, None)
+                self._threat_measurements.pop(uid, None)
+                record = threat.to_dict()
+                record["associations"] = [m.to_dict() for m in self._associations.pop(uid, [])]
+                self._association_uids.pop(uid, None)
+                removed["threats"].append(record)
+            self._terminal_threats.extendleft(reversed(busy))
+
+            for uid, intent in list(self._core_intents.items()):
+                if intent.end_time < cutoff:
+                    del self._core_intents[uid]
+                    self._view_invalidate(self.VIEW_INTENTS)
+                    self._intent_index_remove(intent)
+                    removed["intents"].append(intent.to_dict())
+
+            while self._terminal_dt_jobs and self._terminal_dt_jobs[0][0] < cutoff:
+                job = self._expired_dt_jobs.get(self._terminal_dt_jobs.popleft()[1])
+                if job is not None:
+                    self._dt_job_unfile(job)
+                    removed["dt_jobs"].append(job.to_dict())
+            if removed["dt_jobs"]:
+                self._view_invalidate(self.VIEW_DT_JOBS)
+        return removed
 
 
     """
-    Controls the availability of the IA-NDT
+    KPI baselines measured by the IA-NDT (shared by the jobs that monitor the same element)
     """
-    def dt_is_available(self) -> bool:
+    def kpi_baseline_get(self, key: BaselineKey, max_age: float) -> Optional[float]:
+        """
+        Get the KPI value measured for a key, if it is not older than max_age seconds.
+        """
+        # Reading a single dictionary entry is atomic, no lock needed
+        baseline = self._kpi_baselines.get(key)
+        if baseline is None or baseline[1] < datetime.now().timestamp() - max_age:
+            return None
+        return baseline[0]
+
+    def kpi_baseline_set(self, key: BaselineKey, value: float) -> None:
         with self._data_lock:
-            return self._dt_available
+            self._kpi_baselines[key] = (value, datetime.now().timestamp())
+            self._logger.debug(f"KPI baseline of {key} set to {value}")
+
+    @staticmethod
+    def _kpi_baseline_to_dict(key: BaselineKey, baseline: Tuple[float, float]) -> Dict[str, Any]:
+        return {"key": list(key), "value": baseline[0], "measured_at": baseline[1]}
 
-    def dt_set_available(self) -> None:
-        self._logger.debug("Setting IA-NDT to available")
+
+    """
+    Controls the wake-up of the intent pipeline
+    """
+    def pipeline_notify(self) -> None:
+        """
+        Signal the intent pipeline that there is work to do.
+        """
+        self._pipeline_event.set()
+
+    def pipeline_schedule(self, deadline: float) -> None:
+        """
+        Register a point in time (epoch seconds) at which the pipeline must run,
+        e.g. when a threat or an intent expires.
+        """
         with self._data_lock:
-            self._dt_available = True
+            heapq.heappush(self._pipeline_deadlines, deadline)
 
-    def dt_set_busy(self) -> None:
-        self._logger.debug("Setting IA-NDT to busy")
+    def pipeline_next_deadline(self, since: float) -> Optional[float]:
+        """
+        Return the earliest scheduled deadline not handled by a pipeline cycle
+        started at `since`, discarding the ones that are already handled.
+        """
+        with self._data_lock:
+            while self._pipeline_deadlines and self._pipeline_deadlines[0] < since:
+                heapq.heappop(self._pipeline_deadlines)
+            return self._pipeline_deadlines[0] if self._pipeline_deadlines else None
+
+    def pipeline_wait(self, timeout: float) -> bool:
+        """
+        Block until the pipeline is notified or the timeout expires.
+        Returns True if the pipeline was notified.
+        """
+        notified = self._pipeline_event.wait(timeout)
+        self._pipeline_event.clear()
+        return notified
+
+
+    """
+    Controls whether the IBI might be compromised (e.g. intent spoofing detected by the CAS)
+    """
+    def ibi_is_compromised(self) -> bool:
+        return self._ibi_compromised
+
+    def ibi_set_compromised(self, compromised: bool) -> None:
+        self._logger.debug(f"Setting IBI compromised: {compromised}")
+        with self._data_lock:
+            self._ibi_compromised = compromised
+
+
+    """
+    Batches of operations
+    """
+    def batch(self) -> threading.RLock:
+        """
+        Hold the store lock across several operations, e.g.:
+            with store.batch():
+                ...
+        The lock is reentrant, so the store methods can be called inside the block.
+        """
+        return self._data_lock
+
+
+    """
+    Copy-on-write read views
+    Readers (dashboard, stats endpoints) get an immutable snapshot of a collection
+    without taking the lock. Writers drop the view of the collection they change
+    (and bump its generation), and the next reader rebuilds it. The copy is made
+    outside the lock, so writers are not held up by it; it is only made again
+    under the lock if a writer changed the collection in the meantime.
+    """
+    def _view(self, name: str, build) -> Any:
+        view = self._views.get(name)
+        if view is not None:
+            return view
+        # Taking the lock waits for a write in progress to finish
+        with self._data_lock:
+            generation = self._view_generations.get(name, 0)
+        try:
+            view = build()
+        except RuntimeError:
+            # A collection changed size during the copy
+            view = None
+        with self._data_lock:
+            if view is None or self._view_generations.get(name, 0) != generation:
+                view = self._views.get(name)
+                if view is None:
+                    view = build()
+            self._views[name] = view
+        return view
+
+    def _view_invalidate(self, *names: str) -> None:
+        # Called by the writers while holding the lock
+        for name in names:
+            self._views.pop(name, None)
+            self._view_generations[name] = self._view_generations.get(name, 0) + 1
+
+
+    """
+    Export and import of the whole state (used by the persistent backends)
+    """
+    def export_state(self) -> Dict[str, Any]:
+        """
+        Get the state of the store as plain dictionaries.
+        The mitigation catalogue is not included: it is loaded from the configuration.
+        """
+        with self._data_lock:
+            return {
+                "intents": [intent.to_dict() for intent in self._core_intents.values()],
+                "threats": [threat.to_dict() for threat in self._threats.values()],
+                "associations": {
+                    threat_id: [m.to_dict() for m in mitigations]
+                    for threat_id, mitigations in self._associations.items()
+                },
+                "dt_jobs": [job.to_dict() for job in self.dt_job_get_all(expired=True)],
+                "kpi_baselines": [
+                    self._kpi_baseline_to_dict(key, baseline) for key, baseline in self._kpi_baselines.items()
+                ],
+                "ibi_compromised": self._ibi_compromised,
+            }
+
+    def import_state(self, state: Dict[str, Any]) -> None:
+        """
+        Replace the intents, threats, associations and DT jobs with the given state
+        (as returned by export_state). Restored threats are visited in the next
+        pipeline cycle.
+        """
         with self._data_lock:
-            self._dt_available = False
\ No newline at end of file
+            self.intent_clear_all()
+            self.threat_clear_all()
+            self._associations.clear()
+            self._association_uids.clear()
+            self._terminal_threats.clear()
+            self._terminal_dt_jobs.clear()
+            now = datetime.now().timestamp()
+
+            for data in state.get("intents", []):
+                intent = CoreIntent.from_dict(data)
+                self._core_intents[intent.uid] = intent
+                self._intent_index_add(intent)
+                self.pipeline_schedule(intent.end_time)
+
+            threats = [DetectedThreat.from_dict(data) for data in state.get("threats", [])]
+            for threat in sorted(threats, key=lambda t: t.last_update):
+                self._threats[threat.uid] = threat
+                self._threat_index_add(threat)
+                self._threat_bucket_sync(threat)
+                if threat.status == DetectedThreat.ThreatStatus.MITIGATED:
+                    self._terminal_threats.append((threat.last_update, threat.uid))
+                else:
+                    heapq.heappush(self._threat_deadlines, (threat.end_time, threat.uid))
+                    self.pipeline_schedule(threat.end_time)
+                    self._dirty_threats.add(threat.uid)
+
+            for threat_id, mitigations in state.get("associations", {}).items():
+                self._associations[threat_id] = [MitigationAction.from_dict(m) for m in mitigations]
+                self._association_uids[threat_id] = {m.uid for m in self._associations[threat_id]}
+
+            self._dt_jobs.clear()
+            self._dt_jobs_by_threat.clear()
+            self._dt_job_index.clear()
+            self._expired_dt_jobs.clear()
+            self._expired_dt_jobs_by_threat.clear()
+            self._threat_measurements.clear()
+            for data in state.get("dt_jobs", []):
+                job = DTJob.from_dict(data)
+                self._dt_job_file(job)
+                if job.status == DTJob.JobStatus.EXPIRED:
+                    self._terminal_dt_jobs.append((now, job.uid))
+
+            self._kpi_baselines = {
+                tuple(data["key"]): (data["value"], data["measured_at"]) for data in state.get("kpi_baselines", [])
+            }
+            if config.IBI_RESTORE_COMPROMISED:
+                self._ibi_compromised = state.get("ibi_compromised", False)
+            self._view_invalidate(*self.VIEWS)
+            self._logger.info(
+                f"State restored: {len(self._core_intents)} intents, {len(self._threats)} threats, "
+                f"{len(self._dt_jobs) + len(self._expired_dt_jobs)} IA-NDT jobs"
+            )
+        self.pipeline_notify()
@@ -1,11 +1,17 @@
+import hashlib
 import json
-import requests
+import math
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
 import config
 from constants import Const
 from models.core_models import CoreIntent, MitigationAction
 from recommender import Recommender
 from utils.log_config import setup_logging
 from data.store import InMemoryStore
+from utils.cache import TTLCache
+from utils.http_client import HTTPClient
 
 class CASClient:
     """
@@ -22,6 +28,22 @@ class CASClient:
     CAS_RATE_LIMITTING_INC = 1
     CAS_API_LIMITTING_INC = 100
 
+    # Tuning metrics (shared by all the clients)
+    _metrics_lock = threading.Lock()
+    _tuning_metrics: Dict[str, Any] = {
+        "converged": 0,
+        "rejected": 0,
+        "exhausted": 0,
+        "rounds": 0,
+        "converged_rounds": 0,
+        "linear_rounds": 0,
+        "rounds_histogram": {},
+    }
+
+    # Verdicts of CAS by message fingerprint (shared by all the clients)
+    _verdicts = TTLCache(config.CAS_CACHE_TTL, config.CAS_CACHE_MAX_ENTRIES)
+    _verdicts_compromised = False
+
     _cas_actions = {
         # "rate_limiting": "router_rate_limiting",
     }
@@ -32,6 +54,7 @@ class CASClient:
             "Content-Type": "application/json",
         }
         self.cas_url = config.CAS_URL
+        self._http = HTTPClient.for_service("cas")
         self._recommender = Recommender()
         self._store = InMemoryStore()
         if self.cas_url and self.cas_url != "":
@@ -41,43 +64,127 @@ class CASClient:
             self.enabled = False
             self._logger.info(f"Integration to CKB is disabled.")
 
-    def tune_mitigation(self, mitigation_action: MitigationAction, error_msg: str = ""):
+    def validate_and_tune(self, intent: CoreIntent, mitigation_action: MitigationAction) -> Tuple[str, int]:
         """
-        This method tunes the fields of the given mitigation action to match the expected format
-        required by the Compliance Assurance Service (CAS).
+        Validate a mitigation action with CAS and, while it is only partially compliant,
+        tune its rate/limit until CAS accepts it.
+
+        The value is raised in exponential steps (the first one estimated from the
+        'pass_percentage' returned by CAS) until CAS accepts it, and then bisected down
+        to the smallest accepted value (in multiples of the increment of the field).
+        The search stops after 'max_rounds' CAS calls or 'timeout' seconds; if no
+        accepted value was found by then, the action is rejected.
 
         Args:
-            mitigation_action (MitigationAction): The mitigation action object whose fields need to be tuned.
+            intent (CoreIntent): The intent object containing threat and context information.
+            mitigation_action (MitigationAction): The mitigation action, tuned in place.
 
         Returns:
-            MitigationAction: The tuned mitigation action with updated fields as required by CAS.
+            Tuple[str, int]: The validation result (VALID, INVALID) and the number of tuning rounds.
         """
         # TODO: use graphRAG to send context to LLM and tune the fields using generative AI
-        if mitigation_action.name in  ["rate_limiting", "dns_rate_limiting"]:
-            if 'rate' in mitigation_action.parameters.keys():
-                rate_value = mitigation_action.parameters['rate']
-                rate = 0
-                if isinstance(rate_value, str) and rate_value.endswith('mbps'):
-                    rate = int(''.join(filter(str.isdigit, rate_value)))
-                else:
-                    rate = int(rate_value)
-                # Update the field with the new rate
-                mitigation_action.parameters['rate'] = rate + self.CAS_RATE_LIMITTING_INC
-
-        if mitigation_action.name in  ["api_rate_limiting"]:
-            if 'limit' in mitigation_action.parameters.keys():
-                rate_value = mitigation_action.parameters['limit']
-                rate = 0
-                if isinstance(rate_value, str) and rate_value.endswith('requests per minute'):
-                    rate = int(''.join(filter(str.isdigit, rate_value)))
-                else:
-                    rate = int(rate_value)
-                # Update the field with the new rate
-                mitigation_action.parameters['limit'] = rate + self.CAS_API_LIMITTING_INC
+        result, score = self._validate(intent, mitigation_action)
+        if result != self.PARTIAL:
+            return result, 0
+        tunable = self._tunable_field(mitigation_action)
+        if tunable is None:
+            self._logger.warning(f"CAS validation is PARTIAL but mitigation {mitigation_action.name} cannot be tuned.")
+            self._record_tuning("rejected", 0)
+            return self.INVALID, 0
+
+        field, increment = tunable
+        start = self._parse_value(mitigation_action.parameters[field])
+        deadline = time.monotonic() + config.CAS_TUNING_TIMEOUT
+        low, high = start, None  # Highest value found partial, lowest value found valid
+        step = self._first_step(start, score, increment)
+        rounds = 0
+        while rounds < config.CAS_TUNING_MAX_ROUNDS and time.monotonic() < deadline:
+            if high is None:
+                candidate = low + step
+            elif high - low > increment:
+                candidate = low + (high - low) // increment // 2 * increment
+            else:
+                break
+            mitigation_action.parameters[field] = candidate
+            result, score = self._validate(intent, mitigation_action)
+            rounds += 1
+            self._logger.debug(f"CAS tuning round {rounds}: {field}={candidate} -> {result}")
+            if result == self.VALID:
+                high = candidate
+            elif result == self.PARTIAL:
+                low = candidate
+                step *= 2
+            else:
+                self._record_tuning("rejected", rounds)
+                return self.INVALID, rounds
+
+        if high is None:
+            self._logger.warning(f"CAS tuning of mitigation {mitigation_action.uid} gave up after {rounds} rounds.")
+            self._record_tuning("exhausted", rounds)
+            return self.INVALID, rounds
+        mitigation_action.parameters[field] = high
+        self._logger.info(f"CAS tuning of mitigation {mitigation_action.uid} converged to {field}={high} in {rounds} rounds.")
+        # Rounds of the former linear search (one increment per round)
+        self._record_tuning("converged", rounds, (high - start) // increment)
+        return self.VALID, rounds
+
+    @classmethod
+    def get_tuning_metrics(cls) -> Dict[str, Any]:
+        """
+        Get the metrics of the tuning of the partially compliant mitigation actions
+        and of the cache of CAS verdicts.
+        """
+        with cls._metrics_lock:
+            metrics = dict(cls._tuning_metrics)
+            metrics["rounds_histogram"] = dict(cls._tuning_metrics["rounds_histogram"])
+        tunings = metrics["converged"] + metrics["rejected"] + metrics["exhausted"]
+        metrics["average_rounds"] = metrics["rounds"] / tunings if tunings else 0
+        metrics["cas_calls_saved"] = metrics["linear_rounds"] - metrics["converged_rounds"]
+        metrics["cache"] = cls._verdicts.get_metrics()
+        return metrics
+
+    @classmethod
+    def _record_tuning(cls, outcome: str, rounds: int, linear_rounds: int = 0) -> None:
+        with cls._metrics_lock:
+            cls._tuning_metrics[outcome] += 1
+            cls._tuning_metrics["rounds"] += rounds
+            histogram = cls._tuning_metrics["rounds_histogram"]
+            histogram[rounds] = histogram.get(rounds, 0) + 1
+            if outcome == "converged":
+                cls._tuning_metrics["converged_rounds"] += rounds
+                cls._tuning_metrics["linear_rounds"] += linear_rounds
+
+    def _tunable_field(self, mitigation_action: MitigationAction) -> Optional[Tuple[str, int]]:
+        """
+        Get the field tuned for CAS and its increment (None if the action cannot be tuned).
+        """
+        if mitigation_action.name in ["rate_limiting", "dns_rate_limiting"]:
+            field, increment = "rate", self.CAS_RATE_LIMITTING_INC
+        elif mitigation_action.name in ["api_rate_limiting"]:
+            field, increment = "limit", self.CAS_API_LIMITTING_INC
+        else:
+            return None
+        if field not in mitigation_action.parameters:
+            return None
+        return field, increment
+
+    @staticmethod
+    def _parse_value(value) -> int:
+        # Values can have units (e.g. '10mbps', '100 requests per minute')
+        if isinstance(value, str) and not value.isdigit():
+            return int(''.join(filter(str.isdigit, value)))
+        return int(value)
 
-        # return the tuned mitigation action
-        return mitigation_action
-                    
+    @staticmethod
+    def _first_step(value: int, pass_percentage: Optional[int], increment: int) -> int:
+        """
+        Estimate the first step from the compliance reported by CAS, assuming it
+        grows with the value (e.g. a value with 50% compliance is doubled).
+        """
+        if not pass_percentage or not 0 < pass_percentage < 100 or value <= 0:
+            return increment
+        missing = value * (100 - pass_percentage) / pass_percentage
+        return max(1, math.ceil(missing / increment)) * increment
 
     def validate(self, intent: CoreIntent, mitigation_action: MitigationAction):
         """
@@ -96,15 +203,26 @@ class CASClient:
         Returns:
             str: One of the class constants (VALID, INVALID, PARTIAL) indicating the validation result.
         """
-        doc_body = self._cas_message(intent, mitigation_action)
-        doc_body = json.dumps(doc_body)
+        return self._validate(intent, mitigation_action)[0]
+
+    def _validate(self, intent: CoreIntent, mitigation_action: MitigationAction) -> Tuple[str, Optional[int]]:
+        """
+        Same as validate, but also returns the 'pass_percentage' of a PARTIAL result.
+        """
+        message = self._cas_message(intent, mitigation_action)
+        doc_body = json.dumps(message)
         if not self.enabled:
             self._logger.warning(f"CAS is not enabled. Sending data to logging system.")
             self._logger.info(f"Document body: " + doc_body)
-            return self.VALID
+            return self.VALID, None
         else:
+            key = self._fingerprint(message)
+            verdict = self._cached_verdict(key)
+            if verdict is not None:
+                self._logger.debug(f"CAS verdict of mitigation {mitigation_action.uid} found in cache: {verdict[0]}")
+                return verdict
             self._logger.debug(f"CAS message to be sent: {json.dumps(doc_body, indent=4)}")
-            response = requests.post(
+            response = self._http.post(
                 f"{self.cas_url}",
                 headers=self.headers,
                 data=doc_body,
@@ -118,37 +236,64 @@ class CASClient:
                 # Checking for intent spoofing
                 if "continue" in answer.keys() and bool(answer.get("continue")) == False:
                     self._logger.debug(f"CAS validation failed for intent spoofing. Attack of type {intent.threat} not detected.")
-                    self._store._ibi_compromised = True
-                    return self.INVALID
+                    self._store.ibi_set_compromised(True)
+                    return self.INVALID, None
 
                 # Mitigation is 100% compliant
                 if bool(answer.get("allow")) == True:
                     self._logger.info(f"CAS validation SUCCEEDED: Mitigation: {mitigation_action.uid}")
-                    return self.VALID
+                    return self._cache_verdict(key, (self.VALID, None))
                 elif bool(answer.get("allow")) == False:
-                    if int(answer.get("pass_percentage")) == 0: 
+                    pass_percentage = int(answer.get("pass_percentage"))
+                    if pass_percentage == 0:
                         # Mitigation is 0% compliant (should select another mitigation action)
                         self._logger.info(f"CAS validation FAILED: Mitigation: {mitigation_action.uid}")
-                        return self.INVALID
+                        return self._cache_verdict(key, (self.INVALID, None))
                     else:
                         self._logger.info(f"CAS validation SUCCEEDED (PARTIAL): Mitigation: {mitigation_action.uid}")
                         self._logger.debug(f"CAS validation if partial. Got: {answer}")
                         # Mitigation is partially compliant (mitigation actions should be tuned)
-                        return self.PARTIAL
+                        return self._cache_verdict(key, (self.PARTIAL, pass_percentage))
                 else:
                     self._logger.warning(f"CAS validation FAILED! Mitigation = {mitigation_action.uid}")
                     self._logger.debug(f"CAS response: {answer}")
             
             if response.status_code == 500:
-                self._store._ibi_compromised = True
-                return self.INVALID
+                self._store.ibi_set_compromised(True)
+                return self.INVALID, None
 
             else:
                 self._logger.error(f"CAS validation FAILED with status code: {response.status_code}")
                 self._logger.error(f"CAS response: {response.text}")
-                return self.INVALID
+                return self.INVALID, None
             
 
+    """
+    Cache of the CAS verdicts
+    """
+    @staticmethod
+    def _fingerprint(message: Dict[str, Any]) -> str:
+        """
+        Canonical hash of a CAS message. The intent id is left out, so the same
+        action for the same threat and hosts gets the same fingerprint.
+        """
+        body = {key: value for key, value in message["input"].items() if key != "intent_id"}
+        canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode()).hexdigest()
+
+    def _cached_verdict(self, key: str) -> Optional[Tuple[str, Optional[int]]]:
+        # The verdicts are dropped when the IBI is flagged (or no longer flagged) as compromised
+        compromised = self._store.ibi_is_compromised()
+        with self._metrics_lock:
+            if compromised != CASClient._verdicts_compromised:
+                CASClient._verdicts_compromised = compromised
+                self._verdicts.clear()
+        return self._verdicts.get(key)
+
+    def _cache_verdict(self, key: str, verdict: Tuple[str, Optional[int]]) -> Tuple[str, Optional[int]]:
+        self._verdicts.set(key, verdict)
+        return verdict
+
     def _cas_message(self, intent: CoreIntent, mitigation_action: MitigationAction) -> str:
         """
         Generate the CAS message body for validation.
@@ -194,7 +339,7 @@ class CASClient:
             "intent_type": intent_type_mapping.get(intent.intent_type.value),
             "threat": intent.threat,
             "attacked_host": intent.host,
-            "mitigation_host": self._recommender.get_mitigation_host(intent, mitigation_action),
+            "mitigation_host": self._recommender.get_mitigation_host(mitigation_action),
             "action": action_template,
             "duration": str(intent.duration),
             "intent_id": intent.uid
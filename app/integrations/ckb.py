@@ -1,13 +1,17 @@
 import requests
 import config
 import json
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional
 from utils.log_config import setup_logging
-from difflib import get_close_matches
+from utils.cache import SingleFlight, TTLCache
+from utils.http_client import HTTPClient
+from utils.similarity import SimilarityIndex
 
 class CKB:
 
     _logger = setup_logging(__name__)
-    _attacks = [
+    _attacks = (
         "ntp_dos",
         "pfcf_dos",
         "dns_reflection_amplification",
@@ -22,10 +26,18 @@ class CKB:
         "signaling_pfcp",
         "poisoning_and_amplification",
         "network_exposure",
-    ]
+    )
+    _attack_index = SimilarityIndex(_attacks)
+    DEFAULT_ATTACK = "hello_world"
+    SIMILARITY_CUTOFF = 0.3
+
+    # Answers of the CKB by attack name and the queries in flight (shared by all the clients)
+    _responses = TTLCache(config.CKB_CACHE_TTL, config.CKB_CACHE_MAX_ENTRIES)
+    _queries = SingleFlight()
 
     def __init__(self):
         self.ckb_url = config.CKB_URL
+        self._http = HTTPClient.for_service("ckb")
         self.headers = { 
             "accept": "application/json",
             "content-type": "application/json",
@@ -41,36 +53,83 @@ class CKB:
         """
         Get an attack by its name or a similar name.
         """
-        # Use built-in string similarity matching
-        matches = get_close_matches(attack_name, self._attacks, n=1, cutoff=0.3)
-        if matches:
-            self._logger.debug(f"Found similar attack: {matches[0]} for input: {attack_name}")
-            return matches[0]
+        match = self._resolve_attack(attack_name, self._attack_index)
+        if match is not None:
+            self._logger.debug(f"Found similar attack: {match} for input: {attack_name}")
+            return match
         else:
             self._logger.debug(f"Using default attack name")
-            return "hello_world"
+            return self.DEFAULT_ATTACK
+
+    @classmethod
+    def set_attacks(cls, attacks: Iterable[str]) -> None:
+        """
+        Replace the attack names known by the IBI (e.g. with the taxonomy of the CKB).
+        """
+        index = SimilarityIndex(attacks)
+        cls._attacks = index.names
+        cls._attack_index = index
+        cls._logger.info(f"Indexed {len(index)} attack names.")
 
+    @classmethod
+    @lru_cache(maxsize=1024)
+    def _resolve_attack(cls, attack_name: str, index: SimilarityIndex) -> Optional[str]:
+        # Same matching as difflib.get_close_matches (memoized per name and index of attacks)
+        matches = index.close_matches(attack_name, n=1, cutoff=cls.SIMILARITY_CUTOFF)
+        return matches[0] if matches else None
 
-    def query_ckb(self, attack_name=None):
+    def query_ckb(self, attack_name=None) -> Optional[Any]:
+        """
+        Query the CKB about an attack. The answers are cached for a while, and
+        concurrent queries about the same attack share a single request.
+        Returns the answer of the CKB (None if it is disabled or unreachable).
+        """
         req_body = {}
         attack_name = self.get_attack_by_similarity(attack_name)
         req_body = {"attack_name": attack_name}
         if self.enabled:
-            try:
-
-                response = requests.post(
-                    f"{self.ckb_url}",
-                    timeout=2,
-                    headers=self.headers,
-                    json=req_body,
-                )
-                response.raise_for_status()
-                self._logger.debug(f"CKB query successful for attacks. Message sent: {json.dumps(req_body, indent=4)}")
-                self._logger.info(f"CKB query successful for attacks.")
-            except requests.exceptions.RequestException as e:
-                self._logger.error(f"Error querying CKB for attacks: {e}")
+            answer = self._responses.get(attack_name)
+            if answer is not None:
+                self._logger.debug(f"CKB answer for {attack_name} found in cache.")
+                return answer
+            return self._queries.do(attack_name, lambda: self._post_query(req_body))
         else:
             self._logger.warning(
                 f"CKB integration is disabled. Sending query to logging system."
             )
-            self._logger.info(f"CKB query body: {req_body}")
\ No newline at end of file
+            self._logger.info(f"CKB query body: {req_body}")
+            return None
+
+    def _post_query(self, req_body: Dict[str, Any]) -> Optional[Any]:
+        try:
+            response = self._http.post(
+                f"{self.ckb_url}",
+                timeout=2,
+                headers=self.headers,
+                json=req_body,
+            )
+            response.raise_for_status()
+            self._logger.debug(f"CKB query successful for attacks. Message sent: {json.dumps(req_body, indent=4)}")
+            self._logger.info(f"CKB query successful for attacks.")
+        except requests.exceptions.RequestException as e:
+            # Errors are not cached (the next cycle tries again)
+            self._logger.error(f"Error querying CKB for attacks: {e}")
+            return None
+        try:
+            answer = response.json()
+        except ValueError:
+            answer = response.text
+        self._responses.set(req_body["attack_name"], answer)
+        return answer
+
+    @classmethod
+    def get_metrics(cls) -> Dict[str, Any]:
+        """
+        Get the metrics of the cache of CKB answers and of the similarity lookups.
+        """
+        similarity = cls._resolve_attack.cache_info()
+        return {
+            "cache": cls._responses.get_metrics(),
+            "queries": cls._queries.get_metrics(),
+            "similarity": {"hits": similarity.hits, "misses": similarity.misses, "entries": similarity.currsize},
+        }
@@ -0,0 +1,314 @@
+import threading
+from bisect import bisect_left
+from collections import deque
+from datetime import datetime
+from enum import Enum
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import config
+from models.core_models import DTJob
+from utils.log_config import setup_logging
+
+
+class DurationHistogram:
+    """
+    Histogram of durations (seconds): count per bucket (upper bound), total and maximum.
+    """
+
+    BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        seconds = max(seconds, 0.0)
+        self.counts[bisect_left(self.BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={bound}s" for bound in self.BUCKETS] + [f">{self.BUCKETS[-1]}s"]
+        return {
+            "buckets": dict(zip(labels, self.counts)),
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+        }
+
+
+class DTTask:
+    """
+    A request to the IA-NDT for a DT job: the measurement of the KPI before
+    the mitigation, or the simulation of the mitigation action.
+    The IA-NDT answers with the id of the job, used as the request id.
+    """
+
+    class TaskType(Enum):
+        MEASUREMENT = "MEASUREMENT"
+        SIMULATION = "SIMULATION"
+
+    def __init__(self, job: DTJob, task_type: "DTTask.TaskType", topology: str):
+        self.job = job
+        self.task_type = task_type
+        self.topology = topology
+        self.enqueued_at = datetime.now().timestamp()
+        self.dispatched_at: Optional[float] = None
+        self.deadline: Optional[float] = None
+        # Times the request was sent
+        self.attempts = 0
+        # Key of the KPI baseline measured by a measurement task
+        self.baseline_key: Optional[Tuple[str, ...]] = None
+
+    @property
+    def request_id(self) -> str:
+        return self.job.uid
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "threat_id": self.job.threat_id,
+            "type": self.task_type.value,
+            "topology": self.topology,
+            "enqueued_at": self.enqueued_at,
+            "dispatched_at": self.dispatched_at,
+            "deadline": self.deadline,
+            "attempts": self.attempts,
+        }
+
+
+class DTScheduler:
+    """
+    Scheduler of the requests sent to the IA-NDT.
+
+    Tasks wait in a FIFO queue and are dispatched while their digital twin
+    topology has free slots ('max_concurrent' requests in flight, which can be
+    set per topology). The tasks of a job run one after the other (measurement,
+    then simulation), and the measurements of a threat are not run at the same
+    time (the IA-NDT cannot handle them).
+
+    A watchdog (expire) frees the slot of a request without an answer after
+    'task_timeout' seconds and queues it again, up to 'task_retries' times;
+    then the task fails and its job is given up by the caller. The time spent
+    by the tasks in the queue and in flight is kept in histograms.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(DTScheduler, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._logger = setup_logging(__name__)
+        self.max_concurrent = config.IADT_MAX_CONCURRENT
+        self.topology_limits: Dict[str, int] = dict(config.IADT_TOPOLOGIES)
+        self.task_timeout = config.IADT_TASK_TIMEOUT
+        self.max_retries = config.IADT_TASK_RETRIES
+        self._tasks_lock = threading.Lock()
+        self._queue: Deque[DTTask] = deque()
+        self._in_flight: Dict[str, DTTask] = {}  # Request id -> task
+        self._running: Dict[str, int] = {}  # Topology -> tasks in flight
+        self._metrics = {
+            "dispatched": 0,
+            "completed": 0,
+            "timed_out": 0,
+            "retried": 0,
+            "failed": 0,
+            "measurements_reused": 0,
+            "dt_seconds_saved": 0.0,
+        }
+        self._time_in_queue = DurationHistogram()
+        self._time_in_flight = DurationHistogram()
+        self._initialized = True
+
+    def limit(self, topology: str) -> int:
+        return self.topology_limits.get(topology, self.max_concurrent)
+
+    def enqueue(self, job: DTJob, task_type: DTTask.TaskType, topology: str) -> DTTask:
+        task = DTTask(job, task_type, topology)
+        with self._tasks_lock:
+            self._queue.append(task)
+        return task
+
+    def clear(self) -> None:
+        with self._tasks_lock:
+            self._queue.clear()
+            self._in_flight.clear()
+            self._running.clear()
+
+    def take_ready(self) -> List[DTTask]:
+        """
+        Remove from the queue the tasks that can be sent now, and register them
+        as in flight (with their deadline).
+        """
+        ready = []
+        with self._tasks_lock:
+            now = datetime.now().timestamp()
+            measuring = {t.job.threat_id for t in self._in_flight.values() if t.task_type == DTTask.TaskType.MEASUREMENT}
+            waiting = deque()
+            while self._queue:
+                task = self._queue.popleft()
+                if task.job.status != DTJob.JobStatus.PENDING:
+                    # The job got its answers, was given up or expired while the task waited
+                    self._logger.debug(f"Dropping IA-NDT task {task.request_id} of {task.job.status.value} job")
+                    continue
+                if not self._can_start(task, measuring):
+                    waiting.append(task)
+                    continue
+                task.dispatched_at = now
+                task.deadline = now + self.task_timeout
+                task.attempts += 1
+                self._time_in_queue.observe(now - task.enqueued_at)
+                self._in_flight[task.request_id] = task
+                self._running[task.topology] = self._running.get(task.topology, 0) + 1
+                if task.task_type == DTTask.TaskType.MEASUREMENT:
+                    measuring.add(task.job.threat_id)
+                self._metrics["dispatched"] += 1
+                ready.append(task)
+            self._queue = waiting
+        return ready
+
+    def _can_start(self, task: DTTask, measuring: set) -> bool:
+        if self._running.get(task.topology, 0) >= self.limit(task.topology):
+            return False
+        # One request per job at a time, and the simulation needs the measurement
+        if task.request_id in self._in_flight:
+            return False
+        if task.task_type == DTTask.TaskType.SIMULATION:
+            return task.job.kpi_before is not None
+        return task.job.threat_id not in measuring
+
+    def complete(self, request_id: str) -> Optional[DTTask]:
+        """
+        Free the slot of a request that got an answer (or that needs no answer).
+        A late answer to a request queued again by the watchdog removes it from
+        the queue, so it is not sent once more.
+        Returns the task, or None if the request is neither in flight nor queued again.
+        """
+        with self._tasks_lock:
+            task = self._in_flight.pop(request_id, None)
+            if task is not None:
+                self._release(task)
+                self._time_in_flight.observe(datetime.now().timestamp() - task.dispatched_at)
+            else:
+                # Only the task that was already sent can be answered (not the
+                # simulation waiting for the measurement of the same job)
+                task = next((t for t in self._queue if t.request_id == request_id and t.attempts > 0), None)
+                if task is not None:
+                    self._queue.remove(task)
+            if task is not None:
+                self._metrics["completed"] += 1
+            return task
+
+    def discard(self, request_id: str) -> None:
+        """
+        Drop the tasks of a job (given up), queued or in flight.
+        """
+        with self._tasks_lock:
+            self._queue = deque(task for task in self._queue if task.request_id != request_id)
+            task = self._in_flight.pop(request_id, None)
+            if task is not None:
+                self._release(task)
+
+    def record_reused_measurement(self, request_id: str, seconds: float) -> None:
+        """
+        Free the slot of a measurement task that was not sent because a KPI
+        value was reused. It is not counted as dispatched nor completed.
+        """
+        with self._tasks_lock:
+            task = self._in_flight.pop(request_id, None)
+            if task is not None:
+                self._release(task)
+                self._metrics["dispatched"] -= 1
+            self._metrics["measurements_reused"] += 1
+            self._metrics["dt_seconds_saved"] += seconds
+
+    def expire(self, now: Optional[float] = None) -> List[DTTask]:
+        """
+        Watchdog: free the slots of the requests without an answer after their
+        deadline (the request or its answer is considered lost). They are queued
+        again while they have retries left.
+        Returns the tasks that failed (no retries left).
+        """
+        now = now if now is not None else datetime.now().timestamp()
+        with self._tasks_lock:
+            expired = [task for task in self._in_flight.values() if task.deadline <= now]
+            failed = []
+            for task in expired:
+                del self._in_flight[task.request_id]
+                self._release(task)
+                self._time_in_flight.observe(now - task.dispatched_at)
+                self._metrics["timed_out"] += 1
+                if task.attempts > self.max_retries:
+                    self._metrics["failed"] += 1
+                    failed.append(task)
+                    continue
+                task.dispatched_at = task.deadline = None
+                task.enqueued_at = now
+                self._queue.append(task)
+                self._metrics["retried"] += 1
+        for task in expired:
+            if task in failed:
+                self._logger.error(
+                    f"IA-NDT request {task.request_id} ({task.task_type.value}) got no answer after "
+                    f"{task.attempts} attempts. Giving up."
+                )
+            else:
+                self._logger.warning(
+                    f"IA-NDT request {task.request_id} ({task.task_type.value}) timed out. Queued again "
+                    f"(attempt {task.attempts} of {self.max_retries + 1})."
+                )
+        return failed
+
+    def _release(self, task: DTTask) -> None:
+        running = self._running.get(task.topology, 0) - 1
+        if running > 0:
+            self._running[task.topology] = running
+        else:
+            self._running.pop(task.topology, None)
+
+    def queue_size(self) -> int:
+        return len(self._queue)
+
+    def is_available(self) -> bool:
+        """
+        Whether a new request could be sent (some busy topology has a free slot,
+        or nothing is in flight).
+        """
+        with self._tasks_lock:
+            return not self._running or any(
+                running < self.limit(topology) for topology, running in self._running.items()
+            )
+
+    def get_state(self) -> Dict[str, Any]:
+        with self._tasks_lock:
+            topologies = {
+                topology: {"in_flight": 0, "queued": 0, "limit": limit}
+                for topology, limit in self.topology_limits.items()
+            }
+            for task in self._queue:
+                topologies.setdefault(task.topology, {"in_flight": 0, "queued": 0, "limit": self.limit(task.topology)})
+                topologies[task.topology]["queued"] += 1
+            for topology, running in self._running.items():
+                topologies.setdefault(topology, {"in_flight": 0, "queued": 0, "limit": self.limit(topology)})
+                topologies[topology]["in_flight"] = running
+            return {
+                "queue_size": len(self._queue),
+                "in_flight": {request_id: task.to_dict() for request_id, task in self._in_flight.items()},
+                "topologies": topologies,
+                "task_timeout": self.task_timeout,
+                "task_retries": self.max_retries,
+                **self._metrics,
+                "time_in_queue": self._time_in_queue.to_dict(),
+                "time_in_flight": self._time_in_flight.to_dict(),
+            }
@@ -3,115 +3,40 @@ import json
 import config
 import threading
 import time
-from enum import Enum
+from typing import List, Optional
 from constants import Const
 from utils.log_config import setup_logging
-from data.store import InMemoryStore
+from utils.http_client import HTTPClient
+from data.store import BaselineKey, InMemoryStore
+from integrations.dt_scheduler import DTScheduler, DTTask
+from integrations.iandt_messages import IANDTMessageTemplates, SIMULATION_TEMPLATES
 from models.core_models import DetectedThreat, MitigationAction, DTJob
 
 
 class ImpactAnalysisDT:
     """
     Class to interact with the Impact Analysis Digital Twin (IA-NDT).
-    It sends workflows to the IA-NDT and handles responses. The class implementas a queue
-    to ensure that only one request at time is sent to the IA-NDT.
+    It sends workflows to the IA-NDT and handles responses. The requests are
+    queued in the DTScheduler, which limits the requests in flight per topology.
     """
 
-    class JobType(Enum):
-        MEASUREMENT = "MEASUREMENT"
-        SIMULATION = "SIMULATION"
+    JobType = DTTask.TaskType
+    # Mitigation actions with a simulation template
+    SIMULATED_ACTIONS = tuple(SIMULATION_TEMPLATES)
 
     _store = None
     _logger = None
-    _queue = []   # List[(DTJob, JobType)]
-
-    # Class-level queue and worker to guarantee only one in-flight request
-
-    _messages = {
-        "block": {
-            "id": "",
-            "topology_name": "horse_ddos",
-            "attack": "DDoS_reverse",
-            "what-condition": {
-                "KPIs": {
-                    "element": {"node": "dns-c1", "interface": "eth1"},
-                    "metric": "packets-per-second",
-                    "duration": "15s",
-                }
-            },
-            "if-condition": {
-                "action": {
-                    "type": "block_pod_ip",
-                    "value": "internet",
-                    "unit": "*",
-                    "duration": "30s",
-                },
-                "element": {
-                    "node": "ceos2",
-                    "interface": "eth1",
-                    "network": "*",
-                    "ref": "ceos2_eth1_*",
-                },
-            },
-        },
-        "monitor": {
-            "id": "",
-            "topology_name": "horse_ddos",
-            "attack": "DDoS_reverse",
-            "what-condition": {
-                "KPIs": {
-                    "element": {"node": "dns-c1", "interface": "eth1"},
-                    "metric": "packets-per-second",
-                    "duration": "30s",
-                }
-            },
-            "if-condition": {
-                "action": {
-                    "type": "monitor",
-                    "value": "*",
-                    "unit": "*",
-                    "duration": "30s",
-                },
-                "element": {
-                    "node": "*",
-                    "interface": "*",
-                    "network": "*",
-                    "ref": "*_*_*",
-                },
-            },
-        },
-        "rate_limit": {
-            "id": "",
-            "topology_name": "horse_ddos",
-            "attack": "DDoS_reverse",
-            "what-condition": {
-                "KPIs": {
-                    "element": {"node": "dns-c1", "interface": "eth1"},
-                    "metric": "packets-per-second",
-                    "duration": "15s",
-                }
-            },
-            "if-condition": {
-                "action": {
-                    "type": "rate_limit",
-                    "value": "1",
-                    "unit": "mbps",
-                    "duration": "30s",
-                },
-                "element": {
-                    "node": "ceos2",
-                    "interface": "eth1",
-                    "network": "*",
-                    "ref": "ceos2_eth1_*",
-                },
-            },
-        },
-    }
+    # Compiled (read-only) messages, shared by all the requests
+    _templates = IANDTMessageTemplates()
 
     def __init__(self):
         self._store = InMemoryStore()
         self._logger = setup_logging(__name__)
         self.iadt_url = config.IADT_URL
+        self._http = HTTPClient.for_service("iadt")
+        self._scheduler = DTScheduler()
+        # The requests of the archived jobs (evaluated or mitigated threats) are not sent
+        self._store.dt_job_on_archive(self._scheduler.discard)
         self.headers = {
             "Accept": "application/json",
             "Content-Type": "application/json",
@@ -123,129 +48,241 @@ class ImpactAnalysisDT:
 
 
     def enqueue_simulation(self, threat: DetectedThreat, action: MitigationAction):
-        dt_job = DTJob(threat.uid, action.uid)
-        dt_job.set_mitigation_obj(action)
-        measure_task = tuple([dt_job, ImpactAnalysisDT.JobType.MEASUREMENT])
-        action_task = tuple([dt_job, ImpactAnalysisDT.JobType.SIMULATION])
-        
-        self._queue.append(measure_task)
-        self._queue.append(action_task)
-        self._logger.info(f"New job added to the queue: Threat: {threat.uid}, Action: {action.uid}")
+        self.enqueue_simulations(threat, [action])
+
+
+    def enqueue_simulations(self, threat: DetectedThreat, actions: List[MitigationAction]):
+        """
+        Queue the what-if simulation of several candidate actions for a threat.
+        They share the measurement of the KPI before the mitigation, which is
+        only requested for the first job.
+        """
+        for index, action in enumerate(actions):
+            dt_job = DTJob(threat.uid, action.uid)
+            dt_job.set_mitigation_obj(action)
+            self._store.dt_job_add(dt_job)
+            self._enqueue_job(dt_job, measure=index == 0)
+            self._logger.info(f"New job added to the queue: Threat: {threat.uid}, Action: {action.uid}")
+
+
+    def can_simulate(self, action: MitigationAction) -> bool:
+        """
+        Whether there is a simulation template for a mitigation action.
+        """
+        return self._templates.can_simulate(action.name)
+
+
+    def _enqueue_job(self, dt_job: DTJob, measure: bool) -> None:
+        if measure:
+            self._scheduler.enqueue(dt_job, ImpactAnalysisDT.JobType.MEASUREMENT, self._topology(dt_job, ImpactAnalysisDT.JobType.MEASUREMENT))
+        self._scheduler.enqueue(dt_job, ImpactAnalysisDT.JobType.SIMULATION, self._topology(dt_job, ImpactAnalysisDT.JobType.SIMULATION))
+
+
+    def restore_pending_jobs(self):
+        """
+        Enqueue again the tasks of the pending DT jobs restored from a persistent
+        store. Requests sent before the restart are considered lost.
+        """
+        self._scheduler.clear()
+        for dt_job in self._store.dt_job_get_all():
+            if dt_job.status != DTJob.JobStatus.PENDING:
+                continue
+            self._enqueue_job(dt_job, measure=dt_job.kpi_before is None)
+        if self._scheduler.queue_size():
+            self._logger.info(f"Restored {self._scheduler.queue_size()} IA-NDT tasks")
 
 
     def process_queued_jobs(self):
-        if self._queue and self._store.dt_is_available():
-            (current_job, job_type) = self._queue.pop(0)  # Task type is either MEASUREMENT or SIMULATION
-            if not self._store.dt_job_exists(current_job):
-                self._store.dt_job_add(current_job)
-            
-            if job_type == ImpactAnalysisDT.JobType.MEASUREMENT:
-                # if there is already a measurement value for the same threat, 
-                # copy the value and skipt the measurement task
-                # Workaround: IA-NDT cannot handle multiple measurement requests for the same threat
-                
-                for existing_dt_job in self._store.dt_job_get_all(expired=True):
-                    if existing_dt_job.threat_id == current_job.threat_id and existing_dt_job.kpi_before is not None:
-                        current_job.update_kpi_before(existing_dt_job.kpi_before)
-                        self._store.dt_job_update(current_job.uid, current_job)
-                        self._logger.debug(f"Skipping measurement task for threat {current_job.threat_id}")
-                        self._logger.debug(f"Threat already has a measurement KPI value")
-                        return
-                # If there is no measurement value for the same threat, send the measurement request
-                message = self._get_monitor_msg(current_job)
-            elif job_type == ImpactAnalysisDT.JobType.SIMULATION:
-                message = self._get_simulation_msg(current_job)
-            # Send the message via REST API
-            self.send_iandt_message(message)
-        else:
-            if len(self._queue) == 0:
+        # Free the slots of the requests that got no answer in time (sent again or given up)
+        for task in self._scheduler.expire():
+            with self._store.threat_lock(task.job.threat_id):
+                self._fail_task(task)
+        tasks = self._scheduler.take_ready()
+        if not tasks:
+            if self._scheduler.queue_size() == 0:
                 self._logger.debug("IA-NDT queue is empty waiting for next cycle")
-            if not self._store.dt_is_available():
+            else:
                 self._logger.debug("IA-NDT is not available, waiting for next cycle")
+            return
+        for task in tasks:
+            # The message is built under the lock of the threat (the jobs may be
+            # updated by an IA-NDT answer) and sent once it is released
+            with self._store.threat_lock(task.job.threat_id):
+                message = self._prepare_task(task)
+            if message is None:
+                continue
+            # Wake up the pipeline when the request times out
+            self._store.pipeline_schedule(task.deadline)
+            # Send the message via REST API
+            self.send_iandt_message(message)
 
-    
-    def _get_monitor_msg(self, dt_job: DTJob) -> dict:
+
+    def _prepare_task(self, task: DTTask) -> Optional[dict]:
         """
-        Send a measurement request to the Impact Analysis Digital Twin.
+        Get the message of a task taken from the scheduler, or None when no
+        request is needed (the task is then completed or discarded).
         """
-        # Get the threat name from the detected threat
-        threat_obj = self._store.threat_get(dt_job.threat_id)
-
-        if threat_obj.threat_name == "dns_amplification":
-            what_device = "ceos3"
-            what_iface = "eth2"
-        elif threat_obj.threat_name in ["ddos_download", "ddos_download_link", "ddos_downlink"]:
-            what_device = "dns-c1"
-            what_iface = "eth1"
-        else:
-            what_device = "ceos3"
-            what_iface = "eth2"
-
-        message = self._messages["monitor"]
-        message["id"] = dt_job.uid
-        message["attack"] = self._dt_attack_name(threat_obj.threat_name)
-        message["what-condition"]["KPIs"]["element"]["node"] = what_device
-        message["what-condition"]["KPIs"]["element"]["interface"] = what_iface
-        message["what-condition"]["KPIs"]["duration"] = "30s"
-        message["if-condition"]["action"]["duration"] = "30s"
+        current_job = task.job
+        if self._store.threat_get(current_job.threat_id) is None:
+            # The threat was removed while the task was waiting
+            self._logger.warning(f"Dropping IA-NDT task of job {current_job.uid}: threat {current_job.threat_id} not found")
+            self._scheduler.discard(task.request_id)
+            return None
+        if task.task_type == ImpactAnalysisDT.JobType.SIMULATION:
+            message = self._get_simulation_msg(current_job)
+            if message is None:
+                self._skip_simulation(task)
+            return message
+        message = self._get_monitor_msg(current_job)
+        if message is None:
+            self._scheduler.discard(task.request_id)
+            return None
+        # Reuse the measurement of the threat or a recent one of the same element for the same attack
+        # (also a workaround: IA-NDT cannot handle multiple measurement requests for the same threat)
+        task.baseline_key = self._baseline_key(message)
+        if self._reuse_measurement(current_job, task.baseline_key):
+            self._scheduler.record_reused_measurement(
+                task.request_id, self._duration(message["what-condition"]["KPIs"]["duration"])
+            )
+            # The simulation of the job can go in the next cycle
+            self._store.pipeline_notify()
+            return None
         return message
 
 
-    def _get_simulation_msg(self, dt_job: DTJob) -> dict:
+    def _fail_task(self, task: DTTask) -> None:
+        """
+        Give up the job of a request without an answer. A lost measurement also
+        fails the other jobs of the threat waiting for it (what-if candidates).
+        The pipeline then looks for another mitigation action.
+        """
+        failed_jobs = [task.job]
+        if task.task_type == ImpactAnalysisDT.JobType.MEASUREMENT:
+            failed_jobs += [
+                job for job in self._store.dt_job_get_all_by_threat(task.job.threat_id)
+                if job.uid != task.job.uid and job.kpi_before is None
+            ]
+        for job in failed_jobs:
+            self._scheduler.discard(job.uid)
+            if job.status != DTJob.JobStatus.PENDING:
+                # Answered or archived in the meantime (never file an archived job again)
+                continue
+            job.update_status(DTJob.JobStatus.FAILED)
+            self._store.dt_job_update(job.uid, job)
+            self._logger.warning(f"IA-NDT job {job.uid} failed (threat {job.threat_id})")
+        self._store.threat_mark_dirty(task.job.threat_id)
+
+
+    def _skip_simulation(self, task: DTTask) -> None:
+        """
+        Complete a job whose mitigation action cannot be simulated, without
+        improvement of the KPI (the action is not considered effective).
+        """
+        current_job = task.job
+        self._logger.warning(
+            f"No simulation template for mitigation action {current_job.mitigation_obj.name} (job {current_job.uid})"
+        )
+        self._scheduler.complete(task.request_id)
+        current_job.update_kpi_after(current_job.kpi_before)
+        current_job.update_status(DTJob.JobStatus.COMPLETED)
+        self._store.dt_job_update(current_job.uid, current_job)
+        self._store.threat_mark_dirty(current_job.threat_id)
+
+
+    def _reuse_measurement(self, current_job: DTJob, key: BaselineKey) -> bool:
         """
-        Send a simulation request to the Impact Analysis Digital Twin.
+        Set the KPI before the mitigation of a job from the latest measurement
+        of its threat (whatever its age, e.g. by another candidate action) or,
+        if there is none, from a measurement of the same element by another
+        threat in the last 'baseline_ttl' seconds.
+        """
+        baseline = self._store.dt_job_threat_measurement(current_job.threat_id)
+        if baseline is None and config.IADT_BASELINE_TTL > 0:
+            baseline = self._store.kpi_baseline_get(key, config.IADT_BASELINE_TTL)
+        if baseline is None:
+            return False
+        self.share_measurement(current_job.threat_id, baseline)
+        self._logger.debug(f"Skipping measurement task for threat {current_job.threat_id}")
+        self._logger.debug(f"Element {key} already has a measurement KPI value")
+        return True
+
+
+    def share_measurement(self, threat_id: str, value: float) -> None:
+        """
+        Set the KPI before the mitigation of the jobs of a threat that do not
+        have it yet: the candidate actions simulated for a threat share one
+        measurement (only the first job has a measurement task).
+        """
+        for job in self._store.dt_job_get_all_by_threat(threat_id):
+            if job.kpi_before is None:
+                job.update_kpi_before(value)
+                self._store.dt_job_update(job.uid, job)
+
+
+    @staticmethod
+    def _baseline_key(message: dict) -> BaselineKey:
+        """
+        Key of the KPI measured by a monitor message: (topology, attack, node, interface, metric).
+        """
+        kpis = message["what-condition"]["KPIs"]
+        return (
+            message["topology_name"],
+            message["attack"],
+            kpis["element"]["node"],
+            kpis["element"]["interface"],
+            kpis["metric"],
+        )
+
+
+    @staticmethod
+    def _duration(value: str) -> float:
+        """
+        Seconds of a duration of the IA-NDT messages (e.g. '30s', '2m').
+        """
+        units = {"s": 1, "m": 60, "h": 3600}
+        value = str(value).strip()
+        if value and value[-1] in units:
+            return float(value[:-1]) * units[value[-1]]
+        return float(value)
+
+
+    def _topology(self, dt_job: DTJob, job_type: "ImpactAnalysisDT.JobType") -> str:
+        """
+        Digital twin topology a task runs on (the one of its message template).
+        """
+        if job_type == ImpactAnalysisDT.JobType.SIMULATION and dt_job.mitigation_obj is not None:
+            return self._templates.topology(dt_job.mitigation_obj.name)
+        return self._templates.topology()
+
+
+    def _get_monitor_msg(self, dt_job: DTJob) -> Optional[dict]:
+        """
+        Measurement request for the Impact Analysis Digital Twin (None if the threat is gone).
         """
         # Get the threat name from the detected threat
-        threat_name = self._store.threat_get(dt_job.threat_id).threat_name
-        # Get the mitigation action from the store
-        mitigation_obj = dt_job.mitigation_obj  # Mitigation object from the job
+        threat = self._store.threat_get(dt_job.threat_id)
+        if threat is None:
+            return None
+        threat_name = threat.threat_name
+        return self._templates.monitor(dt_job.uid, threat_name, self._dt_attack_name(threat_name))
 
-        if mitigation_obj.name in ["dns_rate_limiting", "rate_limiting"]:
-            message = self._messages["rate_limit"]
-            
-            if threat_name == "dns_amplification":
-                message["what-condition"]["KPIs"]["element"]["node"] = "ceos3"
-                message["what-condition"]["KPIs"]["element"]["interface"] = "eth2"
-                message["if-condition"]["element"]["node"] = "ceos3"
-                message["if-condition"]["element"]["interface"] = "eth2"
-                message["if-condition"]["element"]["network"] = "*"
-                message["if-condition"]["element"]["ref"] = "ceos3_eth2_*"
-            
-            elif threat_name in ["ddos_download", "ddos_download_link", "ddos_downlink"]:
-                message["what-condition"]["KPIs"]["element"]["node"] = "dns-c1"
-                message["what-condition"]["KPIs"]["element"]["interface"] = "eth1"
-                message["if-condition"]["element"]["node"] = "ceos2"
-                message["if-condition"]["element"]["interface"] = "eth1"
-                message["if-condition"]["element"]["network"] = "*"
-                message["if-condition"]["element"]["ref"] = "ceos2_eth1_*"
-
-        elif mitigation_obj.name == "block_pod_address":
-            message = self._messages["block"]
-            if threat_name == "dns_amplification":
-                message["what-condition"]["KPIs"]["element"]["node"] = "ceos3"
-                message["what-condition"]["KPIs"]["element"]["interface"] = "eth2"
-                message["if-condition"]["action"]["value"] = "dns-c1"
-                message["if-condition"]["element"]["node"] = "ceos3"
-                message["if-condition"]["element"]["interface"] = "eth1"
-                message["if-condition"]["element"]["network"] = "*"
-                message["if-condition"]["element"]["ref"] = "ceos3_eth1_*"
-            
-            elif threat_name in ["ddos_download", "ddos_download_link", "ddos_downlink"]:
-                message["what-condition"]["KPIs"]["element"]["node"] = "dns-c1"
-                message["what-condition"]["KPIs"]["element"]["interface"] = "eth1"
-                message["if-condition"]["action"]["value"] = "internet"
-                message["if-condition"]["element"]["node"] = "ceos2"
-                message["if-condition"]["element"]["interface"] = "eth1"
-                message["if-condition"]["element"]["network"] = "*"
-                message["if-condition"]["element"]["ref"] = "ceos2_eth1_*"
-        # Alaways update the id of the DT Job
-        message["id"] = dt_job.uid
-        message["attack"] = self._dt_attack_name(threat_name)
-        return message
+
+    def _get_simulation_msg(self, dt_job: DTJob) -> Optional[dict]:
+        """
+        Simulation request for the Impact Analysis Digital Twin
+        (None if the mitigation action has no simulation template or the threat is gone).
+        """
+        # Get the threat name from the detected threat
+        threat = self._store.threat_get(dt_job.threat_id)
+        if threat is None:
+            return None
+        threat_name = threat.threat_name
+        return self._templates.simulation(
+            dt_job.uid, dt_job.mitigation_obj.name, threat_name, self._dt_attack_name(threat_name)
+        )
 
 
     def send_iandt_message(self, message: dict):
-        self._store.dt_set_busy()
         # Message to send to the Impact Analysis Digital Twin
         if not self.enabled:
             self._logger.warning(
@@ -258,7 +295,7 @@ class ImpactAnalysisDT:
                 self._schedule_mock_response(message)
         else:
             try:
-                response = requests.post(
+                response = self._http.post(
                     f"{self.iadt_url}/from_ibi",
                     headers=self.headers,
                     json=message,
@@ -266,7 +303,8 @@ class ImpactAnalysisDT:
                 response.raise_for_status()
                 self._logger.info(f"Message sent to IA-NDT. Response status: {response.status_code}")
             except requests.exceptions.RequestException as e:
-                print(f"Error sending workflow to Impact Analysis Digital Twin: {e}")
+                # The request stays in flight: the watchdog sends it again after its deadline
+                self._logger.error(f"Error sending workflow to Impact Analysis Digital Twin: {e}")
 
 
     def check_results(self, threat_id: str, kpi_before: float, kpi_after: float) -> bool:
@@ -276,6 +314,18 @@ class ImpactAnalysisDT:
         return kpi_after < kpi_before * Const.IADT_PPS_THRESHOLD
 
 
+    def best_result(self, dt_jobs: List[DTJob]) -> Optional[DTJob]:
+        """
+        Get the completed job with the lowest KPI after the mitigation among the
+        ones with good results (None if no result is good).
+        """
+        good = [
+            job for job in dt_jobs
+            if job.status == DTJob.JobStatus.COMPLETED and self.check_results(job.threat_id, job.kpi_before, job.kpi_after)
+        ]
+        return min(good, key=lambda job: job.kpi_after) if good else None
+
+
     def _dt_attack_name(self, from_threat: str) -> str:
         """
         Convert a threat name to an attack name for the Digital Twin.
@@ -309,7 +359,7 @@ class ImpactAnalysisDT:
             
             # Send POST request to the impact-analysis endpoint
             try:
-                response = requests.post(
+                response = self._http.post(
                     f"http://{Const.APP_HOST}:{Const.APP_PORT}/impact-analysis",
                     headers=self.headers,
                     json=mock_response,
@@ -0,0 +1,221 @@
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+
+def freeze(value: Any) -> Any:
+    """
+    Read-only copy of a JSON-like value (dicts become mapping proxies, lists tuples).
+    """
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """
+    Plain (mutable, JSON serializable) copy of a frozen value.
+    """
+    # Exact types: much faster than the isinstance checks of the abstract classes
+    if type(value) is MappingProxyType:
+        return {key: thaw(item) for key, item in value.items()}
+    if type(value) is tuple:
+        return [thaw(item) for item in value]
+    return value
+
+
+def overlay(base: Any, changes: Mapping[str, Any]) -> Any:
+    """
+    Frozen copy of 'base' with the (nested) values of 'changes' replaced.
+    """
+    merged = dict(base)
+    for key, value in changes.items():
+        if isinstance(value, Mapping) and isinstance(merged.get(key), Mapping):
+            merged[key] = overlay(merged[key], value)
+        else:
+            merged[key] = freeze(value)
+    return MappingProxyType(merged)
+
+
+# Messages understood by the IA-NDT (workflow of a measurement or of a mitigation action)
+BASE_TEMPLATES = freeze({
+    "block": {
+        "id": "",
+        "topology_name": "horse_ddos",
+        "attack": "DDoS_reverse",
+        "what-condition": {
+            "KPIs": {
+                "element": {"node": "dns-c1", "interface": "eth1"},
+                "metric": "packets-per-second",
+                "duration": "15s",
+            }
+        },
+        "if-condition": {
+            "action": {
+                "type": "block_pod_ip",
+                "value": "internet",
+                "unit": "*",
+                "duration": "30s",
+            },
+            "element": {
+                "node": "ceos2",
+                "interface": "eth1",
+                "network": "*",
+                "ref": "ceos2_eth1_*",
+            },
+        },
+    },
+    "monitor": {
+        "id": "",
+        "topology_name": "horse_ddos",
+        "attack": "DDoS_reverse",
+        "what-condition": {
+            "KPIs": {
+                "element": {"node": "dns-c1", "interface": "eth1"},
+                "metric": "packets-per-second",
+                "duration": "30s",
+            }
+        },
+        "if-condition": {
+            "action": {
+                "type": "monitor",
+                "value": "*",
+                "unit": "*",
+                "duration": "30s",
+            },
+            "element": {
+                "node": "*",
+                "interface": "*",
+                "network": "*",
+                "ref": "*_*_*",
+            },
+        },
+    },
+    "rate_limit": {
+        "id": "",
+        "topology_name": "horse_ddos",
+        "attack": "DDoS_reverse",
+        "what-condition": {
+            "KPIs": {
+                "element": {"node": "dns-c1", "interface": "eth1"},
+                "metric": "packets-per-second",
+                "duration": "15s",
+            }
+        },
+        "if-condition": {
+            "action": {
+                "type": "rate_limit",
+                "value": "1",
+                "unit": "mbps",
+                "duration": "30s",
+            },
+            "element": {
+                "node": "ceos2",
+                "interface": "eth1",
+                "network": "*",
+                "ref": "ceos2_eth1_*",
+            },
+        },
+    },
+})
+
+DOWNLINK_THREATS = ("ddos_download", "ddos_download_link", "ddos_downlink")
+
+
+def _what(node: str, interface: str) -> Dict[str, Any]:
+    return {"what-condition": {"KPIs": {"element": {"node": node, "interface": interface}}}}
+
+
+def _element(node: str, interface: str) -> Dict[str, Any]:
+    return {"element": {"node": node, "interface": interface, "network": "*", "ref": f"{node}_{interface}_*"}}
+
+
+# Element monitored for each threat (None: any other threat)
+MONITOR_OVERLAYS = {
+    "dns_amplification": _what("ceos3", "eth2"),
+    **{threat: _what("dns-c1", "eth1") for threat in DOWNLINK_THREATS},
+    None: _what("ceos3", "eth2"),
+}
+
+# Template of each simulated mitigation action and changes per threat (None: any other threat)
+SIMULATION_TEMPLATES = {
+    "rate_limiting": "rate_limit",
+    "dns_rate_limiting": "rate_limit",
+    "block_pod_address": "block",
+}
+SIMULATION_OVERLAYS = {
+    "rate_limit": {
+        "dns_amplification": {**_what("ceos3", "eth2"), "if-condition": _element("ceos3", "eth2")},
+        **{
+            threat: {**_what("dns-c1", "eth1"), "if-condition": _element("ceos2", "eth1")}
+            for threat in DOWNLINK_THREATS
+        },
+        None: {},
+    },
+    "block": {
+        "dns_amplification": {
+            **_what("ceos3", "eth2"),
+            "if-condition": {"action": {"value": "dns-c1"}, **_element("ceos3", "eth1")},
+        },
+        **{
+            threat: {
+                **_what("dns-c1", "eth1"),
+                "if-condition": {"action": {"value": "internet"}, **_element("ceos2", "eth1")},
+            }
+            for threat in DOWNLINK_THREATS
+        },
+        None: {},
+    },
+}
+
+
+class IANDTMessageTemplates:
+    """
+    Compiled templates of the IA-NDT messages.
+    The messages of each threat (measurement) and of each (mitigation action,
+    threat) pair (simulation) are built once, as read-only structures, from the
+    base templates and the overlays above. The message of a job is a plain copy
+    of the compiled one with the job id and the attack name, so the templates can
+    be used from several threads and the messages changed by their users.
+    """
+
+    def __init__(self):
+        self._monitor: Dict[Optional[str], Mapping[str, Any]] = {
+            threat: overlay(BASE_TEMPLATES["monitor"], changes)
+            for threat, changes in MONITOR_OVERLAYS.items()
+        }
+        self._simulation: Dict[Tuple[str, Optional[str]], Mapping[str, Any]] = {}
+        for action, template in SIMULATION_TEMPLATES.items():
+            for threat, changes in SIMULATION_OVERLAYS[template].items():
+                self._simulation[(action, threat)] = overlay(BASE_TEMPLATES[template], changes)
+
+    def can_simulate(self, action_name: str) -> bool:
+        return action_name in SIMULATION_TEMPLATES
+
+    def topology(self, action_name: Optional[str] = None) -> str:
+        """
+        Topology of the simulation of an action (of the measurements if no action is given).
+        """
+        template = SIMULATION_TEMPLATES.get(action_name, "monitor")
+        return BASE_TEMPLATES[template]["topology_name"]
+
+    def monitor(self, job_id: str, threat_name: str, attack: str) -> Dict[str, Any]:
+        compiled = self._monitor.get(threat_name, self._monitor[None])
+        return self._render(compiled, job_id, attack)
+
+    def simulation(self, job_id: str, action_name: str, threat_name: str, attack: str) -> Optional[Dict[str, Any]]:
+        """
+        Message of the simulation of an action (None if the action cannot be simulated).
+        """
+        compiled = self._simulation.get((action_name, threat_name)) or self._simulation.get((action_name, None))
+        if compiled is None:
+            return None
+        return self._render(compiled, job_id, attack)
+
+    @staticmethod
+    def _render(compiled: Mapping[str, Any], job_id: str, attack: str) -> Dict[str, Any]:
+        message = thaw(compiled)
+        message["id"] = job_id
+        message["attack"] = attack
+        return message
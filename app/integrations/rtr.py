@@ -10,7 +10,9 @@ import config
 from uuid import uuid4
 from utils.log_config import setup_logging
 from models.core_models import CoreIntent, MitigationAction
+from mitigation_templates import MitigationTemplates
 from recommender import Recommender
+from utils.http_client import HTTPClient
 
 
 class RTR:
@@ -31,6 +33,7 @@ class RTR:
         self.rtr_username = config.RTR_USER
         self.rtr_password = config.RTR_PASSWORD
         self.rtr_email = config.RTR_EMAIL
+        self._http = HTTPClient.for_service("rtr")
         self._enabled = bool(self.rtr_url and self.rtr_username and self.rtr_password)
         # call login method to authenticate
         self.access_token = ""
@@ -51,7 +54,7 @@ class RTR:
         }
 
         try:
-            response = requests.post(
+            response = self._http.post(
                 f"{self.rtr_url}/register",
                 headers=self.reg_headers,
                 data=json.dumps(reg_data),
@@ -100,8 +103,8 @@ class RTR:
         }
         # POST LOGIN REQUEST
         try:
-            # Use requests.post with the correct URL, headers, and data as in the curl command
-            response = requests.post(
+            # POST with the correct URL, headers, and data as in the curl command
+            response = self._http.post(
                 f"{self.rtr_url}/login", headers=login_headers, data=login_data
             )
             response.raise_for_status()  # Raise an HTTPError for bad responses (4xx or 5xx)
@@ -150,7 +153,7 @@ class RTR:
             mitigation_action.category == MitigationAction.MitigationCategory.PREVENTION
             and intent.threat == "ddos_downlink"
         ):
-            attacked_host = self._recommender._resolve_hostnames("ue_panel")
+            attacked_host = MitigationTemplates.resolve_hostname("ue_panel")
         else:
             attacked_host = intent.host[0] if intent.host else ""
 
@@ -159,9 +162,7 @@ class RTR:
             "intent_type": intent.intent_type.value,
             "threat": intent.threat,
             "attacked_host": attacked_host,
-            "mitigation_host": self._recommender.get_mitigation_host(
-                intent, mitigation_action
-            ),
+            "mitigation_host": self._recommender.get_mitigation_host(mitigation_action),
             "action": action_template,
             "duration": intent.duration,
             "intent_id": str(uuid4()),
@@ -182,7 +183,7 @@ class RTR:
         }
         self._logger.debug(f"Sending workflow to RTR: {json.dumps(workflow, indent=4)}")
         try:
-            response = requests.post(
+            response = self._http.post(
                 f"{self.rtr_url}/actions",
                 headers=headers_for_action_post,
                 json=workflow,
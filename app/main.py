@@ -1,7 +1,7 @@
 import threading
 import uvicorn
 import config
-from time import sleep
+from time import sleep, time
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
@@ -10,6 +10,8 @@ from utils.log_config import setup_logging
 from routers import ping, intents, iandt, dashboard, stats
 from pipeline import IntentPipeline
 from controllers.mitigations_controller import MitigationsController
+from data.snapshot import SnapshotManager
+from utils.http_client import HTTPClient
 
 """
 This code is executed when applications starts
@@ -22,17 +24,25 @@ logger = setup_logging(__name__)
 The pipeline is satefull, so it should existst during the whole application lifecycle
 """
 pipeline = IntentPipeline()
+snapshots = SnapshotManager()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Restore the state saved before the last shutdown (warm restart)
+    restored = snapshots.load()
+    # Resume the IA-NDT jobs restored from a snapshot or a persistent store
+    pipeline.iadt.restore_pending_jobs()
+    snapshots.start()
     # Initialize the loop that processes intents
     # Start threads
-    t_intent = threading.Thread(target=process_intents, daemon=True)
+    t_intent = threading.Thread(target=process_intents, args=(restored,), daemon=True)
     t_intent.start()
     # Start processing requests
     yield
     # Stop running threads
     t_intent.join(1)
+    snapshots.stop()
+    await HTTPClient.aclose_all()
 
 """
 IBI API Server
@@ -50,18 +60,26 @@ app.mount("/static", StaticFiles(directory="app/dashboard/static"), name="static
 """
 Backround taks
 """
-def process_intents():
+def process_intents(warm_start: bool = False):
     # pipeline = IntentPipeline()
-    sleep(10)
+    if not warm_start:
+        sleep(10)
+    event_driven = config.IBI_PIPELINE_MODE != Const.PIPELINE_MODE_POLLING
+    logger.info(f"Intent pipeline running in {'event' if event_driven else 'polling'} mode")
     while(True):
         # logger.info("hello world from intents loop")
+        started = time()
         try:
             # Process intents
             pipeline.process_intents()
         except Exception as e:
             logger.error(f"Error processing intent: {e}")
             raise e
-        sleep(Const.THREAD_INTENT_WAIT)
+        if event_driven:
+            # Run again as soon as there is work or a threat/intent expires
+            pipeline.wait_for_work(started)
+        else:
+            sleep(Const.THREAD_INTENT_WAIT)
     
 
 def populate_database():
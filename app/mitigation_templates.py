@@ -0,0 +1,205 @@
+import json
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import yaml
+import config
+from models.core_models import DetectedThreat, MitigationAction
+from utils.log_config import setup_logging
+
+logger = setup_logging(__name__)
+
+# A compiled value: evaluated with the threat and the mitigation action being configured
+Resolver = Callable[[Optional[DetectedThreat], MitigationAction], Any]
+# A compiled rule: (condition on the threat or None, [(field, value)])
+Rule = Tuple[Optional[Callable[[DetectedThreat], bool]], List[Tuple[str, Resolver]]]
+
+# Directives that depend on the threat or on the action, so they cannot be computed ahead
+DYNAMIC_DIRECTIVES = ("threat", "threat_name_token", "param")
+TRANSFORMS = {
+    "capitalize": str.capitalize,
+    "upper": str.upper,
+    "lower": str.lower,
+}
+
+
+class MitigationTemplates:
+    """
+    Declarative templates of the mitigation action parameters and hosts.
+    The templates are read from resources/mitigation_templates.yml and from the
+    'mitigation_templates' section of the configuration, which takes precedence.
+    They are compiled once into dispatch tables keyed by (category, name) and name.
+    Values that do not depend on the threat (e.g. resolved hostnames) are computed
+    when the templates are compiled.
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        if cls._instance is None:
+            with cls._lock:
+                if cls._instance is None:
+                    cls._instance = super(MitigationTemplates, cls).__new__(cls)
+                    cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+        self._parameters: Dict[Tuple[str, str], List[Rule]] = {}
+        self._hosts: Dict[str, Resolver] = {}
+        self.load(self._read_templates())
+        self._initialized = True
+
+    @staticmethod
+    def _read_templates() -> Dict[str, Any]:
+        """
+        Merge the default templates with the ones of the configuration.
+        """
+        with open(config.MITIGATION_TEMPLATES_FILE) as f:
+            defaults = yaml.safe_load(f) or {}
+        overrides = config.MITIGATION_TEMPLATES or {}
+        parameters = {}
+        for template in defaults.get("parameters", []) + overrides.get("parameters", []):
+            parameters[(template.get("category"), template.get("name"))] = template
+        hosts = dict(defaults.get("hosts") or {})
+        hosts.update(overrides.get("hosts") or {})
+        if isinstance(config.MITIGATION_HOST, dict):
+            hosts.update({name: {"host": host} for name, host in config.MITIGATION_HOST.items()})
+        return {"parameters": list(parameters.values()), "hosts": hosts}
+
+    def load(self, templates: Dict[str, Any]) -> None:
+        """
+        Compile the templates into the dispatch tables.
+        """
+        parameters = {}
+        for template in templates.get("parameters", []):
+            try:
+                key = (MitigationAction.MitigationCategory(template["category"]).value, template["name"])
+                parameters[key] = self._compile_rules(template)
+            except (KeyError, ValueError, TypeError) as e:
+                logger.error(f"Invalid mitigation template {template}: {e}")
+        hosts = {}
+        for name, spec in templates.get("hosts", {}).items():
+            try:
+                hosts[name] = self._compile_value(spec)
+            except (KeyError, ValueError, TypeError) as e:
+                logger.error(f"Invalid host template of mitigation {name}: {e}")
+        self._parameters = parameters
+        self._hosts = hosts
+        logger.info(f"Compiled {len(parameters)} mitigation templates and {len(hosts)} host templates")
+
+    def parameters(self, threat: DetectedThreat, mitigation: MitigationAction) -> List[Tuple[str, Any]]:
+        """
+        Get the parameters (field, value) of a mitigation action for a threat.
+        """
+        rules = self._parameters.get((mitigation.category.value, mitigation.name))
+        if rules is None:
+            return []
+        for condition, fields in rules:
+            if condition is None or condition(threat):
+                return [(field, value(threat, mitigation)) for field, value in fields]
+        return []
+
+    def host(self, mitigation: MitigationAction) -> str:
+        """
+        Get the host a mitigation action is applied on ("" if there is no template).
+        """
+        value = self._hosts.get(mitigation.name)
+        return value(None, mitigation) if value is not None else ""
+
+    """
+    Compilation of the templates
+    """
+    def _compile_rules(self, template: Dict[str, Any]) -> List[Rule]:
+        common = template.get("parameters") or {}
+        rules = template.get("rules") or [{}]
+        compiled = []
+        for rule in rules:
+            fields = dict(common)
+            fields.update(rule.get("parameters") or {})
+            compiled.append((
+                self._compile_condition(rule.get("when")),
+                [(field, self._compile_value(spec)) for field, spec in fields.items()],
+            ))
+        return compiled
+
+    @staticmethod
+    def _compile_condition(when: Optional[Dict[str, Any]]) -> Optional[Callable[[DetectedThreat], bool]]:
+        if not when:
+            return None
+        checks = []
+        for kind, argument in when.items():
+            if kind == "threat_name":
+                names = frozenset(argument)
+                checks.append(lambda threat: threat.threat_name in names)
+            elif kind == "hosts_contain":
+                text = str(argument).lower()
+                checks.append(lambda threat: text in "".join(threat.hosts).lower())
+            else:
+                raise ValueError(f"Unknown condition: {kind}")
+        if len(checks) == 1:
+            return checks[0]
+        return lambda threat: all(check(threat) for check in checks)
+
+    def _compile_value(self, spec: Any) -> Resolver:
+        if not self._is_dynamic(spec):
+            value = self._evaluate_static(spec)
+            if isinstance(value, list):
+                # Every action gets its own list
+                return lambda threat, mitigation: list(value)
+            return lambda threat, mitigation: value
+        if isinstance(spec, list):
+            items = [self._compile_value(item) for item in spec]
+            return lambda threat, mitigation: [item(threat, mitigation) for item in items]
+        if "json" in spec:
+            inner = self._compile_value(spec["json"])
+            return lambda threat, mitigation: json.dumps(inner(threat, mitigation))
+        if "threat" in spec:
+            attribute = spec["threat"]
+            def threat_attribute(threat, mitigation):
+                value = getattr(threat, attribute, None)
+                return list(value) if isinstance(value, list) else value
+            return threat_attribute
+        if "threat_name_token" in spec:
+            index = int(spec["threat_name_token"])
+            transform = TRANSFORMS[spec.get("transform", "capitalize")]
+            return lambda threat, mitigation: transform(threat.threat_name.split("_")[index])
+        if "param" in spec:
+            field = spec["param"]
+            default = self._compile_value(spec.get("default", ""))
+            def action_parameter(threat, mitigation):
+                if field in mitigation.parameters:
+                    return mitigation.parameters[field]
+                return default(threat, mitigation)
+            return action_parameter
+        raise ValueError(f"Unknown value template: {spec}")
+
+    def _is_dynamic(self, spec: Any) -> bool:
+        if isinstance(spec, list):
+            return any(self._is_dynamic(item) for item in spec)
+        if isinstance(spec, dict):
+            if any(directive in spec for directive in DYNAMIC_DIRECTIVES):
+                return True
+            return any(self._is_dynamic(value) for value in spec.values())
+        return False
+
+    def _evaluate_static(self, spec: Any) -> Any:
+        if isinstance(spec, list):
+            return [self._evaluate_static(item) for item in spec]
+        if isinstance(spec, dict):
+            if "host" in spec:
+                return self.resolve_hostname(spec["host"])
+            if "json" in spec:
+                return json.dumps(self._evaluate_static(spec["json"]))
+            raise ValueError(f"Unknown value template: {spec}")
+        return spec
+
+    @staticmethod
+    def resolve_hostname(hostname: str) -> str:
+        """
+        Resolve a hostname to an IP address (when 'resolve_hostnames' is enabled).
+        """
+        if config.RESOLVE_HOSTNAMES:
+            return (config.IP_MAPPINGS or {}).get(hostname, hostname)
+        return hostname
@@ -85,6 +85,35 @@ class CoreIntent:
         """
         self.fulfilled = fulfilled
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for JSON serialization"""
+        return {
+            "uid": self.uid,
+            "intent_type": getattr(self.intent_type, "value", self.intent_type),
+            "threat": self.threat,
+            "host": self.host,
+            "duration": self.duration,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "description": self.description,
+            "fulfilled": self.fulfilled,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CoreIntent":
+        """Rebuild an intent from its dictionary representation"""
+        intent = cls.__new__(cls)
+        intent.uid = data["uid"]
+        intent.intent_type = DTEIntentType(data["intent_type"])
+        intent.threat = data["threat"]
+        intent.host = data["host"]
+        intent.duration = data["duration"]
+        intent.start_time = data["start_time"]
+        intent.end_time = data["end_time"]
+        intent.description = data["description"]
+        intent.fulfilled = data["fulfilled"]
+        return intent
+
     def __repr__(self):
         return f"CoreIntent(uid={self.uid}, intent_type={self.intent_type}, threat={self.threat}, host={self.host}, duration={self.duration}, start_time={self.start_time}, end_time={self.end_time}, description={self.description}, satisfied={self.fulfilled})"
 
@@ -128,7 +157,7 @@ class DetectedThreat:
             return
         # Only update the status to REINCIDENT if the threat is UNDER_MITIGATION
         if self.status == self.ThreatStatus.UNDER_MITIGATION:
-            self.status = self.ThreatStatus.REINCIDENT
+            self.update_status(self.ThreatStatus.REINCIDENT)
         # Always update the last update time (extend the timeout)
         self.last_update = int(datetime.now().timestamp())
 
@@ -152,6 +181,33 @@ class DetectedThreat:
         curr_time = datetime.now().timestamp()
         return curr_time > self.end_time
 
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for JSON serialization"""
+        return {
+            "uid": self.uid,
+            "threat_type": getattr(self.threat_type, "value", self.threat_type),
+            "threat_name": self.threat_name,
+            "hosts": self.hosts,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "last_update": self.last_update,
+            "status": self.status.value,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DetectedThreat":
+        """Rebuild a detected threat from its dictionary representation"""
+        threat = cls.__new__(cls)
+        threat.uid = data["uid"]
+        threat.threat_type = DTEIntentType(data["threat_type"])
+        threat.threat_name = data["threat_name"]
+        threat.hosts = data["hosts"]
+        threat.start_time = data["start_time"]
+        threat.end_time = data["end_time"]
+        threat.last_update = data["last_update"]
+        threat.status = cls.ThreatStatus(data["status"])
+        return threat
+
     def __repr__(self):
         return f"DetectedThreat(uid={self.uid}, threat_type={self.threat_type}, threat_name={self.threat_name}, hosts={self.hosts}, start_time={self.start_time}, end_time={self.end_time}, last_update={self.last_update}, status={self.status})"
 
@@ -198,7 +254,7 @@ class MitigationAction:
     fields: List[str]
     priority: int = 0  # Lower number = higher priority
     enabled: bool = True
-    parameters: Dict[str, Any] = {}
+    parameters: Dict[str, Any]  # Values of the fields, set per threat
 
     def __init__(self, name, category, threats, fields):
         self.uid = str(uuid4())
@@ -208,6 +264,19 @@ class MitigationAction:
         self.fields = fields
         self.priority = 0
         self.enabled = True
+        self.parameters = {}
+
+    def instantiate(self) -> "MitigationAction":
+        """
+        Get an instance of this catalogue action to be configured for a threat.
+        The instance shares the definition of the action (uid, name, threats,
+        fields...) and has its own parameters, so the catalogue is never modified.
+        """
+        # Shallow copy of the attributes (much cheaper than copy.copy)
+        instance = object.__new__(type(self))
+        instance.__dict__.update(self.__dict__)
+        instance.parameters = dict(self.parameters)
+        return instance
 
     def define_field(self, field_name: str, field_value: Any) -> None:
         """
@@ -229,8 +298,19 @@ class MitigationAction:
             "fields": self.fields,
             "priority": self.priority,
             "enabled": self.enabled,
+            "parameters": dict(self.parameters),
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MitigationAction":
+        """Rebuild a mitigation action from its dictionary representation"""
+        action = cls(data["name"], data["category"], data["threats"], data["fields"])
+        action.uid = data["uid"]
+        action.priority = data["priority"]
+        action.enabled = data["enabled"]
+        action.parameters = dict(data.get("parameters", {}))
+        return action
+
     def __repr__(self):
         return json.dumps(self.to_dict(), indent=4)
 
@@ -245,6 +325,7 @@ class DTJob:
     class JobStatus(Enum):
         PENDING = "PENDING"
         COMPLETED = "COMPLETED"
+        FAILED = "FAILED"  # No answer from the IA-NDT
         EXPIRED = "EXPIRED"
 
     uid: str
@@ -301,4 +382,17 @@ class DTJob:
             "kpi_before": self.kpi_before,
             "kpi_after": self.kpi_after,
             "status": self.status.value,
+            "mitigation_obj": self.mitigation_obj.to_dict() if self.mitigation_obj else None,
         }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DTJob":
+        """Rebuild a DT job from its dictionary representation"""
+        job = cls(data["threat_id"], data["mitigation_id"])
+        job.uid = data["uid"]
+        job.kpi_before = data["kpi_before"]
+        job.kpi_after = data["kpi_after"]
+        job.status = cls.JobStatus(data["status"])
+        if data.get("mitigation_obj"):
+            job.mitigation_obj = MitigationAction.from_dict(data["mitigation_obj"])
+        return job
@@ -1,6 +1,10 @@
-from concurrent.futures import thread
+from concurrent.futures import ThreadPoolExecutor, wait
+from time import time
+import config
+from constants import Const
 from recommender import Recommender
 from data.store import InMemoryStore
+from data.retention import RetentionManager
 from models.api_models import DTEIntentType
 from models.core_models import CoreIntent, DTJob, DetectedThreat
 from integrations.ckb import CKB
@@ -12,6 +16,17 @@ from utils.log_config import setup_logging
 
 logger = setup_logging("app.pipeline")
 
+# Threat statuses the pipeline acts on, per type of intent
+MITIGATION_STATUSES = (
+    DetectedThreat.ThreatStatus.NEW,
+    DetectedThreat.ThreatStatus.REINCIDENT,
+)
+PREVENTION_STATUSES = (
+    DetectedThreat.ThreatStatus.NEW,
+    DetectedThreat.ThreatStatus.UNDER_EMULATION,
+    DetectedThreat.ThreatStatus.REINCIDENT,
+)
+
 class IntentPipeline:
 
     def __init__(self):
@@ -22,11 +37,19 @@ class IntentPipeline:
         self.ckb = CKB()
         self.iadt = ImpactAnalysisDT()
         self.customSIEM = CustomSIEM()
+        self.retention = RetentionManager()
+        # Threats are independent: with more than one worker they are processed in parallel
+        self.workers = config.IBI_PIPELINE_WORKERS
+        self._executor = None
+        # Candidate mitigation actions simulated together for a prevention intent
+        self.whatif_candidates = max(1, config.IADT_WHATIF_CANDIDATES)
+        if self.workers > 1:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pipeline")
 
 
     def process_intents(self):
 
-        if self._store._ibi_compromised:
+        if self._store.ibi_is_compromised():
             logger.warning("######################################################################")
             logger.warning("#  The component should be manually restarted.                       #")
             logger.warning("#  The IBI component cannot proceed because it might be compromised. #")
@@ -40,33 +63,97 @@ class IntentPipeline:
         logger.debug("Starting intent pipeline iteration")
         ### List all valid intents
         intents = [i for i in self._store.intent_get_all() if not i.timedout()]
-        threats = [t for t in self._store.threat_get_all()]
+        # Only visit the threats that changed since the last cycle (including expired ones)
+        threats = self._store.threat_pop_dirty()
+        logger.debug(f"Visiting {len(threats)} changed threats")
         
         # Loop over all threats to check whether they are expired
         # If they were under mitigation and expired, set them as MITIGATED
         self.update_expired_threats(threats)
 
-        for intent in intents:
-            logger.debug(f"Processing intent: {intent.get_uid()}")
-            logger.debug(intent)
-            # Check if there is a threat related to the intent
-            if intent.intent_type == DTEIntentType.MITIGATION or intent.intent_type == DTEIntentType.DETECTION:
-                # Checks detected threats (Mitigation or Detection)
-                threats_mitigation = [t for t in threats if t.threat_type == DTEIntentType.MITIGATION or t.threat_type == DTEIntentType.DETECTION]
-                self.process_mitigation_intents(intent, threats_mitigation)
+        # Threats without a live intent of their type are kept for a later cycle
+        self.defer_unhandled_threats(intents, threats)
 
-            elif intent.intent_type == DTEIntentType.PREVENTION:
-                threats_prevention = [t for t in threats if t.threat_type == DTEIntentType.PREVENTION]
-                self.process_prevention_intents(intent, threats_prevention)
-            else:
-                logger.warning(f"Unknown intent type: {intent.intent_type} for intent: {intent.get_uid()}")
-                continue
+        if self._executor is not None and len(threats) > 1:
+            self.process_threats_in_parallel(intents, threats)
+        else:
+            for threat in threats:
+                self._process_threat(intents, threat)
 
         # Process IA-NDT jobs
         self.iadt.process_queued_jobs()
         # Check if intent is satisfied
-        self.check_intent_fulfillment(intents, threats)
+        self.check_intent_fulfillment(intents, self._store.threat_get_active())
+        # Move old terminal records out of memory
+        self.retention.run()
         return
+
+
+    def dispatch_intent(self, intent, threats):
+        """
+        Process the threats an intent applies to, according to its type.
+        """
+        # Check if there is a threat related to the intent
+        if intent.intent_type == DTEIntentType.MITIGATION or intent.intent_type == DTEIntentType.DETECTION:
+            # Checks detected threats (Mitigation or Detection)
+            threats_mitigation = [
+                t for t in threats
+                if (t.threat_type == DTEIntentType.MITIGATION or t.threat_type == DTEIntentType.DETECTION)
+                and t.get_status() in MITIGATION_STATUSES
+            ]
+            if threats_mitigation:
+                self.process_mitigation_intents(intent, threats_mitigation)
+
+        elif intent.intent_type == DTEIntentType.PREVENTION:
+            threats_prevention = [
+                t for t in threats
+                if t.threat_type == DTEIntentType.PREVENTION and t.get_status() in PREVENTION_STATUSES
+            ]
+            if threats_prevention:
+                self.process_prevention_intents(intent, threats_prevention)
+        else:
+            logger.warning(f"Unknown intent type: {intent.intent_type} for intent: {intent.get_uid()}")
+
+
+    def process_threats_in_parallel(self, intents, threats):
+        """
+        Run the chain (CKB, recommendation, CAS, RTR / IA-NDT) of each threat in the
+        worker pool. Each task visits the intents in order for one threat, as the
+        sequential loop does, while holding the lock of the threat.
+        """
+        logger.debug(f"Processing {len(threats)} threats with {self.workers} workers")
+        futures = [self._executor.submit(self._process_threat, intents, t) for t in threats]
+        wait(futures)
+        for future in futures:
+            # Raise the first error, as the sequential loop does
+            future.result()
+
+
+    def _process_threat(self, intents, threat):
+        # The lock of the threat serializes the pipeline with the controllers
+        # (DTE requests, IA-NDT answers) that change the threat or its DT jobs
+        with self._store.threat_lock(threat.uid):
+            for intent in intents:
+                logger.debug(f"Processing intent {intent.get_uid()} for threat {threat.uid}")
+                self.dispatch_intent(intent, [threat])
+
+
+    def wait_for_work(self, since: float) -> None:
+        """
+        Block until there is work for the pipeline: a notification from the
+        controllers (new/renewed threats, IA-NDT answers) or the next scheduled
+        expiry of a threat or intent.
+
+        :param since: start time (epoch seconds) of the last pipeline cycle
+        """
+        timeout = Const.THREAD_INTENT_MAX_WAIT
+        deadline = self._store.pipeline_next_deadline(since)
+        if deadline is not None:
+            timeout = min(timeout, max(deadline - time(), 0.0) + Const.THREAD_INTENT_DEADLINE_SLACK)
+        if self._store.pipeline_wait(timeout):
+            logger.debug("Intent pipeline notified")
+        else:
+            logger.debug("Intent pipeline woke up on timeout")
         
 
     def check_intent_fulfillment(self, intents, threats):
@@ -109,11 +196,26 @@ class IntentPipeline:
         return
 
 
+    def defer_unhandled_threats(self, intents, threats):
+        """
+        Keep in the change set the threats that no live intent can handle in this
+        cycle (e.g. the threat arrived before its intent), so they are visited again.
+        """
+        intent_types = {i.intent_type for i in intents}
+        if DTEIntentType.DETECTION in intent_types:
+            intent_types.add(DTEIntentType.MITIGATION)
+        if DTEIntentType.MITIGATION in intent_types:
+            intent_types.add(DTEIntentType.DETECTION)
+        for t in threats:
+            if t.threat_type not in intent_types and t.get_status() != DetectedThreat.ThreatStatus.MITIGATED:
+                self._store.threat_mark_dirty(t.uid, notify=False)
+
+
     def update_expired_threats(self, threats):
         for t in threats:
             if t.get_status() == DetectedThreat.ThreatStatus.UNDER_MITIGATION and t.is_expired():
                 logger.debug(f"Setting threat {t.uid} MITIGATED.")
-                t.update_status(DetectedThreat.ThreatStatus.MITIGATED)
+                self._store.threat_set_status(t, DetectedThreat.ThreatStatus.MITIGATED)
                 # Generate a SIEM alarm for the expired threat
                 self.customSIEM.send_log(t, CustomSIEM.AlarmType.MITIGATED)
 
@@ -132,6 +234,8 @@ class IntentPipeline:
                 available_actions = self.recommender.get_mitigations(threat)
                 if not available_actions:
                     logger.warning(f"No mitigation found for threat: {threat.threat_name}")
+                    # Still NEW: visited again in a later cycle (e.g. after the catalogue is updated)
+                    self._store.threat_mark_dirty(threat.uid, notify=False)
                     continue
                 # Parametrize the mitigation action
                 mitigation_action = self.recommender.configure_mitigation(threat, available_actions[0])
@@ -139,26 +243,23 @@ class IntentPipeline:
                 self.recommender.associate_mitigation(threat.uid, mitigation_action)
                 # Test the mitigation action with CAS
                 # Test with CAS
-                cas_result = self.cas_client.validate(intent, mitigation_action)
-                        
-                while cas_result == self.cas_client.PARTIAL:
-                    mitigation_action = self.cas_client.tune_mitigation(mitigation_action)
+                cas_result, tuning_rounds = self.cas_client.validate_and_tune(intent, mitigation_action)
+                if tuning_rounds:
                     self._store.association_update(threat.uid, mitigation_action)
-                    cas_result = self.cas_client.validate(intent, mitigation_action)
 
                 if cas_result == self.cas_client.INVALID:
                     logger.debug(f"Mitigation {mitigation_action.uid} was rejected by CAS. Setting as NEW for new cycle.")
-                    threat.update_status(DetectedThreat.ThreatStatus.NEW)
+                    self._store.threat_set_status(threat, DetectedThreat.ThreatStatus.NEW)
                 
                 if cas_result == self.cas_client.VALID:
                     logger.debug(f"Mitigation {mitigation_action.uid} was accepted by CAS. Sending to RTR and setting UNDER_MITIGATION.")
                     self.rtr_client.enforce_mitigation(intent, mitigation_action)
-                    threat.update_status(DetectedThreat.ThreatStatus.UNDER_MITIGATION)
+                    self._store.threat_set_status(threat, DetectedThreat.ThreatStatus.UNDER_MITIGATION)
 
             if threat.get_status() == DetectedThreat.ThreatStatus.REINCIDENT:
                 # If threat is Under mitigation, propose a new mitigation action
                 logger.debug(f"Processing threat: {threat.uid} (Status: REINCIDENT). Setting as NEW for new cycle.")
-                threat.update_status(DetectedThreat.ThreatStatus.NEW)
+                self._store.threat_set_status(threat, DetectedThreat.ThreatStatus.NEW)
                 pass
 
 
@@ -178,57 +279,62 @@ class IntentPipeline:
                 available_actions = self.recommender.get_mitigations(threat)
                 if not available_actions:
                     logger.warning(f"No mitigation found for threat: {threat.threat_name}")
+                    # Still NEW: visited again in a later cycle (e.g. after the catalogue is updated)
+                    self._store.threat_mark_dirty(threat.uid, notify=False)
                     continue
-                # Parametrize the mitigation action
-                available_actions[0] = self.recommender.configure_mitigation(threat, available_actions[0])
-                # Associate the mitigation action with the threat
-                self.recommender.associate_mitigation(threat.uid, available_actions[0])
+                # The best candidates the IA-DT can simulate are evaluated together
+                simulated = [action for action in available_actions if self.iadt.can_simulate(action)]
+                candidates = []
+                for action in (simulated or available_actions)[:self.whatif_candidates]:
+                    # Parametrize the mitigation action
+                    action = self.recommender.configure_mitigation(threat, action)
+                    # Associate the mitigation action with the threat
+                    self.recommender.associate_mitigation(threat.uid, action)
+                    candidates.append(action)
                 # Emulate in the IA-DT
-                self.iadt.enqueue_simulation(threat, available_actions[0])
-                threat.update_status(DetectedThreat.ThreatStatus.UNDER_EMULATION)
+                self.iadt.enqueue_simulations(threat, candidates)
+                self._store.threat_set_status(threat, DetectedThreat.ThreatStatus.UNDER_EMULATION)
 
 
             if threat.get_status() == DetectedThreat.ThreatStatus.UNDER_EMULATION:
                 logger.debug(f"Processing threat: {threat.uid} (Status: UNDER EMULATION)")
                 
-                # If threat is Under emulation/simulation on the DT
-                dt_job = self._store.dt_job_get_by_threat(threat.uid)
-                # DT workflow is complete?
-                if dt_job and dt_job.status == DTJob.JobStatus.COMPLETED:
-                    # Results are good?
-                    if self.iadt.check_results(threat.uid, dt_job.kpi_before, dt_job.kpi_after):
-                        # Recover the mitigation action linked to the thread
-                        mitigation_actions = self._store.association_get(threat.uid)
-                        mitigation_action = mitigation_actions[-1] if mitigation_actions else None
+                # If threat is Under emulation/simulation on the DT (one job per candidate action)
+                dt_jobs = self._store.dt_job_get_all_by_threat(threat.uid)
+                # DT workflow is complete? (failed jobs got no answer from the IA-NDT)
+                finished = (DTJob.JobStatus.COMPLETED, DTJob.JobStatus.FAILED)
+                if dt_jobs and all(job.status in finished for job in dt_jobs):
+                    # Results are good? (keep the candidate with the best KPI)
+                    dt_job = self.iadt.best_result(dt_jobs)
+                    if dt_job is not None:
+                        # Recover the mitigation action simulated by the job
+                        mitigation_action = dt_job.mitigation_obj
                         # Test with CAS
-                        cas_result = self.cas_client.validate(intent, mitigation_action)
-                        
-                        while cas_result == self.cas_client.PARTIAL:
-                            mitigation_action = self.cas_client.tune_mitigation(mitigation_action)
+                        cas_result, tuning_rounds = self.cas_client.validate_and_tune(intent, mitigation_action)
+                        if tuning_rounds:
                             self._store.association_update(threat.uid, mitigation_action)
-                            cas_result = self.cas_client.validate(intent, mitigation_action)
 
                         if cas_result == self.cas_client.INVALID:
                             logger.debug(f"Mitigation {mitigation_action.uid} was rejected by CAS. Setting as NEW for new cycle.")
-                            threat.update_status(DetectedThreat.ThreatStatus.NEW)
+                            self._store.threat_set_status(threat, DetectedThreat.ThreatStatus.NEW)
                         
                         if cas_result == self.cas_client.VALID:
                             logger.debug(f"Mitigation {mitigation_action.uid} was accepted by CAS. Sending to RTR and setting UNDER_MITIGATION.")
                             self.rtr_client.enforce_mitigation(intent, mitigation_action)
-                            threat.update_status(DetectedThreat.ThreatStatus.UNDER_MITIGATION)
+                            self._store.threat_set_status(threat, DetectedThreat.ThreatStatus.UNDER_MITIGATION)
 
                     else:
                         # Results from the DT are bad
                         logger.debug(f"Mitigation NOT effective for threat {threat.uid}. Setting as NEW for new cycle.")
-                        threat.update_status(DetectedThreat.ThreatStatus.NEW)
+                        self._store.threat_set_status(threat, DetectedThreat.ThreatStatus.NEW)
 
-                    # Remove the completed DT job
+                    # Remove the completed DT jobs
                     self._store.dt_job_delete(threat.uid)
                 
 
             if threat.get_status() == DetectedThreat.ThreatStatus.REINCIDENT:
                 # If threat is Reincident, propose a new mitigation action
                 logger.debug(f"Processing threat: {threat.uid} (Status: REINCIDENT). Setting as NEW for new cycle.")
-                threat.update_status(DetectedThreat.ThreatStatus.NEW)
+                self._store.threat_set_status(threat, DetectedThreat.ThreatStatus.NEW)
                 pass
 
@@ -1,4 +1,5 @@
 import logging
+from typing import List
 from fastapi import APIRouter, Response
 from models.api_models import DTEIntent
 from controllers.dte_controller import DTEController
@@ -33,6 +34,25 @@ def post_intent(dte_intent: DTEIntent, response: Response):
         return {"error": "Failed to create intent"}
 
 
+@router.post("/intents/batch")
+def post_intents_batch(dte_intents: List[DTEIntent]):
+    logger.debug(f"Received batch of {len(dte_intents)} intents")
+    statuses = controller.process_dte_intents(dte_intents)
+    results = []
+    for dte_intent, status in zip(dte_intents, statuses):
+        if status == DTEController.RETURN_STATUS_CREATED:
+            results.append({"threat": dte_intent.threat, "status": "created"})
+        elif status == DTEController.RETURN_STATUS_UPDATED:
+            results.append({"threat": dte_intent.threat, "status": "renewed"})
+        else:
+            results.append({
+                "threat": dte_intent.threat,
+                "status": "rejected",
+                "error": f"Threat not supported: {dte_intent.threat}",
+            })
+    return {"results": results}
+
+
 @router.put("/intents")
 def put_intent(dte_intent: DTEIntent):
     logger.debug(f"Redirecting to post_intent for intent: {dte_intent}")
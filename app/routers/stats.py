@@ -2,6 +2,10 @@ from fastapi import APIRouter, Request
 from controllers.status_controller import StatusController
 from utils.log_config import setup_logging
 from data.store import InMemoryStore
+from data.retention import RetentionManager
+from integrations.cas import CASClient
+from integrations.ckb import CKB
+from integrations.dt_scheduler import DTScheduler
 from datetime import datetime, timezone
 from models.core_models import DetectedThreat
 
@@ -92,13 +96,13 @@ def get_threats(request: Request):
 def get_threat_status(request: Request):
     """Get threat status summary counts"""
     store = InMemoryStore()
-    threats = store.threat_get_all()
-    new = len([threat for threat in threats if threat.status == DetectedThreat.ThreatStatus.NEW])
-    under_emulation = len([threat for threat in threats if threat.status == DetectedThreat.ThreatStatus.UNDER_EMULATION])
-    under_mitigation = len([threat for threat in threats if threat.status == DetectedThreat.ThreatStatus.UNDER_MITIGATION])
-    reincident = len([threat for threat in threats if threat.status == DetectedThreat.ThreatStatus.REINCIDENT])
-    mitigated = len([threat for threat in threats if threat.status == DetectedThreat.ThreatStatus.MITIGATED])
-    total = len(threats)
+    counts = store.threat_count_by_status()
+    new = counts[DetectedThreat.ThreatStatus.NEW]
+    under_emulation = counts[DetectedThreat.ThreatStatus.UNDER_EMULATION]
+    under_mitigation = counts[DetectedThreat.ThreatStatus.UNDER_MITIGATION]
+    reincident = counts[DetectedThreat.ThreatStatus.REINCIDENT]
+    mitigated = counts[DetectedThreat.ThreatStatus.MITIGATED]
+    total = sum(counts.values())
     return {
         "new": new,
         "under_emulation": under_emulation,
@@ -134,16 +138,38 @@ def get_mitigations(request: Request):
 @router.get("/stats/ndt")
 def get_ndt_queue(request: Request):
     """Get stats about IA-NDT queue"""
-    store = InMemoryStore()
-    ndt_queue_size = 0
-    for job in store._dt_jobs:
-        if job.kpi_before is None:
-            ndt_queue_size =+1
-        if job.kpi_after is None:
-            ndt_queue_size=+1
-            
-    ndt_status = "available" if store._dt_available else "busy"
-    return {"queue_size": ndt_queue_size, "ndt_status": ndt_status}
+    scheduler = DTScheduler()
+    state = scheduler.get_state()
+    state["ndt_status"] = "available" if scheduler.is_available() else "busy"
+    return state
+
+"""
+    REST endpoints for querying the retention of terminal records
+    (mitigated threats, timed out intents and expired IA-NDT jobs)
+"""
+@router.get("/stats/retention")
+def get_retention(request: Request):
+    """Get the records and bytes reclaimed by the retention policy"""
+    return RetentionManager().get_metrics()
+
+"""
+    REST endpoints for querying the tuning of the mitigation actions
+    partially accepted by CAS (rounds to converge and CAS calls saved)
+    and the hits of the cache of CAS verdicts
+"""
+@router.get("/stats/cas")
+def get_cas_tuning(request: Request):
+    """Get the CAS tuning and cache metrics"""
+    return CASClient.get_tuning_metrics()
+
+"""
+    REST endpoints for querying the cache of CKB answers
+    (and the queries shared by concurrent lookups)
+"""
+@router.get("/stats/ckb")
+def get_ckb_cache(request: Request):
+    """Get the CKB cache metrics"""
+    return CKB.get_metrics()
 
 """
     REST endpoints for querying the status of the IBI
@@ -152,7 +178,7 @@ def get_ndt_queue(request: Request):
 def get_ibi_status(request: Request):
     """Return General Status of the IBI"""
     store = InMemoryStore()
-    status = "running" if not store._ibi_compromised else "stopped"
+    status = "running" if not store.ibi_is_compromised() else "stopped"
     return {"status": status}
 
 
@@ -162,9 +188,9 @@ def get_ibi_status(request: Request):
     (Not related to IBi at all but requested by CNIT for demo 10)
 """
 @router.get("/stats/component-status")
-def get_other_status(request: Request):
+async def get_other_status(request: Request):
     """Return the status of the other modules"""
-    return status_controller.get_status()
+    return await status_controller.get_status_async()
 
 
 """
@@ -174,5 +200,5 @@ Used only for testing purposes
 def set_ibi_status(request: Request):
     """Set the IBI status to compromised"""
     store = InMemoryStore()
-    store._ibi_compromised = not store._ibi_compromised
+    store.ibi_set_compromised(not store.ibi_is_compromised())
     return {"status": "ok"}
\ No newline at end of file
@@ -0,0 +1,103 @@
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+import config
+
+
+class HTTPClient:
+    """
+    HTTP client of an external service (CKB, CAS, RTR, IA-NDT...), shared by all
+    the users of the service. It keeps a pool of keep-alive connections, limited
+    to 'max_connections' per host, and applies a default timeout to the requests.
+    The async methods (aget, apost...) use an httpx client with the same limits,
+    for the coroutines of the API server.
+    """
+
+    _clients: Dict[str, "HTTPClient"] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def for_service(cls, service: str) -> "HTTPClient":
+        """
+        Get the client of a service, configured in the 'http' section of the configuration.
+        """
+        with cls._lock:
+            client = cls._clients.get(service)
+            if client is None:
+                settings = config.HTTP_SERVICES.get(service) or {}
+                client = cls(
+                    service,
+                    timeout=settings.get("timeout", config.HTTP_TIMEOUT),
+                    max_connections=settings.get("max_connections", config.HTTP_MAX_CONNECTIONS),
+                )
+                cls._clients[service] = client
+            return client
+
+    def __init__(self, service: str, timeout: float, max_connections: int):
+        self.service = service
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._session = requests.Session()
+        # Block (instead of opening extra connections) when the pool of a host is in use
+        adapter = HTTPAdapter(pool_maxsize=max_connections, pool_block=True)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        # Created on first use, in the event loop that uses it
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._async_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self._session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    async def arequest(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return await self._get_async_client().request(method, url, **kwargs)
+
+    async def aget(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.arequest("GET", url, **kwargs)
+
+    async def apost(self, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.arequest("POST", url, **kwargs)
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        # The connections of an httpx client belong to one event loop: a new
+        # client is created if the client is used from another loop
+        loop = asyncio.get_running_loop()
+        if self._async_client is None or self._async_loop is not loop:
+            self._async_client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections, max_keepalive_connections=self.max_connections
+                ),
+            )
+            self._async_loop = loop
+        return self._async_client
+
+    def close(self) -> None:
+        self._session.close()
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+            self._async_loop = None
+
+    @classmethod
+    async def aclose_all(cls) -> None:
+        """
+        Close the async clients of all the services (at the shutdown of the API server).
+        """
+        with cls._lock:
+            clients = list(cls._clients.values())
+        for client in clients:
+            await client.aclose()
@@ -0,0 +1,80 @@
+import heapq
+from collections import Counter
+from difflib import SequenceMatcher, get_close_matches
+from typing import Dict, Iterable, List, Tuple
+
+
+class SimilarityIndex:
+    """
+    Index of names for fuzzy lookups, with the same results as
+    difflib.get_close_matches over the same names.
+
+    The names are grouped by length and keep their character counts, which give
+    upper bounds of SequenceMatcher.ratio(): 2*min(la, lb)/(la + lb) for a whole
+    group, and 2*(characters in common)/(la + lb) for a name. Groups and names are
+    checked from the highest bound down, and the exact ratio is only computed for
+    the names whose bound can still beat the matches found so far.
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.names: Tuple[str, ...] = tuple(names)
+        self._name_set = frozenset(self.names)
+        self._groups: Dict[int, List[Tuple[str, Dict[str, int]]]] = {}
+        for name in self.names:
+            self._groups.setdefault(len(name), []).append((name, dict(Counter(name))))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def close_matches(self, word: str, n: int = 3, cutoff: float = 0.6) -> List[str]:
+        """
+        Same as difflib.get_close_matches(word, names, n, cutoff).
+        """
+        if not n > 0:
+            raise ValueError(f"n must be > 0: {n}")
+        if not 0.0 <= cutoff <= 1.0:
+            raise ValueError(f"cutoff must be in [0.0, 1.0]: {cutoff}")
+        if cutoff == 0.0:
+            # Every name matches, nothing to prune
+            return get_close_matches(word, self.names, n, cutoff)
+        if n == 1 and word in self._name_set:
+            return [word]
+
+        length = len(word)
+        counts = list(Counter(word).items())
+        matcher = SequenceMatcher()
+        matcher.set_seq2(word)
+        best: List[Tuple[float, str]] = []  # Min-heap of the n best (ratio, name)
+        threshold = cutoff
+        for group_length, group_bound in self._group_order(length):
+            if group_bound < threshold:
+                break
+            total = length + group_length
+            for name, name_counts in self._groups[group_length]:
+                common = 0
+                for char, count in counts:
+                    name_count = name_counts.get(char)
+                    if name_count:
+                        common += count if count < name_count else name_count
+                if (2.0 * common / total if total else 1.0) < threshold:
+                    continue
+                matcher.set_seq1(name)
+                ratio = matcher.ratio()
+                if ratio < cutoff:
+                    continue
+                if len(best) < n:
+                    heapq.heappush(best, (ratio, name))
+                elif (ratio, name) > best[0]:
+                    heapq.heapreplace(best, (ratio, name))
+                if len(best) == n:
+                    # Names with a lower bound can no longer enter the results
+                    threshold = max(cutoff, best[0][0])
+        return [name for ratio, name in sorted(best, reverse=True)]
+
+    def _group_order(self, length: int) -> List[Tuple[int, float]]:
+        bounds = []
+        for group_length in self._groups:
+            total = length + group_length
+            bounds.append((group_length, 2.0 * min(length, group_length) / total if total else 1.0))
+        bounds.sort(key=lambda item: item[1], reverse=True)
+        return bounds
@@ -0,0 +1,103 @@
+"""
+Attack name lookup (CKB.get_attack_by_similarity): difflib.get_close_matches
+over the list of attacks vs the SimilarityIndex, for growing catalogues.
+
+The catalogues are made of the attack names of the IBI plus synthetic names
+built from the same tokens. The queries are names of the catalogue, misspelled
+names and unrelated names. Both lookups must return the same matches.
+
+Run from the repository root:
+    python tests/benchmarks/bench_attack_similarity.py [max_catalogue_size]
+"""
+import os
+import random
+import sys
+import time
+from difflib import get_close_matches
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "app"))
+
+from utils.similarity import SimilarityIndex
+
+CUTOFF = 0.3  # Same as CKB.SIMILARITY_CUTOFF
+ATTACKS = [
+    "ntp_dos", "pfcf_dos", "dns_reflection_amplification", "hello_world",
+    "ddos_amplification", "dns_amplification", "ddos_download_link", "data_poisoning",
+    "multidomain", "mitm", "nf_exposure", "signaling_pfcp",
+    "poisoning_and_amplification", "network_exposure",
+]
+TOKENS = sorted({token for attack in ATTACKS for token in attack.split("_")} | {
+    "smf", "upf", "amf", "gtp", "flood", "syn", "udp", "tcp", "spoofing", "slice", "ran", "core",
+})
+
+
+def catalogue(size: int, rng: random.Random) -> list:
+    names = list(ATTACKS)
+    seen = set(names)
+    while len(names) < size:
+        name = "_".join(rng.sample(TOKENS, rng.randint(1, 4)))
+        if name not in seen:
+            seen.add(name)
+            names.append(name)
+    return names
+
+
+def misspell(name: str, rng: random.Random) -> str:
+    chars = list(name)
+    for _ in range(rng.randint(1, 3)):
+        position = rng.randrange(len(chars))
+        operation = rng.choice(("drop", "swap", "replace"))
+        if operation == "drop" and len(chars) > 2:
+            del chars[position]
+        elif operation == "swap" and position + 1 < len(chars):
+            chars[position], chars[position + 1] = chars[position + 1], chars[position]
+        else:
+            chars[position] = rng.choice("abcdefghijklmnopqrstuvwxyz_")
+    return "".join(chars)
+
+
+def queries(names: list, rng: random.Random, count: int = 200) -> list:
+    result = []
+    for i in range(count):
+        name = rng.choice(names)
+        kind = i % 4
+        if kind == 0:
+            result.append(name)
+        elif kind in (1, 2):
+            result.append(misspell(name, rng))
+        else:
+            result.append("".join(rng.choice("abcdefghijklmnopqrstuvwxyz_") for _ in range(rng.randint(3, 20))))
+    return result
+
+
+def timed(function, words: list) -> tuple:
+    start = time.perf_counter()
+    results = [function(word) for word in words]
+    return (time.perf_counter() - start) / len(words), results
+
+
+def run(max_size: int) -> None:
+    rng = random.Random(7)
+    print(f"{'attacks':>8}{'difflib us':>13}{'index us':>11}{'speedup':>9}{'mismatches':>12}")
+    for size in (len(ATTACKS), 100, 1000, 5000, 20000):
+        if size > max_size:
+            break
+        names = catalogue(size, rng)
+        words = queries(names, rng)
+        index = SimilarityIndex(names)
+        # Fewer lookups with difflib on the large catalogues
+        checked = words if size <= 1000 else words[:40]
+        difflib_time, expected = timed(lambda word: get_close_matches(word, names, n=1, cutoff=CUTOFF), checked)
+        index_time, _ = timed(lambda word: index.close_matches(word, n=1, cutoff=CUTOFF), words)
+        # Same matches (also with several matches per lookup)
+        mismatches = sum(result != index.close_matches(word, n=1, cutoff=CUTOFF) for word, result in zip(checked, expected))
+        mismatches += sum(
+            get_close_matches(word, names, n=3, cutoff=CUTOFF) != index.close_matches(word, n=3, cutoff=CUTOFF)
+            for word in checked[:40]
+        )
+        print(f"{size:>8}{difflib_time * 1e6:>13.1f}{index_time * 1e6:>11.1f}"
+              f"{difflib_time / index_time:>8.1f}x{mismatches:>12}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,85 @@
+"""
+CAS calls needed to tune a partially compliant mitigation action: the former
+linear search (one increment per call) vs the exponential/bisection search of
+CASClient.validate_and_tune.
+
+CAS is simulated: an action is accepted once its rate (or limit) reaches a
+threshold, and below it the pass percentage is the share of the threshold
+reached. The tuned value must be the same as the one of the linear search.
+
+Run from the repository root (a config.yml is required):
+    python tests/benchmarks/bench_cas_tuning.py
+"""
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "app"))
+
+import config
+from integrations.cas import CASClient
+from models.api_models import DTEIntent
+from models.core_models import CoreIntent, MitigationAction
+
+# (action name, field, start value, threshold of the simulated CAS)
+CASES = [
+    ("rate_limiting", "rate", 8, 10),
+    ("rate_limiting", "rate", 8, 25),
+    ("rate_limiting", "rate", 8, 100),
+    ("dns_rate_limiting", "rate", 9, 37),
+    ("dns_rate_limiting", "rate", 9, 400),
+    ("api_rate_limiting", "limit", 800, 1000),
+    ("api_rate_limiting", "limit", 800, 4300),
+    ("api_rate_limiting", "limit", 800, 25000),
+]
+
+
+class SimulatedCAS(CASClient):
+    def __init__(self, threshold: int, field: str, report_percentage: bool = True):
+        super().__init__()
+        self.threshold = threshold
+        self.field = field
+        self.report_percentage = report_percentage
+        self.calls = 0
+
+    def _validate(self, intent, mitigation_action):
+        self.calls += 1
+        value = self._parse_value(mitigation_action.parameters[self.field])
+        if value >= self.threshold:
+            return self.VALID, None
+        percentage = max(1, min(99, 100 * value // self.threshold))
+        return self.PARTIAL, percentage if self.report_percentage else None
+
+
+def linear_rounds(start: int, threshold: int, increment: int) -> int:
+    return math.ceil((threshold - start) / increment)
+
+
+def run() -> None:
+    # Let every search converge (the default budget can stop it earlier)
+    config.CAS_TUNING_MAX_ROUNDS = 64
+    intent = CoreIntent(DTEIntent(
+        intent_type="mitigation", threat="ddos_amplification", host=["10.0.0.1"], duration=600
+    ))
+    print(f"{'action':<20}{'start':>7}{'accept':>8}{'linear':>8}{'pct':>6}{'no pct':>8}{'value':>8}")
+    totals = [0, 0, 0]
+    for name, field, start, threshold in CASES:
+        rounds = []
+        for report_percentage in (True, False):
+            action = MitigationAction(name, "mitigation", [], [field])
+            action.parameters = {field: str(start)}
+            cas = SimulatedCAS(threshold, field, report_percentage)
+            result, tuning_rounds = cas.validate_and_tune(intent, action)
+            assert result == CASClient.VALID and tuning_rounds == cas.calls - 1
+            rounds.append(tuning_rounds)
+        increment = cas._tunable_field(action)[1]
+        linear = linear_rounds(start, threshold, increment)
+        expected = start + linear * increment
+        assert action.parameters[field] == expected, (action.parameters[field], expected)
+        totals = [totals[0] + linear, totals[1] + rounds[0], totals[2] + rounds[1]]
+        print(f"{name:<20}{start:>7}{threshold:>8}{linear:>8}{rounds[0]:>6}{rounds[1]:>8}{expected:>8}")
+    print(f"{'total CAS rounds':<35}{totals[0]:>8}{totals[1]:>6}{totals[2]:>8}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,304 @@
+"""
+Configuration of mitigation actions: compiled templates vs the former if/elif chains.
+
+The actions recommended for a set of threats are configured with both the
+Recommender (compiled templates) and a copy of the former chains (LegacyRecommender).
+The parameters and hosts must be equal; the time per configuration is reported.
+
+Run from the repository root (a config.yml is required):
+    python tests/benchmarks/bench_configure_mitigation.py [rounds]
+"""
+import json
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "app"))
+
+from controllers.mitigations_controller import MitigationsController
+from data.store import InMemoryStore
+from models.api_models import DTEIntent
+from models.core_models import CoreIntent, DetectedThreat, MitigationAction
+from recommender import Recommender, logger
+from config import IP_MAPPINGS, MITIGATION_HOST, RESOLVE_HOSTNAMES
+
+THREATS = [
+    ("mitigation", "ddos_amplification", ["10.0.0.1"]),
+    ("mitigation", "multidomain", ["ue-upc-1"]),
+    ("mitigation", "multidomain", ["ue-cnit-1"]),
+    ("mitigation", "multidomain", ["ue-1"]),
+    ("mitigation", "nf_exposure", ["nef"]),
+    ("mitigation", "poisoning_and_amplification", ["dns-c1"]),
+    ("prevention", "dns_amplification", ["dns-c1"]),
+    ("prevention", "ddos_download_link", ["172.22.0.7"]),
+    ("prevention", "ddos_downlink", ["172.22.0.7"]),
+    ("prevention", "hello_world", ["h1"]),
+    ("detection", "pfcp_deletion", ["smf"]),
+    ("detection", "dns_amplification", ["dns-c1"]),
+    ("detection", "ddos_amplification", ["ntp"]),
+]
+
+
+class LegacyRecommender(Recommender):
+    """
+    The if/elif chains used before the templates.
+    """
+
+    def configure_mitigation(
+        self, threat: DetectedThreat, mitigation: MitigationAction
+    ) -> MitigationAction:
+        """
+        Configure a mitigation action.
+
+        :param mitigation: MitigationAction object
+        """
+        # TODO: Add wrapper to external LLM to configure the mitigation action
+        if mitigation.category == MitigationAction.MitigationCategory.DETECTION:
+            # configure detection mitigation action
+            if mitigation.name == "firewall_pfcp_requests":
+                request_type = threat.threat_name.split("_")[1].capitalize()
+                mitigation.define_field("drop_percentage", "90%")
+                mitigation.define_field("request_types", request_type)
+
+            elif mitigation.name == "validate_smf_integrity":
+                mitigation.define_field("check", "true")
+                mitigation.define_field("action", "block")
+
+            elif mitigation.name == "dns_rate_limiting":
+                mitigation.define_field("rate", "9")
+                mitigation.define_field("source_ip_filter", "0.0.0.0/0")
+
+            elif mitigation.name == "ntp_access_control":
+                host_list = [
+                    "dns-c1",
+                    "dns-c2",
+                    "dns-c3",
+                    "dns-c4",
+                    "dns-c5",
+                    "dns-c6",
+                    "dns-c7",
+                    "dns-c8",
+                    "dns-c9",
+                    "dns-c10",
+                ]
+                mitigation.define_field("authorized_hosts", json.dumps(host_list))
+                mitigation.define_field("mode", "whitelist")
+
+        elif mitigation.category == MitigationAction.MitigationCategory.PREVENTION:
+            if mitigation.name == "dns_rate_limiting":
+                mitigation.define_field("rate", "9")
+                mitigation.define_field("source_ip_filter", "0.0.0.0/0")
+
+            elif mitigation.name == "rate_limiting":
+                if threat.threat_name == "dns_amplification":
+                    mitigation.define_field("device", self._resolve_hostnames("ceos3"))
+                    mitigation.define_field("interface", "eth2")
+                elif threat.threat_name in [
+                    "ddos_download",
+                    "ddos_download_link",
+                    "ddos_downlink",
+                ]:
+                    mitigation.define_field("device", self._resolve_hostnames("ceos2"))
+                    mitigation.define_field("interface", "eth1")
+                else:
+                    mitigation.define_field("device", self._resolve_hostnames("ceos2"))
+                    mitigation.define_field("interface", "eth4")
+                mitigation.define_field("rate", "8")
+
+            elif mitigation.name == "block_pod_address":
+                mitigation.define_field(
+                    "blocked_pod", self._resolve_hostnames("attacker")
+                )
+                mitigation.define_field(
+                    "blocked_ips", [self._resolve_hostnames("attacker")]
+                )
+                if threat.threat_name == "dns_amplification":
+                    mitigation.define_field("device", self._resolve_hostnames("ceos3"))
+                    mitigation.define_field("interface", "eth1")
+                elif threat.threat_name in [
+                    "ddos_download",
+                    "ddos_download_link",
+                    "ddos_downlink",
+                ]:
+                    mitigation.define_field("device", self._resolve_hostnames("ceos2"))
+                    mitigation.define_field("interface", "eth1")
+                elif threat.threat_name == "ddos_downlink":
+                    mitigation.define_field(
+                        "device", self._resolve_hostnames("router2")
+                    )
+                    mitigation.define_field("interface", "eth1")
+                else:
+                    mitigation.define_field("device", self._resolve_hostnames("ceos2"))
+                    mitigation.define_field("interface", "eth4")
+
+            elif mitigation.name == "udp_traffic_filter":
+                mitigation.define_field("protocol", "UDP")
+                mitigation.define_field("source_ip_filter", threat.hosts)
+                mitigation.define_field(
+                    "destination_port", "50100"
+                )  # Example port for NTP
+
+        elif mitigation.category == MitigationAction.MitigationCategory.MITIGATION:
+            # configure mitigation action
+            if mitigation.name == "udp_traffic_filter":
+                mitigation.define_field("protocol", "UDP")
+                mitigation.define_field("source_ip_filter", threat.hosts)
+                mitigation.define_field(
+                    "destination_port", "50100"
+                )  # Example port for NTP
+
+            elif mitigation.name == "ntp_access_control":
+                host_list = [
+                    "dns-c1",
+                    "dns-c2",
+                    "dns-c3",
+                    "dns-c4",
+                    "dns-c5",
+                    "dns-c6",
+                    "dns-c7",
+                    "dns-c8",
+                    "dns-c9",
+                    "dns-c10",
+                ]
+                mitigation.define_field("authorized_hosts", json.dumps(host_list))
+                mitigation.define_field("mode", "whitelist")
+
+            elif mitigation.name == "block_ues_multidomain":
+                str_hosts = "".join(threat.hosts).lower()
+                if "upc" in str_hosts:
+                    mitigation.define_field("domains", ["UPC"])
+                    mitigation.define_field("rate_limiting", "10")
+                elif "cnit" in str_hosts:
+                    mitigation.define_field("domains", ["CNIT"])
+                    mitigation.define_field("rate_limiting", "0")
+                else:
+                    mitigation.define_field("domains", ["ND"])
+                    mitigation.define_field("rate_limiting", "0")
+
+            elif mitigation.name == "define_dns_servers":
+                dns_servers_list = [self._resolve_hostnames("dns-s")]
+                mitigation.define_field("dns_servers", json.dumps(dns_servers_list))
+
+            elif mitigation.name == "filter_malicious_access":
+                mitigation.define_field("actor", "malicious")
+                mitigation.define_field("response", "immediate")
+
+            elif mitigation.name == "api_rate_limiting":
+                mitigation.define_field("limit", "800")
+
+            elif mitigation.name == "dns_rate_limiting":
+                mitigation.define_field("rate", "9")
+                mitigation.define_field("source_ip_filter", "0.0.0.0/0")
+
+            elif mitigation.name == "rate_limiting":
+                mitigation.define_field("device", self._resolve_hostnames("r1"))
+                mitigation.define_field("interface", "eth1")
+                mitigation.define_field("rate", "10")
+
+            elif mitigation.name == "block_pod_address":
+                mitigation.define_field(
+                    "blocked_pod", self._resolve_hostnames("attacker")
+                )
+                mitigation.define_field("device", self._resolve_hostnames("ceos2"))
+                mitigation.define_field("interface", "eth4")
+        return mitigation
+
+    def get_mitigation_host(self, mitigation: MitigationAction) -> str:
+        """
+        Get the mitigation host based on the threat and the mitigation action.
+        """
+        try:
+            host_name = MITIGATION_HOST[mitigation.name]
+            logger.debug("MITIGATION_HOST is set. Using configured value %s", host_name)
+            result = self._resolve_hostnames(host_name)
+        except (KeyError, TypeError):
+            logger.debug("MITIGATION_HOST is not set, using default values")
+            if mitigation.name == "udp_traffic_filter":
+                if "node" in mitigation.parameters:
+                    result = mitigation.parameters.get(
+                        "node", self._resolve_hostnames("ceos2")
+                    )
+                else:
+                    result = self._resolve_hostnames("ceos2")
+            elif mitigation.name == "ntp_access_control":
+                result = ""
+            elif mitigation.name == "dns_rate_limiting":
+                result = self._resolve_hostnames("ceos2")
+            elif mitigation.name == "rate_limiting":
+                result = mitigation.parameters.get(
+                    "device", self._resolve_hostnames("ceos2")
+                )
+            elif mitigation.name == "block_pod_address":
+                result = self._resolve_hostnames("router2")
+            elif mitigation.name == "block_ues_multidomain":
+                result = self._resolve_hostnames("ceos3")
+            elif mitigation.name == "define_dns_servers":
+                result = self._resolve_hostnames("dns-c1")
+            elif mitigation.name == "firewall_pfcp_requests":
+                result = self._resolve_hostnames("ceos2")
+            elif mitigation.name == "validate_smf_integrity":
+                result = "5g-core"
+            elif mitigation.name == "filter_malicious_access":
+                result = self._resolve_hostnames("ceos2")
+            elif mitigation.name == "api_rate_limiting":
+                result = self._resolve_hostnames("ceos2")
+            else:
+                result = ""
+        # Always return a value
+        return result
+
+    def _resolve_hostnames(self, hostname: str) -> str:
+        """
+        Resolve a hostname to an IP address.
+        """
+        if RESOLVE_HOSTNAMES:
+            return IP_MAPPINGS.get(hostname, hostname)
+        else:
+            return hostname
+
+
+def threats() -> list:
+    return [
+        DetectedThreat(DTEIntent(intent_type=intent_type, threat=name, host=hosts, duration=600))
+        for intent_type, name, hosts in THREATS
+    ]
+
+
+def configure(recommender: Recommender, threat: DetectedThreat, mitigation: MitigationAction):
+    mitigation.parameters = {}
+    configured = recommender.configure_mitigation(threat, mitigation)
+    return configured.parameters, recommender.get_mitigation_host(configured)
+
+
+def run(rounds: int) -> None:
+    logging.disable(logging.WARNING)
+    MitigationsController.populate_mitigation_actions()
+    store = InMemoryStore()
+    # Each case configures its own copy of an action recommended for the threat
+    cases = [
+        (threat, MitigationAction.from_dict(action.to_dict()))
+        for threat in threats()
+        for action in store.mitigation_get_candidates(threat.threat_type, threat.threat_name)
+    ]
+    results = {}
+    for label, recommender in (("if/elif chains", LegacyRecommender()), ("templates", Recommender())):
+        outputs = [configure(recommender, threat, mitigation) for threat, mitigation in cases]
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for threat, mitigation in cases:
+                configure(recommender, threat, mitigation)
+        elapsed = time.perf_counter() - start
+        results[label] = (outputs, elapsed)
+
+    legacy, templates = results["if/elif chains"][0], results["templates"][0]
+    mismatches = [case for case, a, b in zip(cases, legacy, templates) if a != b]
+    for threat, mitigation in mismatches:
+        print(f"Mismatch: {mitigation.category.value}/{mitigation.name} for {threat.threat_name}")
+    print(f"{len(cases)} configurations x {rounds} rounds, {len(mismatches)} mismatches")
+    print(f"{'engine':<18}{'seconds':>10}{'us/config':>12}")
+    for label, (_, elapsed) in results.items():
+        print(f"{label:<18}{elapsed:>10.3f}{elapsed / (rounds * len(cases)) * 1e6:>12.2f}")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,90 @@
+"""
+Latency of the calls to an external service: a new connection per request
+(module-level requests.post) vs the pooled keep-alive HTTPClient.
+
+A local stub server answers every POST with a small JSON document. It adds an
+optional processing delay, so sequential calls can be compared with calls
+made from worker threads (as StatusController.get_status_async does) when
+several requests are in flight.
+
+Run from the repository root (a config.yml is required):
+    python tests/benchmarks/bench_http_client.py [n_requests] [delay_ms]
+"""
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "app"))
+
+import requests
+from utils.http_client import HTTPClient
+
+BODY = {"attack_name": "ddos_amplification", "hosts": ["10.0.0.1"]}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive
+    disable_nagle_algorithm = True  # Headers and body are written separately
+    delay = 0.0
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.delay:
+            time.sleep(self.delay)
+        answer = json.dumps({"status": "ok"}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(answer)))
+        self.end_headers()
+        self.wfile.write(answer)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def timed(function, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        function()
+    return (time.perf_counter() - start) / n
+
+
+async def concurrent(client: HTTPClient, url: str, n: int) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(asyncio.to_thread(client.post, url, json=BODY) for _ in range(n)))
+    return (time.perf_counter() - start) / n
+
+
+def run(n: int, delay_ms: float) -> None:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+    client = HTTPClient("bench", timeout=5, max_connections=10)
+
+    print(f"{n} POST requests to a local stub server")
+    print(f"{'client':<36}{'ms/request':>12}")
+    fresh = timed(lambda: requests.post(url, json=BODY, timeout=5), n)
+    print(f"{'requests.post (new connection)':<36}{fresh * 1000:>12.3f}")
+    pooled = timed(lambda: client.post(url, json=BODY), n)
+    print(f"{'HTTPClient.post (keep-alive)':<36}{pooled * 1000:>12.3f}")
+    print(f"Saved per call: {(fresh - pooled) * 1000:.3f} ms")
+
+    StubHandler.delay = delay_ms / 1000
+    calls = min(n, 50)
+    print(f"\n{calls} requests with {delay_ms:.0f} ms of processing in the server")
+    sequential = timed(lambda: client.post(url, json=BODY), calls)
+    print(f"{'HTTPClient.post (sequential)':<36}{sequential * 1000:>12.3f}")
+    gathered = asyncio.run(concurrent(client, url, calls))
+    print(f"{'HTTPClient.post (gathered threads)':<36}{gathered * 1000:>12.3f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 20,
+    )
@@ -0,0 +1,138 @@
+"""
+IA-NDT messages (ImpactAnalysisDT._get_monitor_msg / _get_simulation_msg):
+the former way, which set the fields of shared template dicts (a deep copy is
+needed to keep a message), vs the compiled templates of IANDTMessageTemplates.
+
+The throughput is measured from one thread and from several threads that build
+messages for different jobs at the same time. Every message is checked against
+the expected id, attack and elements: the shared dicts mix the fields of the
+jobs built at the same time, the compiled templates must not.
+
+Run from the repository root:
+    python tests/benchmarks/bench_iandt_messages.py [messages]
+"""
+import copy
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "app"))
+
+from integrations.iandt_messages import BASE_TEMPLATES, DOWNLINK_THREATS, IANDTMessageTemplates, thaw
+
+THREATS = ("dns_amplification", "ddos_download", "ddos_downlink")
+ACTIONS = (None, "rate_limiting", "dns_rate_limiting", "block_pod_address")  # None: measurement
+ATTACKS = {"ddos_download": "ddos_downlink"}
+THREADS = 8
+
+
+def jobs(count: int) -> list:
+    return [
+        (f"job-{i}", ACTIONS[i % len(ACTIONS)], THREATS[(i // len(ACTIONS)) % len(THREATS)])
+        for i in range(count)
+    ]
+
+
+class SharedTemplates:
+    """
+    Former message building: the fields of the job are set in the shared templates.
+    """
+
+    def __init__(self):
+        self._messages = thaw(BASE_TEMPLATES)
+
+    def build(self, job_id: str, action: str, threat: str) -> dict:
+        downlink = threat in DOWNLINK_THREATS
+        if action is None:
+            message = self._messages["monitor"]
+            node, iface = ("dns-c1", "eth1") if downlink else ("ceos3", "eth2")
+            message["what-condition"]["KPIs"]["element"]["node"] = node
+            message["what-condition"]["KPIs"]["element"]["interface"] = iface
+        else:
+            message = self._messages["block" if action == "block_pod_address" else "rate_limit"]
+            if threat == "dns_amplification":
+                message["what-condition"]["KPIs"]["element"]["node"] = "ceos3"
+                message["what-condition"]["KPIs"]["element"]["interface"] = "eth2"
+                message["if-condition"]["element"]["node"] = "ceos3"
+            elif downlink:
+                message["what-condition"]["KPIs"]["element"]["node"] = "dns-c1"
+                message["what-condition"]["KPIs"]["element"]["interface"] = "eth1"
+                message["if-condition"]["element"]["node"] = "ceos2"
+        message["id"] = job_id
+        message["attack"] = ATTACKS.get(threat, threat)
+        # Kept until it is sent (and by the mock answer in development mode)
+        return copy.deepcopy(message)
+
+
+class CompiledTemplates:
+
+    def __init__(self):
+        self._templates = IANDTMessageTemplates()
+
+    def build(self, job_id: str, action: str, threat: str) -> dict:
+        attack = ATTACKS.get(threat, threat)
+        if action is None:
+            return self._templates.monitor(job_id, threat, attack)
+        return self._templates.simulation(job_id, action, threat, attack)
+
+
+def wrong(message: dict, job: tuple) -> bool:
+    job_id, action, threat = job
+    downlink = threat in DOWNLINK_THREATS
+    if action is None:
+        target = "*"
+    else:
+        target = "ceos2" if downlink else "ceos3"
+    return (
+        message["id"] != job_id
+        or message["attack"] != ATTACKS.get(threat, threat)
+        or message["what-condition"]["KPIs"]["element"]["node"] != ("dns-c1" if downlink else "ceos3")
+        or message["if-condition"]["element"]["node"] != target
+    )
+
+
+def single_thread(builder, work: list) -> tuple:
+    start = time.perf_counter()
+    messages = [builder.build(*job) for job in work]
+    elapsed = time.perf_counter() - start
+    return elapsed, sum(wrong(message, job) for message, job in zip(messages, work))
+
+
+def concurrent(builder, work: list) -> tuple:
+    errors = [0] * THREADS
+    barrier = threading.Barrier(THREADS)
+
+    def worker(index: int):
+        part = work[index::THREADS]
+        barrier.wait()
+        for job in part:
+            message = builder.build(*job)
+            errors[index] += wrong(message, job)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(THREADS)]
+    # Switch threads often, as a busy server would do between the dispatches
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start, sum(errors)
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def run(count: int) -> None:
+    work = jobs(count)
+    print(f"{'builder':>10}{'mode':>12}{'msg/s':>12}{'us/msg':>9}{'wrong':>8}")
+    for name, builder in (("shared", SharedTemplates()), ("compiled", CompiledTemplates())):
+        for mode, function in (("1 thread", single_thread), (f"{THREADS} threads", concurrent)):
+            elapsed, errors = function(builder, work)
+            print(f"{name:>10}{mode:>12}{count / elapsed:>12.0f}{elapsed / count * 1e6:>9.2f}{errors:>8}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,63 @@
+"""
+Throughput of the intent ingestion: one POST /intents per report vs POST /intents/batch.
+
+Every report names a different host, so each one creates a threat and an intent.
+The requests go through the FastAPI application (validation included) with the
+test client; the intent pipeline is not started.
+
+Run from the repository root (a config.yml is required):
+    python tests/benchmarks/bench_intent_batch.py [n_reports] [batch_size]
+"""
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "app"))
+
+from fastapi.testclient import TestClient
+import main
+from data.store import InMemoryStore
+
+
+def reports(n: int, prefix: str) -> list:
+    return [
+        {
+            "intent_type": "mitigation",
+            "threat": "ddos_amplification",
+            "host": [f"{prefix}.{i // 250}.{i % 250}"],
+            "duration": 600,
+        }
+        for i in range(n)
+    ]
+
+
+def run(n: int, batch_size: int) -> None:
+    logging.disable(logging.WARNING)
+    main.populate_database()
+    store = InMemoryStore()
+    client = TestClient(main.app)
+
+    start = time.perf_counter()
+    for report in reports(n, "10.1"):
+        client.post("/intents", json=report)
+    single = time.perf_counter() - start
+
+    batch = reports(n, "10.2")
+    start = time.perf_counter()
+    for i in range(0, n, batch_size):
+        client.post("/intents/batch", json=batch[i:i + batch_size])
+    batched = time.perf_counter() - start
+
+    assert len(store.threat_get_all()) == 2 * n
+    print(f"Ingest of {n} reports")
+    print(f"{'endpoint':<28}{'seconds':>10}{'reports/s':>12}")
+    print(f"{'POST /intents':<28}{single:>10.3f}{n / single:>12.0f}")
+    print(f"{f'POST /intents/batch ({batch_size})':<28}{batched:>10.3f}{n / batched:>12.0f}")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+    )
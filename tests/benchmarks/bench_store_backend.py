@@ -0,0 +1,82 @@
+"""
+Ingest throughput of the storage backends (pure in-memory vs SQLite write-through).
+
+Each round ingests N distinct threats with their intents (locate + add), renews
+them (locate + update) and moves them to UNDER_MITIGATION, which is what the
+DTE controller and the pipeline do for every report.
+
+Run from the repository root (a config.yml is required):
+    python tests/benchmarks/bench_store_backend.py [n_threats]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "app"))
+
+import config
+from data.store import InMemoryStore
+from models.api_models import DTEIntent
+from models.core_models import CoreIntent, DetectedThreat
+
+
+def new_store(backend: str, path: str = "") -> InMemoryStore:
+    config.STORAGE_BACKEND = backend
+    config.STORAGE_PATH = path
+    InMemoryStore._instance = None
+    return InMemoryStore()
+
+
+def ingest(store: InMemoryStore, n: int) -> int:
+    operations = 0
+    for i in range(n):
+        dte_intent = DTEIntent(
+            intent_type="mitigation",
+            threat="ddos_amplification",
+            host=[f"10.0.{i // 250}.{i % 250}"],
+            duration=600,
+        )
+        threat = DetectedThreat(dte_intent)
+        if store.threat_locate(threat) is None:
+            store.threat_add(threat)
+        intent = CoreIntent(dte_intent)
+        if not store.intent_exists(intent):
+            store.intent_add(intent)
+        operations += 4
+    for threat in store.threat_get_all():
+        uid = store.threat_locate(threat)
+        threat.renew()
+        store.threat_update(uid, threat)
+        store.threat_set_status(threat, DetectedThreat.ThreatStatus.UNDER_MITIGATION)
+        operations += 3
+    return operations
+
+
+def run(n: int) -> None:
+    logging.disable(logging.WARNING)
+    results = {}
+
+    store = new_store("memory")
+    start = time.perf_counter()
+    operations = ingest(store, n)
+    results["memory"] = (operations, time.perf_counter() - start, 0.0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = new_store("sqlite", os.path.join(tmp, "bench.db"))
+        start = time.perf_counter()
+        operations = ingest(store, n)
+        elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        store.flush()
+        results["sqlite"] = (operations, elapsed, time.perf_counter() - start)
+
+    print(f"Ingest of {n} threats")
+    print(f"{'backend':<10}{'ops':>10}{'seconds':>10}{'ops/s':>12}{'final flush (s)':>18}")
+    for backend, (operations, elapsed, flush) in results.items():
+        print(f"{backend:<10}{operations:>10}{elapsed:>10.3f}{operations / elapsed:>12.0f}{flush:>18.3f}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
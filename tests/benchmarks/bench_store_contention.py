@@ -0,0 +1,114 @@
+"""
+Ingest latency of the InMemoryStore under concurrent dashboard readers.
+
+A writer ingests threats the way the DTE controller does (locate + add, intent
+exists + add) while N reader threads poll the collections served to the
+dashboard (/stats/intents, /stats/threats, /stats/threat-status) every
+millisecond. The p50/p99 latency of each ingest is reported for the
+copy-on-write read views and for reads that take the store lock and copy the
+collection on every call (the previous behaviour).
+
+Run from the repository root (a config.yml is required):
+    python tests/benchmarks/bench_store_contention.py [n_threats] [preloaded]
+"""
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "app"))
+
+import config
+from data.store import InMemoryStore
+from models.api_models import DTEIntent
+from models.core_models import CoreIntent, DetectedThreat
+
+POLL_INTERVAL = 0.001  # Seconds between the polls of each reader
+
+
+class LockedReadStore(InMemoryStore):
+    """
+    Every read takes the store lock and copies the collection.
+    """
+
+    def _view(self, name, build):
+        with self._data_lock:
+            return build()
+
+
+def new_store(store_class) -> InMemoryStore:
+    config.STORAGE_BACKEND = "memory"
+    InMemoryStore._instance = None
+    return store_class()
+
+
+def report(i: int, prefix: str) -> DTEIntent:
+    return DTEIntent(
+        intent_type="mitigation",
+        threat="ddos_amplification",
+        host=[f"{prefix}.{i // 250}.{i % 250}"],
+        duration=600,
+    )
+
+
+def ingest_one(store: InMemoryStore, dte_intent: DTEIntent) -> None:
+    threat = DetectedThreat(dte_intent)
+    if store.threat_locate(threat) is None:
+        store.threat_add(threat)
+    intent = CoreIntent(dte_intent)
+    if not store.intent_exists(intent):
+        store.intent_add(intent)
+
+
+def dashboard(store: InMemoryStore, stop: threading.Event, reads: list) -> None:
+    count = 0
+    while not stop.wait(POLL_INTERVAL):
+        store.intent_get_all()
+        store.threat_get_all()
+        store.threat_count_by_status()
+        count += 3
+    reads.append(count)
+
+
+def measure(store_class, n: int, preloaded: int, readers: int):
+    store = new_store(store_class)
+    for i in range(preloaded):
+        ingest_one(store, report(i, "10.1"))
+    stop = threading.Event()
+    reads = []
+    threads = [threading.Thread(target=dashboard, args=(store, stop, reads)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    latencies = []
+    start = time.perf_counter()
+    for i in range(n):
+        began = time.perf_counter()
+        ingest_one(store, report(i, "10.2"))
+        latencies.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - start
+    stop.set()
+    for thread in threads:
+        thread.join()
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1e6
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1e6
+    return p50, p99, sum(reads) / elapsed
+
+
+def run(n: int, preloaded: int) -> None:
+    logging.disable(logging.WARNING)
+    print(f"Ingest of {n} threats with {preloaded} threats already stored")
+    print(f"{'reads':<14}{'readers':>8}{'p50 (us)':>12}{'p99 (us)':>12}{'reads/s':>12}")
+    for readers in (0, 1, 2, 4, 8):
+        for label, store_class in (("locked", LockedReadStore), ("copy-on-write", InMemoryStore)):
+            p50, p99, read_rate = measure(store_class, n, preloaded, readers)
+            print(f"{label:<14}{readers:>8}{p50:>12.1f}{p99:>12.1f}{read_rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5000,
+    )
@@ -0,0 +1,76 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The tests run with the configuration template (no external service is enabled)
+os.environ.setdefault("IBI_CONFIG", os.path.join(ROOT, "config-template.yml"))
+sys.path.insert(0, os.path.join(ROOT, "app"))
+
+from constants import Const
+from data.retention import RetentionManager
+from data.snapshot import SnapshotManager
+from data.store import InMemoryStore
+from integrations.dt_scheduler import DTScheduler
+from mitigation_templates import MitigationTemplates
+from models.api_models import DTEIntent
+from models.core_models import DetectedThreat, MitigationAction
+
+# No mock answers of the IA-NDT (they are posted to a running server)
+Const.APP_ENV = Const.APP_ENV_PROD
+
+SINGLETONS = (InMemoryStore, DTScheduler, RetentionManager, SnapshotManager, MitigationTemplates)
+
+
+@pytest.fixture(autouse=True)
+def fresh_singletons():
+    """
+    Each test gets new instances of the store and of the managers that share it.
+    """
+    for cls in SINGLETONS:
+        cls._instance = None
+    yield
+    for cls in SINGLETONS:
+        cls._instance = None
+
+
+@pytest.fixture
+def store():
+    return InMemoryStore()
+
+
+@pytest.fixture
+def make_request():
+    """
+    Factory of DTE requests (a prevention of a DDoS on 10.0.0.1 by default).
+    'host' is a host or a list of hosts.
+    """
+    def make(threat="ddos_download_link", intent_type="prevention", host="10.0.0.1", duration=600):
+        hosts = [host] if isinstance(host, str) else list(host)
+        return DTEIntent(intent_type=intent_type, threat=threat, host=hosts, duration=duration)
+    return make
+
+
+@pytest.fixture
+def make_threat(store, make_request):
+    """
+    Factory of threats added to the store (same arguments as make_request).
+    """
+    def make(*args, **kwargs):
+        threat = DetectedThreat(make_request(*args, **kwargs))
+        store.threat_add(threat)
+        return threat
+    return make
+
+
+@pytest.fixture
+def make_action():
+    """
+    Factory of mitigation actions (rate limiting by default).
+    """
+    def make(name="rate_limiting", parameters=None):
+        action = MitigationAction(name, "prevention", [], ["device", "rate"])
+        action.parameters = dict({"rate": 8} if parameters is None else parameters)
+        return action
+    return make
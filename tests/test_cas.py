@@ -0,0 +1,117 @@
+import pytest
+
+import config
+from integrations.cas import CASClient
+from models.core_models import CoreIntent
+from utils.cache import TTLCache
+
+# Smallest rate accepted by the stubbed CAS
+BOUNDARY = 37
+
+
+@pytest.fixture
+def cas(monkeypatch):
+    monkeypatch.setattr(CASClient, "_verdicts", TTLCache(300, 16))
+    monkeypatch.setattr(CASClient, "_verdicts_compromised", False)
+    return CASClient()
+
+
+@pytest.fixture
+def calls(cas, monkeypatch):
+    """
+    Rates sent to a stubbed CAS that accepts BOUNDARY and more, and reports the
+    compliance of the lower rates as a percentage of BOUNDARY.
+    """
+    calls = []
+
+    def validate(intent, action):
+        rate = int(action.parameters["rate"])
+        calls.append(rate)
+        if rate >= BOUNDARY:
+            return CASClient.VALID, None
+        return CASClient.PARTIAL, rate * 100 // BOUNDARY
+
+    monkeypatch.setattr(cas, "_validate", validate)
+    return calls
+
+
+def test_tuning_converges_to_the_boundary(cas, calls, make_request, make_action):
+    action = make_action()
+
+    result, rounds = cas.validate_and_tune(CoreIntent(make_request()), action)
+
+    assert (result, action.parameters["rate"]) == (CASClient.VALID, BOUNDARY)
+    assert rounds == len(calls) - 1 <= config.CAS_TUNING_MAX_ROUNDS
+    # Far fewer calls than the linear search (one increment per call)
+    assert rounds < BOUNDARY - 8
+
+
+def test_tuning_stops_after_max_rounds(cas, calls, monkeypatch, make_request, make_action):
+    monkeypatch.setattr(config, "CAS_TUNING_MAX_ROUNDS", 2)
+    action = make_action(parameters={"rate": 1})
+
+    result, rounds = cas.validate_and_tune(CoreIntent(make_request()), action)
+
+    # The smallest accepted value found within the rounds is kept
+    assert (rounds, len(calls)) == (2, 3)
+    assert (result, action.parameters["rate"]) == (CASClient.VALID, max(calls))
+    assert action.parameters["rate"] > BOUNDARY
+
+
+def test_tuning_stops_after_the_timeout(cas, calls, monkeypatch, make_request, make_action):
+    monkeypatch.setattr(config, "CAS_TUNING_TIMEOUT", 0)
+
+    result, rounds = cas.validate_and_tune(CoreIntent(make_request()), make_action())
+
+    assert (result, rounds, calls) == (CASClient.INVALID, 0, [8])
+
+
+class Answer:
+    """
+    Answer of the stubbed CAS.
+    """
+    status_code = 200
+
+    def json(self):
+        return {"allow": True}
+
+
+@pytest.fixture
+def posted(cas, monkeypatch):
+    """
+    Messages posted to a stubbed CAS that accepts every action.
+    """
+    posted = []
+    monkeypatch.setattr(cas, "enabled", True)
+    monkeypatch.setattr(cas._http, "post", lambda url, data, **kwargs: posted.append(data) or Answer())
+    return posted
+
+
+def test_verdicts_are_cached_by_fingerprint(cas, posted, make_request, make_action):
+    action = make_action()
+    assert cas.validate(CoreIntent(make_request()), action) == CASClient.VALID
+    key = CASClient._fingerprint(cas._cas_message(CoreIntent(make_request()), action))
+    assert CASClient._verdicts.get(key) == (CASClient.VALID, None)
+
+    # Another intent for the same action, threat and hosts
+    assert cas.validate(CoreIntent(make_request()), action) == CASClient.VALID
+    assert len(posted) == 1
+
+    # Other parameters or other hosts
+    cas.validate(CoreIntent(make_request()), make_action(parameters={"rate": 9}))
+    cas.validate(CoreIntent(make_request(host="10.0.0.2")), action)
+    assert len(posted) == 3
+
+
+def test_compromised_flag_drops_the_cached_verdicts(store, cas, posted, make_request, make_action):
+    cas.validate(CoreIntent(make_request()), make_action())
+
+    store.ibi_set_compromised(True)
+    cas.validate(CoreIntent(make_request()), make_action())
+    assert len(posted) == 2
+    cas.validate(CoreIntent(make_request()), make_action())
+    assert len(posted) == 2
+
+    store.ibi_set_compromised(False)
+    cas.validate(CoreIntent(make_request()), make_action())
+    assert len(posted) == 3
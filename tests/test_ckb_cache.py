@@ -0,0 +1,159 @@
+import threading
+
+import pytest
+import requests
+
+from integrations.ckb import CKB
+from utils import cache
+from utils.cache import SingleFlight, TTLCache
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+
+    def __init__(self, body):
+        self._body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._body
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def ckb(monkeypatch):
+    # The answers and the queries in flight are shared by the CKB clients
+    monkeypatch.setattr(CKB, "_responses", TTLCache(300, 16))
+    monkeypatch.setattr(CKB, "_queries", SingleFlight())
+    client = CKB()
+    client.enabled = True
+    client.ckb_url = "http://ckb.test"
+    return client
+
+
+def test_ttl_cache_expires_entries(clock):
+    responses = TTLCache(ttl=10)
+    responses.set("dns_amplification", {"mitigations": []})
+
+    clock.now += 9
+    assert responses.get("dns_amplification") == {"mitigations": []}
+    clock.now += 2
+    assert responses.get("dns_amplification") is None
+
+    metrics = responses.get_metrics()
+    assert (metrics["hits"], metrics["misses"], metrics["entries"]) == (1, 1, 0)
+
+
+def test_ttl_cache_evicts_least_recently_used(clock):
+    responses = TTLCache(ttl=10, max_entries=2)
+    responses.set("a", 1)
+    responses.set("b", 2)
+    responses.get("a")
+    responses.set("c", 3)
+
+    assert responses.get("b") is None
+    assert responses.get("a") == 1
+    assert responses.get("c") == 3
+
+
+def test_ttl_cache_disabled_with_zero_ttl(clock):
+    responses = TTLCache(ttl=0)
+    responses.set("a", 1)
+
+    assert not responses.enabled
+    assert responses.get("a") is None
+
+
+def test_single_flight_shares_concurrent_calls():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def query():
+        calls.append(1)
+        release.wait(5)
+        return "answer"
+
+    threads = [threading.Thread(target=lambda: results.append(flight.do("key", query))) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    # Wait until the followers are waiting for the leader
+    for _ in range(500):
+        if flight.get_metrics()["shared"] == 3:
+            break
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert calls == [1]
+    assert results == ["answer"] * 4
+    assert flight.get_metrics() == {"in_flight": 0, "shared": 3}
+
+
+def test_single_flight_propagates_errors():
+    flight = SingleFlight()
+
+    def query():
+        raise RuntimeError("unreachable")
+
+    with pytest.raises(RuntimeError):
+        flight.do("key", query)
+    # The failed call is not kept
+    assert flight.do("key", lambda: "answer") == "answer"
+
+
+def test_query_ckb_caches_answers(ckb, monkeypatch):
+    posted = []
+
+    def post(url, **kwargs):
+        posted.append(kwargs["json"])
+        return FakeResponse({"attack": kwargs["json"]["attack_name"]})
+
+    monkeypatch.setattr(ckb._http, "post", post)
+
+    assert ckb.query_ckb("dns_amplification") == {"attack": "dns_amplification"}
+    assert ckb.query_ckb("dns_amplification") == {"attack": "dns_amplification"}
+    # A similar name resolves to the same attack, so to the same cached answer
+    assert ckb.query_ckb("dns_amplificaton") == {"attack": "dns_amplification"}
+    assert posted == [{"attack_name": "dns_amplification"}]
+
+
+def test_query_ckb_does_not_cache_errors(ckb, monkeypatch):
+    answers = [requests.exceptions.ConnectionError("down"), FakeResponse(["ok"])]
+
+    def post(url, **kwargs):
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    monkeypatch.setattr(ckb._http, "post", post)
+
+    assert ckb.query_ckb("mitm") is None
+    assert ckb.query_ckb("mitm") == ["ok"]
+    assert CKB.get_metrics()["cache"]["entries"] == 1
+
+
+def test_query_ckb_disabled(ckb, monkeypatch):
+    ckb.enabled = False
+    monkeypatch.setattr(ckb._http, "post", lambda *args, **kwargs: pytest.fail("CKB queried"))
+
+    assert ckb.query_ckb("mitm") is None
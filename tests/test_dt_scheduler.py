@@ -0,0 +1,125 @@
+from integrations.dt_scheduler import DTScheduler, DTTask
+from models.core_models import DTJob
+
+MEASUREMENT = DTTask.TaskType.MEASUREMENT
+SIMULATION = DTTask.TaskType.SIMULATION
+
+
+def make_scheduler(max_concurrent=1, topologies=None, retries=1):
+    scheduler = DTScheduler()
+    scheduler.max_concurrent = max_concurrent
+    scheduler.topology_limits = dict(topologies or {})
+    scheduler.task_timeout = 60
+    scheduler.max_retries = retries
+    return scheduler
+
+
+def enqueue_job(scheduler, threat_id="threat", topology="horse_ddos"):
+    job = DTJob(threat_id, "action")
+    scheduler.enqueue(job, MEASUREMENT, topology)
+    scheduler.enqueue(job, SIMULATION, topology)
+    return job
+
+
+def ids(tasks):
+    return [(task.request_id, task.task_type) for task in tasks]
+
+
+def test_limit_per_topology():
+    scheduler = make_scheduler(max_concurrent=1, topologies={"big": 2})
+    jobs = [enqueue_job(scheduler, f"threat-{i}", "big") for i in range(3)]
+    small = enqueue_job(scheduler, "threat-small", "small")
+
+    ready = scheduler.take_ready()
+
+    assert ids(ready) == [(jobs[0].uid, MEASUREMENT), (jobs[1].uid, MEASUREMENT), (small.uid, MEASUREMENT)]
+    assert not scheduler.is_available()
+    state = scheduler.get_state()["topologies"]
+    assert state["big"] == {"in_flight": 2, "queued": 4, "limit": 2}
+    assert state["small"] == {"in_flight": 1, "queued": 1, "limit": 1}
+
+
+def test_simulation_waits_for_the_measurement():
+    scheduler = make_scheduler(max_concurrent=2)
+    job = enqueue_job(scheduler)
+
+    assert ids(scheduler.take_ready()) == [(job.uid, MEASUREMENT)]
+    assert scheduler.take_ready() == []
+
+    job.update_kpi_before(100.0)
+    assert scheduler.complete(job.uid).task_type == MEASUREMENT
+    assert ids(scheduler.take_ready()) == [(job.uid, SIMULATION)]
+
+
+def test_one_measurement_per_threat():
+    scheduler = make_scheduler(max_concurrent=2)
+    first = enqueue_job(scheduler, "threat")
+    second = enqueue_job(scheduler, "threat")
+
+    assert ids(scheduler.take_ready()) == [(first.uid, MEASUREMENT)]
+    scheduler.complete(first.uid)
+    assert ids(scheduler.take_ready()) == [(second.uid, MEASUREMENT)]
+
+
+def test_timed_out_request_is_queued_again_then_fails():
+    scheduler = make_scheduler(retries=1)
+    enqueue_job(scheduler)
+    task = scheduler.take_ready()[0]
+
+    assert scheduler.expire(task.deadline) == []
+    assert scheduler.get_state()["retried"] == 1
+    task = scheduler.take_ready()[0]
+    assert task.attempts == 2
+
+    assert scheduler.expire(task.deadline) == [task]
+    state = scheduler.get_state()
+    assert (state["timed_out"], state["failed"]) == (2, 1)
+    assert state["in_flight"] == {}
+    assert scheduler.is_available()
+
+
+def test_late_answer_removes_the_queued_retry():
+    scheduler = make_scheduler()
+    job = enqueue_job(scheduler)
+    task = scheduler.take_ready()[0]
+    scheduler.expire(task.deadline)
+
+    # The answer to the first attempt arrives after the watchdog queued it again
+    assert scheduler.complete(job.uid) is task
+    job.update_kpi_before(100.0)
+
+    assert ids(scheduler.take_ready()) == [(job.uid, SIMULATION)]
+    assert scheduler.get_state()["completed"] == 1
+
+
+def test_complete_unknown_request():
+    scheduler = make_scheduler()
+    job = enqueue_job(scheduler)
+
+    # The tasks of the job were never sent: they cannot be answered
+    assert scheduler.complete(job.uid) is None
+    assert scheduler.queue_size() == 2
+
+
+def test_tasks_of_terminal_jobs_are_dropped():
+    scheduler = make_scheduler(max_concurrent=3)
+    done = enqueue_job(scheduler, "threat-1")
+    failed = enqueue_job(scheduler, "threat-2")
+    pending = enqueue_job(scheduler, "threat-3")
+    done.update_status(DTJob.JobStatus.COMPLETED)
+    failed.update_status(DTJob.JobStatus.FAILED)
+
+    assert ids(scheduler.take_ready()) == [(pending.uid, MEASUREMENT)]
+    assert scheduler.queue_size() == 1
+
+
+def test_discard_frees_the_slot():
+    scheduler = make_scheduler()
+    job = enqueue_job(scheduler)
+    scheduler.take_ready()
+
+    scheduler.discard(job.uid)
+
+    assert scheduler.queue_size() == 0
+    assert scheduler.get_state()["in_flight"] == {}
+    assert scheduler.is_available()
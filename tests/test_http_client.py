@@ -0,0 +1,76 @@
+import asyncio
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from controllers import status_controller
+from controllers.status_controller import StatusController
+from utils.http_client import HTTPClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path == "/slow":
+            time.sleep(0.3)
+        self.send_response(200 if self.path in ("/up", "/slow") else 503)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_client_is_shared_per_service():
+    assert HTTPClient.for_service("status") is HTTPClient.for_service("status")
+    assert HTTPClient.for_service("status") is not HTTPClient.for_service("ckb")
+
+
+def test_status_of_the_modules(server_url, monkeypatch):
+    modules = [
+        {"name": "up", "description": "", "url": f"{server_url}/up", "expected_code": 200},
+        {"name": "down", "description": "", "url": f"{server_url}/down", "expected_code": 200},
+        {"name": "gone", "description": "", "url": "http://127.0.0.1:1/", "expected_code": 200},
+    ]
+    monkeypatch.setattr(status_controller, "MODULE_STATUS", modules)
+    controller = StatusController()
+
+    expected = [StatusController.MODULE_STATUS_ONLINE] + [StatusController.MODULE_STATUS_OFFLINE] * 2
+    assert [module["status"] for module in controller.get_status()] == expected
+    assert asyncio.run(controller.get_status_async()) == controller.get_status()
+
+
+def test_async_status_queries_overlap(server_url, monkeypatch):
+    modules = [
+        {"name": f"slow-{i}", "description": "", "url": f"{server_url}/slow", "expected_code": 200}
+        for i in range(4)
+    ]
+    monkeypatch.setattr(status_controller, "MODULE_STATUS", modules)
+    controller = StatusController()
+
+    async def query():
+        started = time.monotonic()
+        status = await controller.get_status_async()
+        elapsed = time.monotonic() - started
+        # The client of the event loop is kept for the next requests
+        client = controller._http._get_async_client()
+        assert await controller.get_status_async() == status
+        assert controller._http._get_async_client() is client
+        await controller._http.aclose()
+        return status, elapsed
+
+    status, elapsed = asyncio.run(query())
+
+    assert [module["status"] for module in status] == [StatusController.MODULE_STATUS_ONLINE] * 4
+    assert elapsed < 1.0
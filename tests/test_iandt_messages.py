@@ -0,0 +1,102 @@
+import json
+import threading
+
+import pytest
+
+from integrations.iandt_messages import BASE_TEMPLATES, IANDTMessageTemplates, freeze, overlay, thaw
+
+
+@pytest.fixture
+def templates():
+    return IANDTMessageTemplates()
+
+
+def what(message):
+    element = message["what-condition"]["KPIs"]["element"]
+    return element["node"], element["interface"]
+
+
+def target(message):
+    element = message["if-condition"]["element"]
+    return element["node"], element["interface"], element["ref"]
+
+
+@pytest.mark.parametrize("threat, element", [
+    ("dns_amplification", ("ceos3", "eth2")),
+    ("ddos_download_link", ("dns-c1", "eth1")),
+    ("ddos_downlink", ("dns-c1", "eth1")),
+    ("mitm", ("ceos3", "eth2")),
+])
+def test_monitor_message(templates, threat, element):
+    message = templates.monitor("job-1", threat, "attack")
+
+    assert (message["id"], message["attack"]) == ("job-1", "attack")
+    assert what(message) == element
+    assert message["if-condition"]["action"]["type"] == "monitor"
+    assert message["what-condition"]["KPIs"]["duration"] == "30s"
+
+
+@pytest.mark.parametrize("action, threat, element, node, value", [
+    ("rate_limiting", "dns_amplification", ("ceos3", "eth2"), ("ceos3", "eth2", "ceos3_eth2_*"), "1"),
+    ("dns_rate_limiting", "ddos_download", ("dns-c1", "eth1"), ("ceos2", "eth1", "ceos2_eth1_*"), "1"),
+    ("block_pod_address", "dns_amplification", ("ceos3", "eth2"), ("ceos3", "eth1", "ceos3_eth1_*"), "dns-c1"),
+    ("block_pod_address", "ddos_downlink", ("dns-c1", "eth1"), ("ceos2", "eth1", "ceos2_eth1_*"), "internet"),
+    # Other threats: the base template of the action
+    ("rate_limiting", "mitm", ("dns-c1", "eth1"), ("ceos2", "eth1", "ceos2_eth1_*"), "1"),
+])
+def test_simulation_message(templates, action, threat, element, node, value):
+    message = templates.simulation("job-1", action, threat, "attack")
+
+    assert (message["id"], message["attack"]) == ("job-1", "attack")
+    assert what(message) == element
+    assert target(message) == node
+    assert message["if-condition"]["action"]["value"] == value
+
+
+def test_unknown_action_cannot_be_simulated(templates):
+    assert not templates.can_simulate("validate_smf_integrity")
+    assert templates.simulation("job-1", "validate_smf_integrity", "mitm", "attack") is None
+    assert templates.topology("validate_smf_integrity") == templates.topology() == "horse_ddos"
+
+
+def test_messages_are_independent_copies(templates):
+    message = templates.simulation("job-1", "rate_limiting", "dns_amplification", "attack")
+    message["if-condition"]["element"]["node"] = "changed"
+    message["what-condition"]["KPIs"]["duration"] = "1s"
+
+    again = templates.simulation("job-2", "rate_limiting", "dns_amplification", "attack")
+    assert target(again)[0] == "ceos3"
+    assert again["what-condition"]["KPIs"]["duration"] == "15s"
+    assert json.loads(json.dumps(again)) == again
+    with pytest.raises(TypeError):
+        BASE_TEMPLATES["monitor"]["id"] = "job-1"
+
+
+def test_overlay_replaces_nested_values():
+    base = freeze({"a": {"b": 1, "c": [1, 2]}, "d": 2})
+
+    merged = overlay(base, {"a": {"b": 3}})
+
+    assert thaw(merged) == {"a": {"b": 3, "c": [1, 2]}, "d": 2}
+    assert thaw(base) == {"a": {"b": 1, "c": [1, 2]}, "d": 2}
+
+
+def test_messages_built_from_several_threads(templates):
+    errors = []
+
+    def build(index):
+        for i in range(200):
+            job_id = f"job-{index}-{i}"
+            threat = ("dns_amplification", "ddos_downlink")[i % 2]
+            message = templates.simulation(job_id, "rate_limiting", threat, threat)
+            expected = ("ceos3", "eth2") if threat == "dns_amplification" else ("dns-c1", "eth1")
+            if message["id"] != job_id or message["attack"] != threat or what(message) != expected:
+                errors.append(job_id)
+
+    threads = [threading.Thread(target=build, args=(index,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
@@ -0,0 +1,109 @@
+from datetime import datetime
+
+import pytest
+
+from controllers.iandt_controller import IANDTController
+from integrations.dt_scheduler import DTScheduler, DTTask
+from integrations.iandt import ImpactAnalysisDT
+from models.core_models import DetectedThreat, DTJob
+
+
+@pytest.fixture
+def iadt(monkeypatch):
+    iadt = ImpactAnalysisDT()
+    iadt.sent = []
+    monkeypatch.setattr(iadt, "send_iandt_message", iadt.sent.append)
+    iadt._scheduler.max_retries = 0
+    return iadt
+
+
+def time_out(iadt):
+    """
+    Run a pipeline cycle after the deadline of the requests in flight.
+    """
+    for task in iadt._scheduler._in_flight.values():
+        task.deadline = 0
+    iadt.process_queued_jobs()
+
+
+def test_lost_measurement_fails_the_candidates(store, iadt, make_threat, make_action):
+    threat = make_threat()
+    iadt.enqueue_simulations(threat, [make_action(), make_action("block_pod_address")])
+    iadt.process_queued_jobs()
+    store.threat_pop_dirty()
+
+    time_out(iadt)
+
+    jobs = store.dt_job_get_all_by_threat(threat.uid)
+    assert [job.status for job in jobs] == [DTJob.JobStatus.FAILED] * 2
+    assert store.threat_pop_dirty() == [threat]
+    state = iadt._scheduler.get_state()
+    assert (state["queue_size"], state["in_flight"], state["failed"]) == (0, {}, 1)
+
+
+def test_late_answer_of_a_failed_job_is_ignored(store, iadt, make_threat, make_action):
+    threat = make_threat()
+    iadt.enqueue_simulation(threat, make_action())
+    iadt.process_queued_jobs()
+    time_out(iadt)
+    job = store.dt_job_get_all_by_threat(threat.uid)[0]
+
+    IANDTController().process_response(job.uid, 100.0)
+
+    assert job.status == DTJob.JobStatus.FAILED
+    assert job.kpi_before is None
+
+
+def test_failing_an_archived_job_keeps_it_archived(store, iadt, make_threat, make_action):
+    threat = make_threat()
+    iadt.enqueue_simulation(threat, make_action())
+    task = iadt._scheduler.take_ready()[0]
+    store.dt_job_delete(threat.uid)
+
+    iadt._fail_task(task)
+
+    assert task.job.status == DTJob.JobStatus.EXPIRED
+    assert store.dt_job_get_all() == []
+    assert store.dt_job_get_all(expired=True) == [task.job]
+
+
+def test_answer_of_an_unknown_job_frees_the_slot(store):
+    scheduler = DTScheduler()
+    scheduler.enqueue(DTJob("threat", "action"), DTTask.TaskType.MEASUREMENT, "horse_ddos")
+    task = scheduler.take_ready()[0]
+    assert not scheduler.is_available()
+
+    IANDTController().process_response(task.request_id, 100.0)
+
+    assert scheduler.get_state()["in_flight"] == {}
+    assert scheduler.is_available()
+
+
+def test_archived_jobs_drop_their_requests(store, iadt, make_threat, make_action):
+    evaluated = make_threat()
+    iadt.enqueue_simulation(evaluated, make_action())
+    iadt.process_queued_jobs()
+    assert len(iadt.sent) == 1
+
+    # Evaluated by the pipeline while its measurement is in flight
+    store.dt_job_delete(evaluated.uid)
+
+    state = iadt._scheduler.get_state()
+    assert (state["queue_size"], state["in_flight"]) == (0, {})
+
+
+def test_expired_threat_archives_its_jobs(store, iadt, make_request, make_action):
+    threat = DetectedThreat(make_request())
+    threat.end_time = datetime.now().timestamp() - 1
+    store.threat_add(threat)
+    iadt.enqueue_simulation(threat, make_action())
+    store.threat_set_status(threat, DetectedThreat.ThreatStatus.UNDER_EMULATION)
+
+    # Expired while under emulation
+    store.expire_old_threats()
+
+    assert threat.get_status() == DetectedThreat.ThreatStatus.MITIGATED
+    assert store.dt_job_get_all_by_threat(threat.uid) == []
+    assert iadt._scheduler.queue_size() == 0
+    # Nothing keeps the threat from being compacted
+    assert [t["uid"] for t in store.compact(float("inf"))["threats"]] == [threat.uid]
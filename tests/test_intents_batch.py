@@ -0,0 +1,70 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from controllers.dte_controller import DTEController
+from controllers.mitigations_controller import MitigationsController
+from routers import intents
+
+
+@pytest.fixture
+def controller(store, monkeypatch):
+    MitigationsController.populate_mitigation_actions()
+    controller = DTEController()
+    # The router keeps the controller created at import time (and its store)
+    monkeypatch.setattr(intents, "controller", controller)
+    return controller
+
+
+@pytest.fixture
+def client(controller):
+    app = FastAPI()
+    app.include_router(intents.router)
+    return TestClient(app)
+
+
+def test_batch_endpoint_answers_each_request(store, controller, client, make_request):
+    renewed = make_request()
+    controller.process_dte_intent(renewed)
+    batch = [
+        renewed,
+        make_request(host="10.0.0.2"),
+        make_request(threat="unknown_threat"),
+        make_request(host=["10.0.0.3", "10.0.0.4"]),
+        # Same type, threat and hosts as the previous request
+        make_request(host=["10.0.0.4", "10.0.0.3"]),
+    ]
+
+    response = client.post("/intents/batch", json=[request.model_dump(mode="json") for request in batch])
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert [result["status"] for result in results] == ["renewed", "created", "rejected", "created", "renewed"]
+    assert results[2] == {
+        "threat": "unknown_threat", "status": "rejected", "error": "Threat not supported: unknown_threat",
+    }
+    assert len(store.intent_get_all()) == 3
+    assert len(store.threat_get_all()) == 3
+
+
+def test_repeated_requests_of_a_batch_are_processed_once(store, controller, monkeypatch, make_request):
+    renewals = []
+    threat_update = store.threat_update
+    monkeypatch.setattr(store, "threat_update", lambda key, threat: renewals.append(key) or threat_update(key, threat))
+    existing = make_request(host="10.0.0.1")
+    controller.process_dte_intent(existing)
+
+    statuses = controller.process_dte_intents([existing, existing, make_request(host="10.0.0.2")] * 2)
+
+    assert statuses == [
+        DTEController.RETURN_STATUS_UPDATED,
+        DTEController.RETURN_STATUS_UPDATED,
+        DTEController.RETURN_STATUS_CREATED,
+        DTEController.RETURN_STATUS_UPDATED,
+        DTEController.RETURN_STATUS_UPDATED,
+        DTEController.RETURN_STATUS_UPDATED,
+    ]
+    # The existing threat is renewed once, the new one is not renewed
+    assert len(renewals) == 1
+    assert len(store.intent_get_all()) == 2
+    assert len(store.threat_get_all()) == 2
@@ -0,0 +1,117 @@
+from datetime import datetime
+
+import pytest
+
+import config
+from controllers.iandt_controller import IANDTController
+from integrations.dt_scheduler import DTScheduler
+from integrations.iandt import ImpactAnalysisDT
+from models.core_models import DetectedThreat
+
+
+@pytest.fixture
+def iadt(monkeypatch):
+    iadt = ImpactAnalysisDT()
+    iadt.sent = []
+    monkeypatch.setattr(iadt, "send_iandt_message", iadt.sent.append)
+    return iadt
+
+
+def measure(store, iadt, threat, action, value):
+    """
+    Run the measurement of a new job of a threat for an action, answered with value
+    (the simulation of the job is dropped).
+    """
+    iadt.enqueue_simulation(threat, action)
+    iadt.process_queued_jobs()
+    message = iadt.sent.pop()
+    IANDTController().process_response(message["id"], value)
+    DTScheduler().discard(message["id"])
+    return store.dt_job_get(message["id"])
+
+
+def baseline_key(iadt, threat):
+    job = next(job for job in iadt._store.dt_job_get_all(expired=True) if job.threat_id == threat.uid)
+    return iadt._baseline_key(iadt._get_monitor_msg(job))
+
+
+def test_answer_sets_the_baseline(store, iadt, make_threat, make_action):
+    threat = make_threat()
+
+    measure(store, iadt, threat, make_action(), 100.0)
+
+    assert store.kpi_baseline_get(baseline_key(iadt, threat), 60) == 100.0
+
+
+def test_recent_baseline_is_reused_by_another_threat(store, iadt, make_threat, make_action, monkeypatch):
+    monkeypatch.setattr(config, "IADT_BASELINE_TTL", 600)
+    measure(store, iadt, make_threat(), make_action(), 100.0)
+    metrics = DTScheduler().get_state()
+
+    other = make_threat(host="10.0.0.2")
+    iadt.enqueue_simulation(other, make_action())
+    iadt.process_queued_jobs()
+
+    assert iadt.sent == []
+    assert store.dt_job_get_all_by_threat(other.uid)[0].kpi_before == 100.0
+    state = DTScheduler().get_state()
+    assert state["measurements_reused"] == 1
+    assert state["dt_seconds_saved"] > 0
+    # Not accounted as a request sent to the IA-NDT
+    assert state["dispatched"] == metrics["dispatched"]
+    assert state["completed"] == metrics["completed"]
+    assert state["time_in_flight"]["count"] == metrics["time_in_flight"]["count"]
+    assert state["in_flight"] == {}
+
+
+def test_old_baseline_is_measured_again(store, iadt, make_threat, make_action, monkeypatch):
+    monkeypatch.setattr(config, "IADT_BASELINE_TTL", 600)
+    threat = make_threat()
+    measure(store, iadt, threat, make_action(), 100.0)
+    key = baseline_key(iadt, threat)
+    store._kpi_baselines[key] = (100.0, datetime.now().timestamp() - 601)
+
+    other = make_threat(host="10.0.0.2")
+    iadt.enqueue_simulation(other, make_action())
+    iadt.process_queued_jobs()
+
+    assert [message["id"] for message in iadt.sent] == [store.dt_job_get_all_by_threat(other.uid)[0].uid]
+
+
+def test_zero_ttl_only_reuses_the_measurement_of_the_threat(store, iadt, make_threat, make_action, monkeypatch):
+    monkeypatch.setattr(config, "IADT_BASELINE_TTL", 0)
+    threat = make_threat()
+    measure(store, iadt, threat, make_action(), 100.0)
+    # The threat is evaluated: its jobs are archived
+    store.dt_job_delete(threat.uid)
+
+    # Another action for the same threat reuses its measurement
+    iadt.enqueue_simulation(threat, make_action())
+    iadt.process_queued_jobs()
+    job = store.dt_job_get_all_by_threat(threat.uid)[0]
+    assert iadt.sent == []
+    assert job.kpi_before == 100.0
+    DTScheduler().discard(job.uid)
+
+    # Another threat on the same element is measured
+    other = make_threat(host="10.0.0.2")
+    iadt.enqueue_simulation(other, make_action())
+    iadt.process_queued_jobs()
+    other_job = store.dt_job_get_all_by_threat(other.uid)[0]
+    assert [message["id"] for message in iadt.sent] == [other_job.uid]
+    assert other_job.kpi_before is None
+
+
+def test_measurement_of_the_threat_outlives_its_archived_jobs(store, iadt, make_threat, make_action):
+    threat = make_threat()
+    measure(store, iadt, threat, make_action(), 100.0)
+    store.dt_job_delete(threat.uid)
+
+    # The archived jobs are compacted, the threat is still active
+    store.compact(float("inf"))
+    assert store.dt_job_get_all_by_threat(threat.uid, expired=True) == []
+    assert store.dt_job_threat_measurement(threat.uid) == 100.0
+
+    store.threat_set_status(threat, DetectedThreat.ThreatStatus.MITIGATED)
+    store.compact(float("inf"))
+    assert store.dt_job_threat_measurement(threat.uid) is None
@@ -0,0 +1,36 @@
+from controllers import mitigations_controller
+from controllers.mitigations_controller import MitigationsController
+
+
+def action_config(name, fields):
+    return {"name": name, "category": "prevention", "threats": ["ddos_download_link"], "fields": fields}
+
+
+def test_duplicate_catalogue_entries_are_ignored(store, monkeypatch):
+    monkeypatch.setattr(mitigations_controller, "MITIGATION_ACTIONS", [
+        action_config("rate_limiting", ["rate"]),
+        action_config("block_pod_address", ["pod"]),
+        action_config("rate_limiting", ["device", "rate"]),
+    ])
+
+    MitigationsController.populate_mitigation_actions()
+
+    actions = store.mitigation_get_all()
+    assert [action.name for action in actions] == ["rate_limiting", "block_pod_address"]
+    assert actions[0].fields == ["rate"]
+
+
+def test_instances_of_a_catalogue_action_are_independent(store, make_action):
+    action = make_action()
+    first = action.instantiate()
+    second = action.instantiate()
+
+    first.define_field("rate", 1)
+    second.define_field("rate", 2)
+    second.define_field("device", "ceos3")
+
+    assert first.parameters == {"rate": 1}
+    assert second.parameters == {"rate": 2, "device": "ceos3"}
+    assert action.parameters == {"rate": 8}
+    assert first.uid == second.uid == action.uid
+    assert first is not action and second is not action
@@ -0,0 +1,107 @@
+import heapq
+import threading
+from datetime import datetime
+from time import time
+
+import pytest
+
+from constants import Const
+from controllers.mitigations_controller import MitigationsController
+from models.core_models import CoreIntent, DetectedThreat
+from pipeline import IntentPipeline
+
+
+@pytest.fixture
+def pipeline(store, monkeypatch):
+    MitigationsController.populate_mitigation_actions()
+    pipeline = IntentPipeline()
+    pipeline.sent = []
+    pipeline.visited = []
+    monkeypatch.setattr(pipeline.iadt, "send_iandt_message", pipeline.sent.append)
+    process_threat = pipeline._process_threat
+
+    def visit(intents, threat):
+        pipeline.visited.append(threat)
+        process_threat(intents, threat)
+
+    monkeypatch.setattr(pipeline, "_process_threat", visit)
+    return pipeline
+
+
+def cycle(pipeline):
+    """
+    Run a pipeline cycle and return the uids of the threats it visited.
+    """
+    pipeline.visited = []
+    pipeline.process_intents()
+    return {threat.uid for threat in pipeline.visited}
+
+
+def test_cycle_only_visits_changed_and_expired_threats(store, pipeline, monkeypatch, make_request, make_threat):
+    store.intent_add(CoreIntent(make_request()))
+    handled = make_threat()
+    orphan = make_threat(host="10.0.0.2")
+    get_mitigations = pipeline.recommender.get_mitigations
+    catalogue = {"orphan": None}
+    monkeypatch.setattr(
+        pipeline.recommender, "get_mitigations",
+        lambda threat: catalogue["orphan"] if threat is orphan else get_mitigations(threat),
+    )
+
+    assert cycle(pipeline) == {handled.uid, orphan.uid}
+    assert handled.get_status() == DetectedThreat.ThreatStatus.UNDER_EMULATION
+    # Its status changed in the first cycle
+    assert handled.uid in cycle(pipeline)
+
+    # Waiting for the IA-NDT: only the threat without mitigation is visited again,
+    # without waking the pipeline up
+    store.pipeline_wait(0)
+    assert cycle(pipeline) == {orphan.uid}
+    assert orphan.get_status() == DetectedThreat.ThreatStatus.NEW
+    assert not store.pipeline_wait(0)
+
+    # A mitigation becomes available
+    catalogue["orphan"] = get_mitigations(handled)
+    assert cycle(pipeline) == {orphan.uid}
+    assert orphan.get_status() == DetectedThreat.ThreatStatus.UNDER_EMULATION
+    cycle(pipeline)
+    assert cycle(pipeline) == set()
+
+    # The deadline of a threat is due
+    handled.end_time = datetime.now().timestamp() - 1
+    heapq.heappush(store._threat_deadlines, (handled.end_time, handled.uid))
+    assert cycle(pipeline) == {handled.uid}
+    assert handled.get_status() == DetectedThreat.ThreatStatus.MITIGATED
+
+
+def waited(pipeline):
+    """
+    Wait for work like the pipeline loop after a cycle, and return the seconds waited.
+    """
+    started = time()
+    pipeline.wait_for_work(started)
+    return time() - started
+
+
+def test_store_write_wakes_the_pipeline_up(store, pipeline, monkeypatch, make_threat):
+    monkeypatch.setattr(Const, "THREAD_INTENT_MAX_WAIT", 5.0)
+    threat = make_threat()
+    store.pipeline_wait(0)
+    write = threading.Timer(0.1, store.threat_set_status, (threat, DetectedThreat.ThreatStatus.UNDER_MITIGATION))
+    write.start()
+
+    assert waited(pipeline) < 2
+    write.join()
+
+
+def test_pipeline_polls_without_notification(store, pipeline, monkeypatch):
+    monkeypatch.setattr(Const, "THREAD_INTENT_MAX_WAIT", 0.3)
+    store.pipeline_wait(0)
+
+    assert 0.3 <= waited(pipeline) < 2
+
+    # A scheduled deadline comes before the polling timeout
+    monkeypatch.setattr(Const, "THREAD_INTENT_MAX_WAIT", 5.0)
+    monkeypatch.setattr(Const, "THREAD_INTENT_DEADLINE_SLACK", 0.1)
+    store.pipeline_schedule(time() + 0.2)
+    assert waited(pipeline) < 2
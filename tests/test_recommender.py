@@ -0,0 +1,19 @@
+import config
+from recommender import Recommender
+
+
+def test_mitigation_host_from_templates(monkeypatch, make_action):
+    monkeypatch.setattr(config, "RESOLVE_HOSTNAMES", False)
+    recommender = Recommender()
+
+    assert recommender.get_mitigation_host(make_action("block_pod_address")) == "router2"
+    assert recommender.get_mitigation_host(make_action("rate_limiting")) == "ceos2"
+    assert recommender.get_mitigation_host(make_action("rate_limiting", {"device": "ceos3"})) == "ceos3"
+    assert recommender.get_mitigation_host(make_action("unknown_action")) == ""
+
+
+def test_mitigation_host_resolves_hostnames(monkeypatch, make_action):
+    monkeypatch.setattr(config, "RESOLVE_HOSTNAMES", True)
+    monkeypatch.setattr(config, "IP_MAPPINGS", {"router2": "10.10.0.2"})
+
+    assert Recommender().get_mitigation_host(make_action("block_pod_address")) == "10.10.0.2"
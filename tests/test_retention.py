@@ -0,0 +1,91 @@
+from datetime import datetime
+
+from data.retention import RetentionManager
+from integrations.dt_scheduler import DTScheduler
+from integrations.iandt import ImpactAnalysisDT
+from models.api_models import DTEIntent
+from models.core_models import CoreIntent, DetectedThreat, DTJob
+
+
+def future():
+    return datetime.now().timestamp() + 1
+
+
+def test_compact_removes_mitigated_threats(store, make_threat, make_action):
+    active = make_threat()
+    mitigated = make_threat(threat="dns_amplification")
+    store.association_add(mitigated.uid, make_action())
+    store.threat_set_status(mitigated, DetectedThreat.ThreatStatus.MITIGATED)
+
+    removed = store.compact(future())
+
+    assert [t["uid"] for t in removed["threats"]] == [mitigated.uid]
+    assert len(removed["threats"][0]["associations"]) == 1
+    assert store.threat_get(mitigated.uid) is None
+    assert store.threat_get(active.uid) is active
+
+
+def test_compact_keeps_recent_records(store, make_threat):
+    threat = make_threat()
+    store.threat_set_status(threat, DetectedThreat.ThreatStatus.MITIGATED)
+
+    removed = store.compact(datetime.now().timestamp() - 60)
+
+    assert removed == {"threats": [], "intents": [], "dt_jobs": []}
+    assert store.threat_get(threat.uid) is threat
+
+
+def test_compact_keeps_threats_with_live_dt_jobs(store, make_threat):
+    threat = make_threat()
+    store.threat_set_status(threat, DetectedThreat.ThreatStatus.MITIGATED)
+    # A job still live for the mitigated threat (e.g. restored from a snapshot)
+    job = DTJob(threat.uid, "action")
+    store.dt_job_add(job)
+
+    assert store.compact(future())["threats"] == []
+    assert store.threat_get(threat.uid) is threat
+
+    store.dt_job_delete(threat.uid)
+    removed = store.compact(future())
+    assert [t["uid"] for t in removed["threats"]] == [threat.uid]
+    assert [j["uid"] for j in removed["dt_jobs"]] == [job.uid]
+    assert store.dt_job_get_all(expired=True) == []
+
+
+def test_compact_removes_timed_out_intents(store):
+    intent = CoreIntent(DTEIntent(intent_type="prevention", threat="ddos_download_link", host=["10.0.0.1"], duration=1))
+    store.intent_add(intent)
+
+    removed = store.compact(intent.end_time + 1)
+
+    assert [i["uid"] for i in removed["intents"]] == [intent.uid]
+    assert store.intent_get(intent.uid) is None
+
+
+def test_retention_manager_metrics_and_archive(store, make_threat):
+    threat = make_threat()
+    store.threat_set_status(threat, DetectedThreat.ThreatStatus.MITIGATED)
+    retention = RetentionManager()
+    retention.ttl = -1
+
+    retention.run(force=True)
+
+    metrics = retention.get_metrics()
+    assert metrics["compactions"] == 1
+    assert metrics["records_reclaimed"]["threats"] == 1
+    assert metrics["bytes_reclaimed"] > 0
+    assert [record["record"]["uid"] for record in retention.get_archive()] == [threat.uid]
+
+
+def test_dt_task_of_removed_threat_is_dropped(store, make_threat, make_action):
+    threat = make_threat()
+    iadt = ImpactAnalysisDT()
+    iadt.enqueue_simulation(threat, make_action())
+    store.threat_remove(threat.uid)
+
+    iadt.process_queued_jobs()
+
+    state = DTScheduler().get_state()
+    assert state["in_flight"] == {}
+    assert state["queue_size"] == 0
+    assert DTScheduler().is_available()
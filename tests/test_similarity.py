@@ -0,0 +1,46 @@
+import random
+import string
+from difflib import get_close_matches
+
+import pytest
+
+from integrations.ckb import CKB
+from utils.similarity import SimilarityIndex
+
+WORDS = [
+    "dns_amplification", "dns_amplificaton", "ddos_download", "ddos_downlink",
+    "ntp", "pfcp", "mitm", "hello", "", "x", "signaling_pfcp_dos", "nf_exposure",
+]
+
+
+def random_names(rng, count, alphabet="abcdef_"):
+    return ["".join(rng.choice(alphabet) for _ in range(rng.randint(0, 12))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5])
+@pytest.mark.parametrize("cutoff", [0.0, 0.3, 0.6, 0.9, 1.0])
+def test_same_matches_as_difflib_for_the_attacks(n, cutoff):
+    index = SimilarityIndex(CKB._attacks)
+    for word in WORDS + list(CKB._attacks):
+        assert index.close_matches(word, n, cutoff) == get_close_matches(word, CKB._attacks, n, cutoff)
+
+
+def test_same_matches_as_difflib_for_random_names():
+    # Short names over a small alphabet: many ties and duplicated names
+    rng = random.Random(7)
+    for _ in range(200):
+        names = random_names(rng, rng.randint(0, 30))
+        index = SimilarityIndex(names)
+        for word in random_names(rng, 5) + names[:2]:
+            n = rng.randint(1, 4)
+            cutoff = rng.choice([0.0, 0.2, 0.5, 0.75, 1.0])
+            assert index.close_matches(word, n, cutoff) == get_close_matches(word, names, n, cutoff)
+
+
+def test_same_errors_as_difflib():
+    index = SimilarityIndex(string.ascii_lowercase)
+    for n, cutoff in ((0, 0.5), (1, 1.5), (1, -0.1)):
+        with pytest.raises(ValueError):
+            get_close_matches("a", string.ascii_lowercase, n, cutoff)
+        with pytest.raises(ValueError):
+            index.close_matches("a", n, cutoff)
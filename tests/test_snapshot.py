@@ -0,0 +1,72 @@
+import pytest
+
+import config
+from data.snapshot import SnapshotManager
+from data.store import InMemoryStore
+from models.api_models import DTEIntent
+from models.core_models import CoreIntent, DetectedThreat, DTJob, MitigationAction
+
+
+def snapshot_manager(tmp_path) -> SnapshotManager:
+    SnapshotManager._instance = None
+    manager = SnapshotManager()
+    manager.enabled = True
+    manager.path = str(tmp_path / "snapshot.json")
+    return manager
+
+
+def test_snapshot_is_restored_in_a_new_store(tmp_path):
+    store = InMemoryStore()
+    dte_intent = DTEIntent(intent_type="prevention", threat="ddos_download_link", host=["10.0.0.1"], duration=600)
+    intent = CoreIntent(dte_intent)
+    store.intent_add(intent)
+    threat = DetectedThreat(dte_intent)
+    store.threat_add(threat)
+    store.threat_set_status(threat, DetectedThreat.ThreatStatus.UNDER_EMULATION)
+    action = MitigationAction("rate_limiting", "prevention", [], ["rate"])
+    store.association_add(threat.uid, action)
+    job = DTJob(threat.uid, action.uid)
+    store.dt_job_add(job)
+    assert snapshot_manager(tmp_path).save()
+
+    InMemoryStore._instance = None
+    restored = InMemoryStore()
+    assert snapshot_manager(tmp_path).load()
+
+    assert [i.uid for i in restored.intent_get_all()] == [intent.uid]
+    assert restored.threat_get(threat.uid).status == DetectedThreat.ThreatStatus.UNDER_EMULATION
+    assert restored.association_get_uids(threat.uid) == {action.uid}
+    assert restored.dt_job_get(job.uid).threat_id == threat.uid
+    # Restored threats are visited in the next pipeline cycle
+    assert threat.uid in {t.uid for t in restored.threat_pop_dirty()}
+
+
+@pytest.mark.parametrize("restore", [True, False])
+def test_compromised_flag_is_only_restored_on_demand(tmp_path, monkeypatch, restore):
+    monkeypatch.setattr(config, "IBI_RESTORE_COMPROMISED", restore)
+    InMemoryStore().ibi_set_compromised(True)
+    assert snapshot_manager(tmp_path).save()
+
+    InMemoryStore._instance = None
+    restored = InMemoryStore()
+    assert snapshot_manager(tmp_path).load()
+
+    assert restored.ibi_is_compromised() == restore
+
+
+def test_unchanged_state_is_not_written_again(tmp_path):
+    InMemoryStore().intent_add(
+        CoreIntent(DTEIntent(intent_type="mitigation", threat="dns_amplification", host=["10.0.0.1"], duration=600))
+    )
+    manager = snapshot_manager(tmp_path)
+
+    assert manager.save()
+    assert not manager.save()
+
+
+def test_disabled_snapshot_does_nothing(tmp_path):
+    manager = snapshot_manager(tmp_path)
+    manager.enabled = False
+
+    assert not manager.save()
+    assert not manager.load()
@@ -0,0 +1,152 @@
+import sqlite3
+
+import pytest
+
+import config
+from data.sqlite_store import SQLiteStore
+from data.store import InMemoryStore
+from models.api_models import DTEIntent
+from models.core_models import CoreIntent, DetectedThreat, DTJob, MitigationAction
+
+
+def open_store(monkeypatch, tmp_path) -> SQLiteStore:
+    monkeypatch.setattr(config, "STORAGE_PATH", str(tmp_path / "ibi.db"))
+    InMemoryStore._instance = None
+    return SQLiteStore()
+
+
+def test_state_is_restored_from_the_database(monkeypatch, tmp_path):
+    store = open_store(monkeypatch, tmp_path)
+    dte_intent = DTEIntent(intent_type="prevention", threat="ddos_download_link", host=["10.0.0.1"], duration=600)
+    intent = CoreIntent(dte_intent)
+    store.intent_add(intent)
+    threat = DetectedThreat(dte_intent)
+    store.threat_add(threat)
+    store.threat_set_status(threat, DetectedThreat.ThreatStatus.UNDER_EMULATION)
+    action = MitigationAction("rate_limiting", "prevention", [], ["rate"])
+    store.association_add(threat.uid, action)
+    job = DTJob(threat.uid, action.uid)
+    job.set_mitigation_obj(action)
+    store.dt_job_add(job)
+    job.update_kpi_before(20000)
+    store.dt_job_update(job.uid, job)
+    key = ("horse_ddos", "ddos_downlink", "dns-c1", "eth1", "packets-per-second")
+    store.kpi_baseline_set(key, 20000)
+    store.flush()
+
+    restored = open_store(monkeypatch, tmp_path)
+
+    assert restored is not store
+    assert [i.uid for i in restored.intent_get_all()] == [intent.uid]
+    assert restored.threat_get(threat.uid).status == DetectedThreat.ThreatStatus.UNDER_EMULATION
+    assert [m.uid for m in restored.association_get(threat.uid)] == [action.uid]
+    restored_job = restored.dt_job_get(job.uid)
+    assert restored_job.kpi_before == 20000
+    assert restored_job.mitigation_obj.name == "rate_limiting"
+    assert restored.kpi_baseline_get(key, 60) == 20000
+
+
+def test_expired_dt_jobs_and_compaction_are_persisted(monkeypatch, tmp_path):
+    store = open_store(monkeypatch, tmp_path)
+    threat = DetectedThreat(DTEIntent(intent_type="prevention", threat="dns_amplification", host=["10.0.0.1"], duration=600))
+    store.threat_add(threat)
+    job = DTJob(threat.uid, "action")
+    store.dt_job_add(job)
+    store.dt_job_delete(threat.uid)
+    store.flush()
+
+    restored = open_store(monkeypatch, tmp_path)
+    assert restored.dt_job_get(job.uid) is None
+    assert [j.status for j in restored.dt_job_get_all(expired=True)] == [DTJob.JobStatus.EXPIRED]
+
+    restored.compact(float("inf"))
+    restored.flush()
+    assert open_store(monkeypatch, tmp_path).dt_job_get_all(expired=True) == []
+
+
+def test_jobs_of_a_mitigated_threat_are_archived(monkeypatch, tmp_path):
+    store = open_store(monkeypatch, tmp_path)
+    threat = DetectedThreat(DTEIntent(intent_type="prevention", threat="dns_amplification", host=["10.0.0.1"], duration=600))
+    store.threat_add(threat)
+    job = DTJob(threat.uid, "action")
+    store.dt_job_add(job)
+    store.threat_set_status(threat, DetectedThreat.ThreatStatus.MITIGATED)
+    store.flush()
+
+    restored = open_store(monkeypatch, tmp_path)
+    assert restored.dt_job_get_all() == []
+    assert [j.uid for j in restored.dt_job_get_all(expired=True)] == [job.uid]
+
+
+@pytest.mark.parametrize("restore", [True, False])
+def test_compromised_flag_is_only_restored_on_demand(monkeypatch, tmp_path, restore):
+    monkeypatch.setattr(config, "IBI_RESTORE_COMPROMISED", restore)
+    store = open_store(monkeypatch, tmp_path)
+    store.ibi_set_compromised(True)
+    store.flush()
+
+    restored = open_store(monkeypatch, tmp_path)
+    assert restored.ibi_is_compromised() == restore
+    restored.flush()
+    # Not kept for a later restart either
+    monkeypatch.setattr(config, "IBI_RESTORE_COMPROMISED", True)
+    assert open_store(monkeypatch, tmp_path).ibi_is_compromised() == restore
+
+
+class FailingDatabase:
+    """
+    Database connection whose next executemany() fails, after running a callback.
+    """
+    def __init__(self, db, callback):
+        self._db = db
+        self._callback = callback
+
+    def execute(self, *args):
+        return self._db.execute(*args)
+
+    def executemany(self, *args):
+        self._callback()
+        raise sqlite3.OperationalError("disk I/O error")
+
+
+def imported_state():
+    threat = DetectedThreat(DTEIntent(intent_type="prevention", threat="ddos_download_link", host=["10.0.0.9"], duration=600))
+    return threat, {"threats": [threat.to_dict()]}
+
+
+def test_import_drops_the_pending_writes(monkeypatch, tmp_path):
+    store = open_store(monkeypatch, tmp_path)
+    stored = DetectedThreat(DTEIntent(intent_type="prevention", threat="dns_amplification", host=["10.0.0.1"], duration=600))
+    store.threat_add(stored)
+    store.flush()
+    # Writes of the previous state not flushed yet
+    pending = DetectedThreat(DTEIntent(intent_type="prevention", threat="dns_amplification", host=["10.0.0.2"], duration=600))
+    store.threat_add(pending)
+    store.dt_job_add(DTJob(pending.uid, "action"))
+    store.kpi_baseline_set(("horse_ddos", "ddos_downlink", "dns-c1", "eth1", "packets-per-second"), 20000)
+    threat, state = imported_state()
+
+    store.import_state(state)
+    store.flush()
+
+    restored = open_store(monkeypatch, tmp_path)
+    assert [t.uid for t in restored.threat_get_all()] == [threat.uid]
+    assert restored.dt_job_get_all(expired=True) == []
+    assert restored._kpi_baselines == {}
+
+
+def test_failed_flush_does_not_restore_writes_replaced_by_an_import(monkeypatch, tmp_path):
+    store = open_store(monkeypatch, tmp_path)
+    stale = DetectedThreat(DTEIntent(intent_type="prevention", threat="dns_amplification", host=["10.0.0.1"], duration=600))
+    store.threat_add(stale)
+    threat, state = imported_state()
+    db = store._db
+    # The state is imported while the writes of the previous state are being committed
+    store._db = FailingDatabase(db, lambda: store.import_state(state))
+    with pytest.raises(sqlite3.Error):
+        store.flush()
+    store._db = db
+
+    store.flush()
+
+    assert [t.uid for t in open_store(monkeypatch, tmp_path).threat_get_all()] == [threat.uid]
@@ -0,0 +1,112 @@
+import copy
+from collections import Counter
+
+from models.core_models import CoreIntent, DetectedThreat, DTJob
+
+
+def test_lookups_ignore_the_order_of_the_hosts(store, make_request):
+    intent = CoreIntent(make_request(host=["10.0.0.1", "10.0.0.2"]))
+    store.intent_add(intent)
+    threat = DetectedThreat(make_request(host=["10.0.0.1", "10.0.0.2"]))
+    store.threat_add(threat)
+
+    assert store.intent_exists(CoreIntent(make_request(host=["10.0.0.2", "10.0.0.1"])))
+    assert store.threat_locate(DetectedThreat(make_request(host=["10.0.0.2", "10.0.0.1"]))) == threat.uid
+    assert not store.intent_exists(CoreIntent(make_request(host=["10.0.0.2"])))
+    assert store.threat_locate(DetectedThreat(make_request(host=["10.0.0.1", "10.0.0.2"], threat="dns_amplification"))) is None
+
+
+def test_index_entries_follow_deletes_and_status_changes(store, make_request):
+    intent = CoreIntent(make_request(host=["10.0.0.1"]))
+    store.intent_add(intent)
+    threat = DetectedThreat(make_request(host=["10.0.0.1"]))
+    store.threat_add(threat)
+    removed = DetectedThreat(make_request(host=["10.0.0.2"]))
+    store.threat_add(removed)
+
+    # Timed out by an update
+    timed_out = copy.copy(intent)
+    timed_out.end_time = 0
+    store.intent_update(intent.uid, timed_out)
+    assert store._intent_index == {}
+    store.intent_update(intent.uid, intent)
+    assert store.intent_exists(CoreIntent(make_request(host=["10.0.0.1"])))
+    store.intent_remove(intent.uid)
+    assert store._intent_index == {}
+
+    store.threat_remove(removed.uid)
+    assert set(store._threat_index.values()) == {threat.uid}
+    # Still active
+    store.threat_set_status(threat, DetectedThreat.ThreatStatus.UNDER_MITIGATION)
+    assert store.threat_locate(DetectedThreat(make_request(host=["10.0.0.1"]))) == threat.uid
+    store.threat_set_status(threat, DetectedThreat.ThreatStatus.MITIGATED)
+    assert store._threat_index == {}
+
+
+def assert_buckets_match(store):
+    statuses = Counter(threat.status for threat in store.threat_get_all())
+    assert store.threat_count_by_status() == {status: statuses[status] for status in DetectedThreat.ThreatStatus}
+    for status in DetectedThreat.ThreatStatus:
+        assert {t.uid for t in store.threat_get_by_status(status)} == {
+            t.uid for t in store.threat_get_all() if t.status == status
+        }
+
+
+def test_status_buckets_follow_the_threats(store, make_threat):
+    threats = [make_threat(host=f"10.0.0.{i}") for i in range(4)]
+    assert_buckets_match(store)
+
+    store.threat_set_status(threats[0], DetectedThreat.ThreatStatus.UNDER_EMULATION)
+    store.threat_set_status(threats[1], DetectedThreat.ThreatStatus.UNDER_MITIGATION)
+    store.threat_set_status(threats[1], DetectedThreat.ThreatStatus.REINCIDENT)
+    store.threat_set_status(threats[2], DetectedThreat.ThreatStatus.MITIGATED)
+    assert_buckets_match(store)
+
+    store.threat_remove(threats[0].uid)
+    store.compact(float("inf"))
+    assert_buckets_match(store)
+    assert store.threat_count_by_status()[DetectedThreat.ThreatStatus.MITIGATED] == 0
+
+    state = store.export_state()
+    store.threat_set_status(threats[3], DetectedThreat.ThreatStatus.UNDER_EMULATION)
+    store.import_state(state)
+    assert_buckets_match(store)
+    assert {t.uid for t in store.threat_get_by_status(DetectedThreat.ThreatStatus.NEW)} == {threats[3].uid}
+    assert {t.uid for t in store.threat_get_by_status(DetectedThreat.ThreatStatus.REINCIDENT)} == {threats[1].uid}
+
+
+def test_dt_job_lookups_follow_the_registry(store):
+    job = DTJob("threat-1", "action-1")
+    other = DTJob("threat-1", "action-2")
+    store.dt_job_add(job)
+    store.dt_job_add(other)
+    assert store.dt_job_get(job.uid) is job
+    assert store.dt_job_get_all_by_threat("threat-1") == [job, other]
+    assert store.dt_job_exists(DTJob("threat-1", "action-1"))
+
+    # Updated with a new object
+    updated = copy.copy(job)
+    updated.update_kpi_before(100.0)
+    assert store.dt_job_update(job.uid, updated)
+    assert store.dt_job_get(job.uid) is updated
+    assert store.dt_job_get_all_by_threat("threat-1") == [other, updated]
+    assert store.dt_job_exists(DTJob("threat-1", "action-1"))
+
+    # Expired by an update: moved to the archive
+    expired = copy.copy(updated)
+    expired.update_status(DTJob.JobStatus.EXPIRED)
+    store.dt_job_update(job.uid, expired)
+    assert store.dt_job_get(job.uid) is None
+    assert store.dt_job_get_all_by_threat("threat-1") == [other]
+    assert store.dt_job_get_all_by_threat("threat-1", expired=True) == [expired, other]
+    assert not store.dt_job_exists(DTJob("threat-1", "action-1"))
+
+    # Deleted with the threat: archived, then compacted
+    store.dt_job_delete("threat-1")
+    assert store.dt_job_get_all_by_threat("threat-1") == []
+    assert store.dt_job_get_all_by_threat("threat-1", expired=True) == [expired, other]
+    assert not store.dt_job_exists(DTJob("threat-1", "action-2"))
+    removed = store.compact(float("inf"))["dt_jobs"]
+    assert {job["uid"] for job in removed} == {job.uid, other.uid}
+    assert store.dt_job_get_all_by_threat("threat-1", expired=True) == []
+    assert store._expired_dt_jobs_by_threat == {}
@@ -0,0 +1,70 @@
+import threading
+
+from models.api_models import DTEIntent
+from models.core_models import CoreIntent, DetectedThreat
+
+
+def make_threat(index: int) -> DetectedThreat:
+    return DetectedThreat(
+        DTEIntent(intent_type="mitigation", threat="dns_amplification", host=[f"10.0.{index // 250}.{index % 250}"], duration=600)
+    )
+
+
+def test_views_follow_the_writes(store):
+    intent = CoreIntent(DTEIntent(intent_type="mitigation", threat="dns_amplification", host=["10.0.0.1"], duration=600))
+    assert store.intent_get_all() == []
+
+    store.intent_add(intent)
+    assert store.intent_get_all() == [intent]
+
+    threat = make_threat(1)
+    store.threat_add(threat)
+    assert store.threat_get_all() == [threat]
+    assert store.threat_count_by_status()[DetectedThreat.ThreatStatus.NEW] == 1
+
+    store.threat_set_status(threat, DetectedThreat.ThreatStatus.UNDER_MITIGATION)
+    counts = store.threat_count_by_status()
+    assert counts[DetectedThreat.ThreatStatus.NEW] == 0
+    assert counts[DetectedThreat.ThreatStatus.UNDER_MITIGATION] == 1
+
+
+def test_views_are_not_changed_by_their_readers(store):
+    store.threat_add(make_threat(1))
+    threats = store.threat_get_all()
+    threats.clear()
+
+    assert len(store.threat_get_all()) == 1
+
+
+def test_readers_during_writes_see_whole_collections(store):
+    total = 2000
+    errors = []
+    done = threading.Event()
+
+    def reader():
+        previous = 0
+        while not done.is_set():
+            try:
+                threats = store.threat_get_all()
+                counts = store.threat_count_by_status()
+            except Exception as e:
+                errors.append(e)
+                return
+            # Threats are only added: a view never goes back in time
+            if len(threats) < previous or sum(counts.values()) > total:
+                errors.append(AssertionError(f"{len(threats)} threats after {previous}"))
+                return
+            previous = len(threats)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    for thread in readers:
+        thread.start()
+    for index in range(total):
+        store.threat_add(make_threat(index))
+    done.set()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+    assert len(store.threat_get_all()) == total
+    assert store.threat_count_by_status()[DetectedThreat.ThreatStatus.NEW] == total
@@ -0,0 +1,72 @@
+import threading
+
+from controllers.dte_controller import DTEController
+from controllers.iandt_controller import IANDTController
+from controllers.mitigations_controller import MitigationsController
+from integrations.iandt import ImpactAnalysisDT
+from models.core_models import DTJob
+
+WAIT = 0.2
+
+
+def start(target, *args):
+    thread = threading.Thread(target=target, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_iandt_answer_waits_for_the_threat_lock(store, make_threat, make_action):
+    threat = make_threat()
+    ImpactAnalysisDT().enqueue_simulation(threat, make_action())
+    job = store.dt_job_get_all_by_threat(threat.uid)[0]
+
+    with store.threat_lock(threat.uid):
+        answer = start(IANDTController().process_response, job.uid, 100.0)
+        answer.join(WAIT)
+        assert answer.is_alive()
+        assert job.kpi_before is None
+    answer.join(5)
+
+    assert not answer.is_alive()
+    assert job.kpi_before == 100.0
+
+
+def test_watchdog_waits_for_the_threat_lock(store, monkeypatch, make_threat, make_action):
+    threat = make_threat()
+    iadt = ImpactAnalysisDT()
+    iadt.enqueue_simulation(threat, make_action())
+    job = store.dt_job_get_all_by_threat(threat.uid)[0]
+    task = iadt._scheduler.take_ready()[0]
+    monkeypatch.setattr(iadt._scheduler, "expire", lambda: [task])
+    monkeypatch.setattr(iadt._scheduler, "take_ready", lambda: [])
+
+    with store.threat_lock(threat.uid):
+        watchdog = start(iadt.process_queued_jobs)
+        watchdog.join(WAIT)
+        assert watchdog.is_alive()
+        assert job.status == DTJob.JobStatus.PENDING
+    watchdog.join(5)
+
+    assert not watchdog.is_alive()
+    assert job.status == DTJob.JobStatus.FAILED
+
+
+def test_dte_batch_renews_outside_the_store_lock(store, make_request):
+    MitigationsController.populate_mitigation_actions()
+    controller = DTEController()
+    assert controller.process_dte_intents([make_request()]) == [DTEController.RETURN_STATUS_CREATED]
+    threat = store.threat_get_all()[0]
+    threat.last_update = 0
+
+    with store.threat_lock(threat.uid):
+        requests = start(controller.process_dte_intents, [make_request()])
+        requests.join(WAIT)
+        assert requests.is_alive()
+        assert threat.last_update == 0
+        # The batch released the store lock before waiting for the threat
+        # (a pipeline worker holding the threat lock can still use the store)
+        assert store.threat_get(threat.uid) is threat
+    requests.join(5)
+
+    assert not requests.is_alive()
+    assert threat.last_update > 0
@@ -0,0 +1,61 @@
+import pytest
+
+import config
+from controllers.iandt_controller import IANDTController
+from controllers.mitigations_controller import MitigationsController
+from models.api_models import DTEIntent
+from models.core_models import CoreIntent, DetectedThreat, DTJob
+from pipeline import IntentPipeline
+
+CYCLES = 10
+
+
+@pytest.fixture
+def pipeline(store, monkeypatch):
+    MitigationsController.populate_mitigation_actions()
+    pipeline = IntentPipeline()
+    pipeline.sent = []
+    monkeypatch.setattr(pipeline.iadt, "send_iandt_message", pipeline.sent.append)
+    return pipeline
+
+
+def run_until(pipeline, done, answer):
+    """
+    Run pipeline cycles, answering the IA-NDT requests, until done() is true.
+    """
+    for _ in range(CYCLES):
+        pipeline.process_intents()
+        while pipeline.sent:
+            message = pipeline.sent.pop(0)
+            IANDTController().process_response(message["id"], answer(message))
+        if done():
+            return
+    pytest.fail("The pipeline did not finish")
+
+
+def test_whatif_round_on_a_warm_baseline_cache(store, pipeline, monkeypatch):
+    monkeypatch.setattr(config, "IADT_BASELINE_TTL", 600)
+    pipeline.whatif_candidates = 3
+    request = DTEIntent(intent_type="prevention", threat="ddos_download_link", host=["10.0.0.1"], duration=600)
+    store.intent_add(CoreIntent(request))
+    # The element was measured recently (e.g. for another threat)
+    monitor = pipeline.iadt._templates.monitor("earlier", "ddos_download_link", "ddos_downlink")
+    store.kpi_baseline_set(pipeline.iadt._baseline_key(monitor), 100.0)
+    threat = DetectedThreat(request)
+    store.threat_add(threat)
+    simulations = []
+
+    def answer(message):
+        assert message["if-condition"]["action"]["type"] != "monitor", "measured again"
+        simulations.append(message["id"])
+        # Under the threshold (half of the KPI before the mitigation)
+        return 40.0
+
+    run_until(pipeline, lambda: threat.get_status() != DetectedThreat.ThreatStatus.UNDER_EMULATION, answer)
+
+    assert threat.get_status() == DetectedThreat.ThreatStatus.UNDER_MITIGATION
+    jobs = store.dt_job_get_all(expired=True)
+    assert len(jobs) == len(simulations) > 1
+    assert all(job.kpi_before == 100.0 and job.status == DTJob.JobStatus.EXPIRED for job in jobs)
+    assert store.dt_job_get_all_by_threat(threat.uid) == []
+    assert pipeline.iadt._scheduler.get_state()["measurements_reused"] == 1